@@ -1,192 +1,66 @@
 """
-This script downloads 16 JSON files and parses them into JSON Objects. Then, these objects are used to insert
-all the data to a SQLite Database.
+This script downloads 16 JSON files at the same time and parses them into JSON Objects. Then, these objects are used to
+insert all the data to a SQLite Database. Feeds that have not changed since the last run are not downloaded again.
 Author: Ian Jacobs
 Last Edited: November 16, 2016
 """
-import sqlite3
-import urllib
-import json
 from Tkinter import *
 import ttk
 import tkMessageBox
-
-# Connect to the DB
-conn = sqlite3.connect('footballdb.sqlite')
-cur = conn.cursor()
-
-# Execute a script , use triple quotes to include spaces.
-# Drop table if exists is necessary to run the code more than one time.
-cur.executescript('''
-DROP TABLE IF EXISTS club;
-DROP TABLE IF EXISTS club_year;
-DROP TABLE IF EXISTS game;
-DROP TABLE IF EXISTS league;
-DROP TABLE IF EXISTS match;
-
-CREATE TABLE club (
-    id     TEXT NOT NULL PRIMARY KEY,
-    club_name   TEXT,
-    abbr    CHAR(3),
-    league_name TEXT,
-    FOREIGN KEY(league_name) REFERENCES league(league_name)
-);
-
-CREATE TABLE club_year (
-    club_key     TEXT NOT NULL,
-    club_year   INTEGER(4) NOT NULL,
-    PRIMARY KEY(club_key, club_year),
-    FOREIGN KEY(club_key) REFERENCES club(id)
-);
-
-CREATE TABLE league (
-    league_name TEXT NOT NULL PRIMARY KEY
-);
-
-CREATE TABLE match  (
-    match_name NOT NULL PRIMARY KEY
-);
-
-CREATE TABLE game (
-    id  INTEGER NOT NULL PRIMARY KEY,
-    match_name  TEXT,
-    team_one  TEXT,
-    team_two  TEXT,
-    score_one INTEGER(3),
-    score_two INTEGER(3),
-    game_date   DATE,
-    season_year INT(4),
-    league_name TEXT,
-    FOREIGN KEY(team_one) REFERENCES club(id),
-    FOREIGN KEY(team_two) REFERENCES club(id),
-	FOREIGN KEY(league_name) REFERENCES league(league_name)
-	FOREIGN KEY(match_name) REFERENCES match(match_name)
-);
-''')
-
-# This statement turns on the foreign keys contraint. If this is not turned on, the constraint does not work even
-# If you define it in the schema
-cur.execute('PRAGMA foreign_keys = ON;')
-
-
-# **********************************************************************************************************************
-# Function Definitions
-
-
-# This function gets the club names from the JSON url given and inserts the club into the club table
-def insert_club_to_db(url, year):
-    response = urllib.urlopen(url)
-    data_dictionary = json.loads(response.read())
-
-    # Read the league name and do substring to get correct name and then insert it
-    league_name = data_dictionary['name']
-    league_name = league_name[0:len(league_name) - 8]
-    cur.execute('''INSERT OR IGNORE INTO league(league_name) VALUES(?)''', (league_name,))
-
-    # Deal with the clubs
-    clubs_dictionary = data_dictionary['clubs']
-
-    # For each club in the clubs dictionary, get the values and insert them to the club table
-    for club in clubs_dictionary:
-        club_id = club['key']
-        club_name = club['name']
-        club_code = club['code']
-        cur.execute('''INSERT OR IGNORE INTO club(id, club_name, abbr, league_name)
-        VALUES(?, ?, ?, ?)''', (club_id, club_name, club_code, league_name))
-        insert_club_year(club_id, year)  # Insert the club and year as well
-
-
-# This function is called from the 'insert_club_to_db' function. Once a club is created in the club table, this
-# Function takes the club and assigns it a year. This is because some clubs that played in 2015, did not play in 2016
-# And vise-versa. So we need to know which clubs played in which year
-def insert_club_year(club_key, year):
-    cur.execute('''INSERT OR IGNORE INTO club_year(club_key, club_year)
-            VALUES(?, ?)''', (club_key, year))
-
-
-# This function takes an url of matches and a season year of the matches given. Then, these matches are inserted into
-# The database.
-def insert_matches(url, season_year):
-    response = urllib.urlopen(url)
-    matches_dictionary = json.loads(response.read())
-    matches_rounds = matches_dictionary['rounds']  # Get the rounds
-    league_name = matches_dictionary['name']  # Get the league name and do a substring to remove unnecessary data
-    league_name = league_name[0:len(league_name) - 8]
-
-    # For each match in the rounds
-    for match in matches_rounds:
-        match_dict = match['matches']  # Get the matches dictionary
-        match_name = match['name']  # Get the match name
-
-        cur.execute('''INSERT OR IGNORE INTO match(match_name)
-                    VALUES(?)''', (match_name,))
-
-        # For each item in the matches dictionary, get the corresponding data to insert into the database
-        for item in match_dict:
-            match_date = item['date']
-            score1 = item['score1']
-            score2 = item['score2']
-            team1_dict = item['team1']
-            team2_dict = item['team2']
-            team1_key = team1_dict['key']
-            team2_key = team2_dict['key']
-
-            # Insert values of matches in the database
-            cur.execute('''INSERT INTO game(team_one, team_two, score_one, score_two, game_date, match_name,
-                season_year, league_name) VALUES(?, ?, ?, ?, ?, ?, ?, ?)''',
-                        (team1_key, team2_key, score1, score2, match_date, match_name, season_year, league_name))
-
-
-# **********************************************************************************************************************
-# Main Code where functions are called to download the JSONs, parse them, and insert them into the database
-
-# English Premier League
-english_league15_clubs = 'https://raw.githubusercontent.com/openfootball/football.json/master/2015-16/en.1.clubs.json'
-english_league16_clubs = 'https://raw.githubusercontent.com/openfootball/football.json/master/2016-17/en.1.clubs.json'
-english_matches2015 = 'https://raw.githubusercontent.com/openfootball/football.json/master/2015-16/en.1.json'
-english_matches2016 = 'https://raw.githubusercontent.com/openfootball/football.json/master/2016-17/en.1.json'
-
-insert_club_to_db(english_league15_clubs, 2015)  # Insert unique clubs and leagues to the DB for 2015
-insert_club_to_db(english_league16_clubs, 2016)  # Insert unique clubs and leagues to the DB for 2016
-insert_matches(english_matches2015, 2015)  # Insert matches for 2015
-insert_matches(english_matches2016, 2016)  # Insert matches for 2016
-
-# Deutsche Bundesliga
-deutsche_league15_clubs = 'https://raw.githubusercontent.com/openfootball/football.json/master/2015-16/de.1.clubs.json'
-deutsche_league16_clubs = 'https://raw.githubusercontent.com/openfootball/football.json/master/2016-17/de.1.clubs.json'
-deutsche_matches2015 = 'https://raw.githubusercontent.com/openfootball/football.json/master/2015-16/de.1.json'
-deutsche_matches2016 = 'https://raw.githubusercontent.com/openfootball/football.json/master/2016-17/de.1.json'
-
-insert_club_to_db(deutsche_league15_clubs, 2015)  # Insert unique clubs and leagues to the DB for 2015
-insert_club_to_db(deutsche_league16_clubs, 2016)  # Insert unique clubs and leagues to the DB for 2016
-insert_matches(deutsche_matches2015, 2015)  # Insert matches for 2015
-insert_matches(deutsche_matches2016, 2016)  # Insert matches for 2016
-
-# Spanish Primera Division ("La Liga")
-spanish_league15_clubs = 'https://raw.githubusercontent.com/openfootball/football.json/master/2015-16/es.1.clubs.json'
-spanish_league16_clubs = 'https://raw.githubusercontent.com/openfootball/football.json/master/2016-17/es.1.clubs.json'
-spanish_matches2015 = 'https://raw.githubusercontent.com/openfootball/football.json/master/2015-16/es.1.json'
-spanish_matches2016 = 'https://raw.githubusercontent.com/openfootball/football.json/master/2016-17/es.1.json'
-
-insert_club_to_db(spanish_league15_clubs, 2015)  # Insert unique clubs and leagues to the DB for 2015
-insert_club_to_db(spanish_league16_clubs, 2016)  # Insert unique clubs and leagues to the DB for 2016
-insert_matches(spanish_matches2015, 2015)
-insert_matches(spanish_matches2016, 2016)
-
-# Italian Serie A
-italian_league15_clubs = 'https://raw.githubusercontent.com/openfootball/football.json/master/2015-16/it.1.clubs.json'
-italian_league16_clubs = 'https://raw.githubusercontent.com/openfootball/football.json/master/2016-17/it.1.clubs.json'
-italian_matches2015 = 'https://raw.githubusercontent.com/openfootball/football.json/master/2015-16/it.1.json'
-italian_matches2016 = 'https://raw.githubusercontent.com/openfootball/football.json/master/2016-17/it.1.json'
-
-insert_club_to_db(italian_league15_clubs, 2015)  # Insert unique clubs and leagues to the DB for 2015
-insert_club_to_db(italian_league16_clubs, 2016)  # Insert unique clubs and leagues to the DB for 2016
-insert_matches(italian_matches2015, 2015)
-insert_matches(italian_matches2016, 2016)
-
-# commit
-conn.commit()
-
+import tkFileDialog
+import tkSimpleDialog
+from footballdb import (batch, executor, export, fixtures, loader, metrics, paging, queries, ratings, records,
+                        reference, resultgrid, schema, standings)
+
+# Set full_reload to True to start again from an empty database and download every feed. Otherwise the tables are
+# created the first time, upgraded if the database was made by an older version of the script, and kept between runs
+# with the records edited in the GUI.
+full_reload = False
+
+# The statements slower than metrics.SLOW_SECONDS are appended to this file with their parameters and query plan, set it
+# to None to only keep them in the Status window
+slow_query_log = 'slow_queries.log'
+
+
+# This function runs one named statement of queries.py for an add, delete or update button on the writer thread of the
+# executor, so the window does not freeze while the database is busy. It is committed if it works, and then on_done()
+# is called.
+# If SQLite refuses it, for example because of a UNIQUE or FOREIGN KEY constraint, on_error(er) is called instead.
+# Both are called from the Tk main loop, so they can show a message box and change the Entries and buttons. The job is
+# timed under the name of the statement in the Status window
+def write(query, parameters, on_done, on_error):
+    def run(db):
+        with db:
+            query.execute(db, parameters)
+    queryExecutor.submit(rated(run), lambda result: on_done(), on_error, write=True, name=query.name)
+
+
+# This function returns a job for the writer thread that runs job(db), which commits what it changed, and then
+# computes the ratings again from the date of the earliest game it changed, if it changed one. A score updated in the
+# last round only plays the games after it again (see footballdb/ratings.py)
+def rated(job):
+    def run(db):
+        result = job(db)
+        ratings.update_ratings(db)
+        return result
+    return run
+
+
+# This function shows why a write would be refused by the database, from the league, match and club names kept in
+# memory (see footballdb/reference.py), and returns True if it would. The write is then not sent, and the fields are
+# left as typed so they can be corrected
+def refused(title, problems):
+    if problems:
+        tkMessageBox.showinfo(title, '\n'.join(problems))
+        return True
+    return False
+
+
+# This function is called by the executor after every write that worked. The names kept in memory may have changed, so
+# they are read again
+def reference_tables_changed():
+    referenceCache.invalidate()
+    referenceCache.refresh(queryExecutor)
 
 
 # League Section Button Listeners***************************************************************************************
@@ -194,16 +68,8 @@ conn.commit()
 def search_league_click():
     league_input = searchLeagueEntry.get()  # Get the user input from the Entry
 
-    # Execute the query. Used 'LIKE' so you can search for half a word if you want to
-    cur.execute('''SELECT league_name FROM league WHERE league_name LIKE ?''', ('%' + league_input + '%',))
-
-    columns = [column[0] for column in cur.description]  # Get the column names from the cursor
-    results = []
-
-    for row in cur.fetchall():
-        results.append(row)  # Append results in the array
-
-    create_tree(columns, results)  # Create the treeview
+    # Show the results in the table. The input only has to be the start of the name, so you can search for half a word
+    resultGrid.show(paging.Search('league', queries.LEAGUE_SEARCH, [league_input]))
 
     searchLeagueEntry.delete(0, END)  # Empty the Entry field
     global updateSection  # Update the global variable in case user decides to update also
@@ -214,13 +80,12 @@ def search_league_click():
 def add_league_click():
     league_input = searchLeagueEntry.get()  # Get the user input from the Entry
 
-    try:
-        if len(league_input) > 0:
-            cur.execute('''INSERT INTO league(league_name) VALUES (?)''', (league_input,))
-            conn.commit()
-            tkMessageBox.showinfo("League Addition", league_input + ' added!')
-    except sqlite3.Error as er:  # Catch exceptions if any, such as UNIQUE
-        tkMessageBox.showinfo("Error Adding", er)
+    if len(league_input) > 0:
+        if refused('Error Adding', referenceCache.name_problems(reference.LEAGUE, league_input)):
+            return
+        write(queries.ADD_LEAGUE, (league_input,),
+              lambda: tkMessageBox.showinfo("League Addition", league_input + ' added!'),
+              lambda er: tkMessageBox.showinfo("Error Adding", er))  # Show exceptions if any, such as UNIQUE
 
     searchLeagueEntry.delete(0, END)  # Empty the Entry
 
@@ -229,20 +94,13 @@ def add_league_click():
 def delete_league_click():
     league_input = searchLeagueEntry.get()  # Get the user input from the Entry
     if len(league_input) > 0:
-        try:
-            cur.execute('''DELETE FROM league WHERE league_name = ?''', (league_input,))
-            conn.commit()
-            tkMessageBox.showinfo("Delete League", league_input + ' deleted!')
-            updateLeagueButton['state'] = 'disabled'  # Disable the 'Update' button again
-            addLeagueButton['state'] = 'normal'  # Enable these buttons now and the rest below
-            searchLeagueButton['state'] = 'normal'
-            deleteLeagueButton['state'] = 'disabled'
-        except sqlite3.Error as er:  # Catch exceptions if any, such as FOREIGN KEY, CANNOT DELETE
-            tkMessageBox.showinfo("Error Deleting", er)
-            updateLeagueButton['state'] = 'disabled'
-            addLeagueButton['state'] = 'normal'
-            searchLeagueButton['state'] = 'normal'
-            deleteLeagueButton['state'] = 'disabled'
+        write(queries.DELETE_LEAGUE, (league_input,),
+              lambda: tkMessageBox.showinfo("Delete League", league_input + ' deleted!'),
+              lambda er: tkMessageBox.showinfo("Error Deleting", er))  # Such as FOREIGN KEY, CANNOT DELETE
+        updateLeagueButton['state'] = 'disabled'  # Disable the 'Update' button again
+        addLeagueButton['state'] = 'normal'  # Enable these buttons now and the rest below
+        searchLeagueButton['state'] = 'normal'
+        deleteLeagueButton['state'] = 'disabled'
 
     searchLeagueEntry.delete(0, END)  # Empty the Entry
 
@@ -251,19 +109,15 @@ def delete_league_click():
 def update_league_click():
     league_input = searchLeagueEntry.get()  # Get the user input from the Entry
     if len(league_input) > 0:
-        try:
-            cur.execute("""UPDATE league SET league_name = ? WHERE league_name = ?""", (league_input, updateKey))
-            tkMessageBox.showinfo("Update", 'Record updated!')
-            updateLeagueButton['state'] = 'disabled'  # Disable the 'Update' button again
-            addLeagueButton['state'] = 'normal'  # Enable these buttons now and the rest below
-            searchLeagueButton['state'] = 'normal'
-            deleteLeagueButton['state'] = 'disabled'
-        except sqlite3.Error as er:
-            tkMessageBox.showinfo("Error Updating", er)
-            updateLeagueButton['state'] = 'disabled'
-            addLeagueButton['state'] = 'normal'
-            searchLeagueButton['state'] = 'normal'
-            deleteLeagueButton['state'] = 'disabled'
+        if refused('Error Updating', referenceCache.name_problems(reference.LEAGUE, league_input, updateKey)):
+            return
+        write(queries.UPDATE_LEAGUE, (league_input, updateKey),
+              lambda: tkMessageBox.showinfo("Update", 'Record updated!'),
+              lambda er: tkMessageBox.showinfo("Error Updating", er))
+        updateLeagueButton['state'] = 'disabled'  # Disable the 'Update' button again
+        addLeagueButton['state'] = 'normal'  # Enable these buttons now and the rest below
+        searchLeagueButton['state'] = 'normal'
+        deleteLeagueButton['state'] = 'disabled'
 
     else:
         tkMessageBox.showinfo("Update Failed", 'Cannot be empty!')
@@ -275,14 +129,7 @@ def update_league_click():
 # This function is called when the 'Search Match' button is clicked
 def search_match_click():
     match_input = matchNameEntry.get()  # Get the user input from the Entry
-    cur.execute('''SELECT match_name FROM match WHERE match_name LIKE ?''', ('%' + match_input + '%',))
-
-    columns = [column[0] for column in cur.description]  # Column descriptions from the cursor
-    results = []
-    for row in cur.fetchall():
-        results.append(row)
-
-    create_tree(columns, results)  # Create the treeview and populate
+    resultGrid.show(paging.Search('match', queries.MATCH_SEARCH, [match_input], full_text))  # Show the results
     matchNameEntry.delete(0, END)
     global updateSection
     updateSection = 'match'  # Update this global variable in case user decides to update in this section
@@ -291,36 +138,30 @@ def search_match_click():
 # This function is called when the user clicks the 'Add Match' button
 def add_match_click():
     match_input = matchNameEntry.get()  # Get the user input from the Entry
-    try:
-        if len(match_input) > 0:
-            cur.execute('''INSERT INTO match(match_name) VALUES (?)''', (match_input,))
-            conn.commit()
-            tkMessageBox.showinfo("Match Addition", match_input + ' added!')  # Inform user of success
-
+    def added():
+        tkMessageBox.showinfo("Match Addition", match_input + ' added!')  # Inform user of success
         matchNameEntry.delete(0, END)  # Empty field
-    except sqlite3.Error as er:  # Handle exceptions
-        tkMessageBox.showinfo("Error Adding", er)
+
+    if len(match_input) > 0:
+        if refused('Error Adding', referenceCache.name_problems(reference.MATCH, match_input)):
+            return
+        write(queries.ADD_MATCH, (match_input,), added,
+              lambda er: tkMessageBox.showinfo("Error Adding", er))  # Handle exceptions
+    else:
+        matchNameEntry.delete(0, END)
 
 
 # This function is called when the user clicks the 'Delete Match' button
 def delete_match_click():
     match_input = matchNameEntry.get()  # Get the user input from the Entry
     if len(match_input) > 0:
-        try:
-            cur.execute('''DELETE FROM match WHERE match_name = ?''', (match_input,))
-            conn.commit()
-            tkMessageBox.showinfo("Delete", match_input + ' deleted!')
-            updateMatchButton['state'] = 'disabled'
-            addMatchButton['state'] = 'normal'
-            searchMatchButton['state'] = 'normal'
-            deleteMatchButton['state'] = 'disabled'
-
-        except sqlite3.Error as er:
-            tkMessageBox.showinfo("Error Deleting", er)
-            updateMatchButton['state'] = 'disabled'
-            addMatchButton['state'] = 'normal'
-            searchMatchButton['state'] = 'normal'
-            deleteMatchButton['state'] = 'disabled'
+        write(queries.DELETE_MATCH, (match_input,),
+              lambda: tkMessageBox.showinfo("Delete", match_input + ' deleted!'),
+              lambda er: tkMessageBox.showinfo("Error Deleting", er))
+        updateMatchButton['state'] = 'disabled'
+        addMatchButton['state'] = 'normal'
+        searchMatchButton['state'] = 'normal'
+        deleteMatchButton['state'] = 'disabled'
 
     matchNameEntry.delete(0, END)
 
@@ -329,19 +170,15 @@ def delete_match_click():
 def update_match_click():
     match_input = matchNameEntry.get()  # Get the user input from the Entry
     if len(match_input) > 0:
-        try:
-            cur.execute("""UPDATE match SET match_name = ? WHERE match_name = ?""", (match_input, updateKey))
-            tkMessageBox.showinfo("Update", 'Record updated!')
-            updateMatchButton['state'] = 'disabled'
-            addMatchButton['state'] = 'normal'
-            searchMatchButton['state'] = 'normal'
-            deleteMatchButton['state'] = 'disabled'
-        except sqlite3.Error as er:
-            tkMessageBox.showinfo("Error Updating", er)
-            updateMatchButton['state'] = 'disabled'
-            addMatchButton['state'] = 'normal'
-            searchMatchButton['state'] = 'normal'
-            deleteMatchButton['state'] = 'disabled'
+        if refused('Error Updating', referenceCache.name_problems(reference.MATCH, match_input, updateKey)):
+            return
+        write(queries.UPDATE_MATCH, (match_input, updateKey),
+              lambda: tkMessageBox.showinfo("Update", 'Record updated!'),
+              lambda er: tkMessageBox.showinfo("Error Updating", er))
+        updateMatchButton['state'] = 'disabled'
+        addMatchButton['state'] = 'normal'
+        searchMatchButton['state'] = 'normal'
+        deleteMatchButton['state'] = 'disabled'
 
     else:
         tkMessageBox.showinfo("Update Failed", 'Cannot be empty!')
@@ -357,15 +194,8 @@ def search_club_click():
     clubAbbr = clubAbbrEntry.get()  # Get the user input from the Entry
     clubLeague = clubLeagueEntry.get()  # Get the user input from the Entry
 
-    cur.execute('''SELECT * FROM club WHERE id LIKE ? AND club_name LIKE ? AND abbr LIKE ? AND league_name LIKE ?'''
-                , ('%' + clubID + '%', '%' + clubName + '%', '%' + clubAbbr + '%', '%' + clubLeague + '%',))
-
-    columns = [column[0] for column in cur.description]  # Get Columns
-    results = []
-    for row in cur.fetchall():
-        results.append(row)
-
-    create_tree(columns, results)  # Create treeview
+    # Empty fields are left out of the search. Words of the ID and name can be typed in any order and without accents
+    resultGrid.show(paging.Search('club', queries.CLUB_SEARCH, [clubID, clubName, clubAbbr, clubLeague], full_text))
 
     clubIDEntry.delete(0, END)  # Empty fields
     clubNameEntry.delete(0, END)
@@ -384,17 +214,17 @@ def add_club_click():
 
     # Nothing can be empty
     if len(clubID) > 0 and len(clubName) > 0 and len(clubAbbr) > 0 and len(clubLeague) > 0:
-        try:
-            cur.execute('''INSERT INTO club(id, club_name, abbr, league_name) VALUES (?, ?, ?, ?)''',
-                        (clubID, clubName, clubAbbr, clubLeague))
-            conn.commit()
+        def added():  # The fields are only emptied once the club is in, so a refused club can be corrected
             tkMessageBox.showinfo("Add Club", 'Club added!')
             clubIDEntry.delete(0, END)
             clubNameEntry.delete(0, END)
             clubAbbrEntry.delete(0, END)
             clubLeagueEntry.delete(0, END)
-        except sqlite3.Error as er:
-            tkMessageBox.showinfo("Error Adding", er)
+
+        if refused('Error Adding', referenceCache.club_problems(clubID, clubLeague)):
+            return
+        write(queries.ADD_CLUB, (clubID, clubName, clubAbbr, clubLeague), added,
+              lambda er: tkMessageBox.showinfo("Error Adding", er))
 
     else:
         tkMessageBox.showinfo('Cannot Insert Club', 'Fields cannot be empty!')
@@ -406,29 +236,17 @@ def delete_club_click():
     clubID = clubIDEntry.get()  # Get the user input from the Entry
 
     if len(clubID) > 0:
-        try:
-            cur.execute('''DELETE FROM club WHERE id = ?''', (clubID,))
-            conn.commit()
-            tkMessageBox.showinfo("Delete Club", clubID + ' deleted!')
-            clubIDEntry.delete(0, END)
-            clubNameEntry.delete(0, END)
-            clubAbbrEntry.delete(0, END)
-            clubLeagueEntry.delete(0, END)
-            updateClubButton['state'] = 'disabled'
-            addClubButton['state'] = 'normal'
-            searchClubButton['state'] = 'normal'
-            deleteClubButton['state'] = 'disabled'
-        except sqlite3.Error as er:
-            tkMessageBox.showinfo("Error Deleting", er)
-            clubIDEntry.delete(0, END)
-            clubNameEntry.delete(0, END)
-            clubAbbrEntry.delete(0, END)
-            
-            clubLeagueEntry.delete(0, END)
-            updateClubButton['state'] = 'disabled'
-            addClubButton['state'] = 'normal'
-            searchClubButton['state'] = 'normal'
-            deleteClubButton['state'] = 'disabled'
+        write(queries.DELETE_CLUB, (clubID,),
+              lambda: tkMessageBox.showinfo("Delete Club", clubID + ' deleted!'),
+              lambda er: tkMessageBox.showinfo("Error Deleting", er))
+        clubIDEntry.delete(0, END)
+        clubNameEntry.delete(0, END)
+        clubAbbrEntry.delete(0, END)
+        clubLeagueEntry.delete(0, END)
+        updateClubButton['state'] = 'disabled'
+        addClubButton['state'] = 'normal'
+        searchClubButton['state'] = 'normal'
+        deleteClubButton['state'] = 'disabled'
 
     else:
         tkMessageBox.showinfo('Cannot Delete Club', 'Club ID cannot be empty!')
@@ -441,20 +259,15 @@ def update_club_click():
     clubAbbr = clubAbbrEntry.get()  # Get the user input from the Entry
     clubLeague = clubLeagueEntry.get()  # Get the user input from the Entry
     if len(clubID) > 0:
-        try:
-            cur.execute("""UPDATE club SET id = ?, club_name = ?, abbr = ?, league_name = ? WHERE id = ?""",
-                        (clubID, clubName, clubAbbr, clubLeague, updateKey))
-            tkMessageBox.showinfo("Update", 'Record updated!')
-            updateClubButton['state'] = 'disabled'
-            addClubButton['state'] = 'normal'
-            searchClubButton['state'] = 'normal'
-            deleteClubButton['state'] = 'disabled'
-        except sqlite3.Error as er:
-            tkMessageBox.showinfo("Error Updating", er)
-            updateClubButton['state'] = 'disabled'
-            addClubButton['state'] = 'normal'
-            searchClubButton['state'] = 'normal'
-            deleteClubButton['state'] = 'disabled'
+        if refused('Error Updating', referenceCache.club_problems(clubID, clubLeague, updateKey)):
+            return
+        write(queries.UPDATE_CLUB, (clubID, clubName, clubAbbr, clubLeague, updateKey),
+              lambda: tkMessageBox.showinfo("Update", 'Record updated!'),
+              lambda er: tkMessageBox.showinfo("Error Updating", er))
+        updateClubButton['state'] = 'disabled'
+        addClubButton['state'] = 'normal'
+        searchClubButton['state'] = 'normal'
+        deleteClubButton['state'] = 'disabled'
 
     else:
         tkMessageBox.showinfo("Update Failed", 'Cannot be empty!')
@@ -479,21 +292,16 @@ def search_game_click():
     seasonYear = seasonYearEntry.get()
     leagueName = gameLeagueEntry.get()
 
-    # execute the search query
-    cur.execute('''SELECT * FROM game WHERE match_name LIKE ? AND team_one LIKE ? AND team_two LIKE ? AND (score_one is null OR score_one
-            LIKE ?) AND  (score_two is null OR score_two LIKE ?) AND game_date LIKE ? AND season_year LIKE ? AND league_name LIKE ?'''
-                , ('%' + matchName + '%', '%' + teamOne + '%', '%' + teamTwo + '%', '%' + scoreOne + '%',
-                   '%' + scoreTwo + '%', '%' + gameDate + '%', '%' + seasonYear + '%', '%' + leagueName + '%'))
-
-    columns = [column[0] for column in cur.description]
-    results = []
-
-    # collect the results
-    for row in cur.fetchall():
-        results.append(row)
-        # print row
+    # build the search query from the fields that are filled in. Scores and years can be a number or a range such as
+    # 1-3, and dates can be partial such as 2015-08
+    try:
+        search = paging.Search('game', queries.GAME_SEARCH, [matchName, gameDate, teamOne, teamTwo, scoreOne, scoreTwo,
+                                                             seasonYear, leagueName])
+    except ValueError as er:
+        tkMessageBox.showinfo('Invalid Search', er)
+        return
 
-    create_tree(columns, results)  # Create the table
+    resultGrid.show(search)  # Show the first page of results, the rest are read as the user scrolls
 
     gameMatchNameEntry.delete(0, END)  # clear the data from the input fields
     gameDateEntry.delete(0, END)
@@ -522,12 +330,7 @@ def add_game_click():
     # The user must insure that the proper fields match the foreign keys constaints
     if len(matchName) > 0 and len(gameDate) > 0 and len(teamOne) > 0 and len(teamTwo) > 0 and len(scoreOne) > 0 and len(
             scoreTwo) > 0 and len(seasonYear) > 0 and len(leagueName) > 0:
-        try:
-            # execute the insert query
-            cur.execute(
-                '''INSERT INTO game(match_name, game_date, team_one, team_two, score_one, score_two, season_year, league_name) VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
-                (matchName, gameDate, teamOne, teamTwo, scoreOne, scoreTwo, seasonYear, leagueName))
-            conn.commit()
+        def added():
             tkMessageBox.showinfo("Add Game", 'Game added!')  # illustrate that the game addition was successful
 
             # clear the input fields
@@ -539,8 +342,12 @@ def add_game_click():
             scoreTwoEntry.delete(0, END)
             seasonYearEntry.delete(0, END)
             gameLeagueEntry.delete(0, END)
-        except sqlite3.Error as er:
-            tkMessageBox.showinfo("Error Adding", er)
+
+        # refuse names that are not in the reference tables, then execute the insert query
+        if refused('Error Adding', referenceCache.game_problems(matchName, teamOne, teamTwo, leagueName, seasonYear)):
+            return
+        write(queries.ADD_GAME, (matchName, gameDate, teamOne, teamTwo, scoreOne, scoreTwo, seasonYear, leagueName),
+              added, lambda er: tkMessageBox.showinfo("Error Adding", er))
 
     else:
         tkMessageBox.showinfo('Cannot Insert game', 'Must Fill all Fields')  # error case if missing input from the user
@@ -558,12 +365,7 @@ def delete_game_click():
 
     # IF the neccessary fields are completed
     if len(matchName) > 0 and len(gameDate) > 0 and len(teamOne) > 0 and len(teamTwo) > 0:
-        try:
-            # execute a delete query
-            cur.execute(
-                '''DELETE FROM game WHERE match_name = ? AND game_date = ? AND team_one = ? AND team_two = ? ''',
-                (matchName, gameDate, teamOne, teamTwo))
-            conn.commit()
+        def deleted():
             updateGameButton['state'] = 'disabled'
             addGameButton['state'] = 'normal'
             searchGameButton['state'] = 'normal'
@@ -578,9 +380,12 @@ def delete_game_click():
             seasonYearEntry.delete(0, END)
             gameLeagueEntry.delete(0, END)
 
-
-        except sqlite3.Error as er:
-            tkMessageBox.showinfo("Error Deleting", er)
+        # the games of an archived season are in a read-only file, execute a delete query otherwise
+        if refused('Error Deleting', ['the season %s is archived' % seasonYearEntry.get()]
+                   if referenceCache.is_archived(seasonYearEntry.get()) else []):
+            return
+        write(queries.DELETE_GAME, (matchName, gameDate, teamOne, teamTwo), deleted,
+              lambda er: tkMessageBox.showinfo("Error Deleting", er))
 
     else:
         tkMessageBox.showinfo('Cannot Delete Game',
@@ -591,8 +396,8 @@ def delete_game_click():
 # This function is called whenever the user double-clicks a record in the treeview. The double click will be used as a
 # way to let the system know that this record will be updated
 def onDoubleClick(event):
-    curItem = tree.focus()  # focus on the tree
-    values = tree.item(curItem)['values']  # get the values in an array or the row double-clicked
+    curItem = resultGrid.tree.focus()  # focus on the tree
+    values = resultGrid.tree.item(curItem)['values']  # get the values in an array or the row double-clicked
     global updateKey  # This is the primary key of the value. To use when updating a row
 
     if updateSection == 'league':  # If you want to update a row from the 'League Section'
@@ -689,28 +494,23 @@ def update_game_click():
 
     # check the fields are completed
     if len(gameMatchName) > 0:
-        try:
-            # query to update the field with the newly input data
-            cur.execute(
-                """UPDATE game SET match_name = ?, team_one = ?, team_two = ?, score_one = ?, score_two = ?, game_date = ?, season_year = ?, league_name = ? WHERE id = ?""",
-                (gameMatchName, teamOne, teamTwo, scoreOne, scoreTwo, gameDate, seasonYear, leagueName, updateKey))
-            # alert to illustrate the record has been added
-            tkMessageBox.showinfo("Update", 'Record updated!')
-
-            # The game update button should only appear once a element is
-            # selected from seach this is completed through toggling the
-            # state of the button to normal when it should be used and diasbled
-            # when the button cannot be used.
-            updateGameButton['state'] = 'disabled'
-            addGameButton['state'] = 'normal'
-            searchGameButton['state'] = 'normal'
-            deleteGameButton['state'] = 'disabled'
-        except sqlite3.Error as er:
-            tkMessageBox.showinfo("Error Updating", er)
-            updateGameButton['state'] = 'disabled'
-            addGameButton['state'] = 'normal'
-            searchGameButton['state'] = 'normal'
-            deleteGameButton['state'] = 'disabled'
+        if refused('Error Updating', referenceCache.game_problems(gameMatchName, teamOne, teamTwo, leagueName,
+                                                                 seasonYear)):
+            return
+        # query to update the field with the newly input data, with an alert to illustrate the record has been added
+        write(queries.UPDATE_GAME, (gameMatchName, teamOne, teamTwo, scoreOne, scoreTwo, gameDate, seasonYear,
+                                    leagueName, updateKey),
+              lambda: tkMessageBox.showinfo("Update", 'Record updated!'),
+              lambda er: tkMessageBox.showinfo("Error Updating", er))
+
+        # The game update button should only appear once a element is
+        # selected from seach this is completed through toggling the
+        # state of the button to normal when it should be used and diasbled
+        # when the button cannot be used.
+        updateGameButton['state'] = 'disabled'
+        addGameButton['state'] = 'normal'
+        searchGameButton['state'] = 'normal'
+        deleteGameButton['state'] = 'disabled'
 
     else:
         tkMessageBox.showinfo("Update Failed", 'Cannot be empty!')
@@ -726,166 +526,435 @@ def update_game_click():
     gameLeagueEntry.delete(0, END)
 
 
-# This function creates the treeview (table) and displays it to the user. There are two ways of creating a tree:
-# 1. If it is a first time: create a treeview normally
-# 2. If there is a tree already created: destroy previous tree and create a new one
-def create_tree(cols, data):
-    global tree  # Tell the method that you'll be using the global variable 'tree' here
-    if tree != NoneType:  # If there's a tree view showing, destroy it and create the new one
-        tree.destroy()  # Destroy the treeview
+# This function is called when the 'Import Games' button is clicked. It adds or updates every game of a CSV or JSON
+# file with the columns of the game table, in one transaction on the writer thread. The games whose clubs, league or
+# match do not exist, or that are in the file twice, are left out and listed with their line
+def import_games_click():
+    path = tkFileDialog.askopenfilename(filetypes=[('Games', '*.csv *.json *.ndjson *.jsonl *.gz'), ('All', '*')])
+    if not path:
+        return  # The user cancelled
+
+    def imported(report):
+        lines = ['line %d: %s' % (line, reason) for line, reason in report.rejected[0:20]]
+        if len(report.rejected) > 20:
+            lines.append('and %d more' % (len(report.rejected) - 20))
+        tkMessageBox.showinfo('Import Games', '\n'.join([str(report)] + lines))
+
+    queryExecutor.submit(rated(lambda conn: fixtures.import_file(conn, path)), imported,
+                         lambda er: tkMessageBox.showinfo('Import Failed', er), write=True, name='import games')
+
+# Standings Listener***************************************************************************************************
+# This function is called when the 'Standings' button is clicked. It shows the league table of the League Name and
+# Season Year typed in the game section: the points, wins, draws, losses, goals and form of every club. The table is
+# kept up to date by the database on every game added, deleted or updated, so it does not add up the games again
+def standings_click():
+    leagueName = gameLeagueEntry.get()
+    seasonYear = seasonYearEntry.get()
+
+    if len(leagueName) > 0 and len(seasonYear) > 0:
+        try:
+            table = standings.Standings(leagueName, seasonYear)
+        except ValueError as er:
+            tkMessageBox.showinfo('Invalid Season', er)
+            return
+
+        resultGrid.show(table)
+        global updateSection
+        updateSection = 'standings'  # The rows of a league table cannot be updated
+    else:
+        tkMessageBox.showinfo('Cannot Show Standings', 'League Name and Season Year cannot be empty!')
+
+
+# Club Records Listeners************************************************************************************************
+# These functions are called by the 'Head to Head', 'Form' and 'Home/Away' buttons of the game section. They take the
+# club keys typed in Team One and Team Two, and find the games of a club whether it was team one or team two
+def head_to_head_click():
+    teamOne = teamOneEntry.get()
+    teamTwo = teamTwoEntry.get()
 
-    tree = ttk.Treeview(columns=cols, show='headings')  # cols is gotten from the cursor
-    tree.pack(expand=YES, fill=BOTH)
+    if len(teamOne) > 0 and len(teamTwo) > 0:
+        resultGrid.show(records.HeadToHead(teamOne, teamTwo))  # Every game between the two clubs, after the total
+        global updateSection
+        updateSection = 'records'  # The rows of a record cannot be updated
+    else:
+        tkMessageBox.showinfo('Cannot Show Head to Head', 'Team One and Team Two cannot be empty!')
 
-    for c in cols:  # Configure column headings
-        tree.heading(c, text=c.title())  # Add the column names to the treeview
-        tree.column(c, width=115, stretch=True)
 
-    for item in data:  # Add data to the tree
-        tree.insert('', 'end', values=item)
+# Shows the last games of the club in Team One, newest first
+def form_click():
+    teamOne = teamOneEntry.get()
 
-    ysb = ttk.Scrollbar(orient=VERTICAL, command=tree.yview)
-    xsb = ttk.Scrollbar(orient=HORIZONTAL, command=tree.xview)
-    tree['yscroll'] = ysb.set
-    tree['xscroll'] = xsb.set
+    if len(teamOne) > 0:
+        resultGrid.show(records.Form(teamOne))
+        global updateSection
+        updateSection = 'records'
+    else:
+        tkMessageBox.showinfo('Cannot Show Form', 'Team One cannot be empty!')
+
+
+# Shows the home and away records of the club in Team One in every season, or only in the Season Year if it is typed
+def home_away_click():
+    teamOne = teamOneEntry.get()
+    seasonYear = seasonYearEntry.get()
 
-    # Places the treeview in row 14 stuck to the WEST
-    tree.grid(row=14, column=0, columnspan=100, sticky=W)
-    tree.bind("<Double-1>", onDoubleClick)  # Bind the double click function to this treeview
+    if len(teamOne) > 0:
+        try:
+            lookup = records.Splits(teamOne, seasonYear)
+        except ValueError as er:
+            tkMessageBox.showinfo('Invalid Season', er)
+            return
+
+        resultGrid.show(lookup)
+        global updateSection
+        updateSection = 'records'
+    else:
+        tkMessageBox.showinfo('Cannot Show Home/Away', 'Team One cannot be empty!')
+
+# Ratings Listener*****************************************************************************************************
+# This function is called when the 'Ratings' button is clicked. It shows the Elo rating of the club in Team One after
+# every date it played, only in the Season Year if it is typed. Without a club it shows the rating of every club at the
+# end of the Season Year, only those of the League Name if it is typed. The ratings are kept by the database and
+# computed again after every write that changes a game, so they are read rather than computed here
+def ratings_click():
+    teamOne = teamOneEntry.get()
+    seasonYear = seasonYearEntry.get()
+    leagueName = gameLeagueEntry.get()
 
+    if len(teamOne) > 0 or len(seasonYear) > 0:
+        try:
+            if len(teamOne) > 0:
+                table = ratings.ClubRatings(teamOne, seasonYear)
+            else:
+                table = ratings.SeasonRatings(seasonYear, leagueName)
+        except ValueError as er:
+            tkMessageBox.showinfo('Invalid Season', er)
+            return
+
+        resultGrid.show(table)
+        global updateSection
+        updateSection = 'ratings'  # The rows of the ratings cannot be updated
+    else:
+        tkMessageBox.showinfo('Cannot Show Ratings', 'Team One or Season Year cannot be empty!')
+
+# Batch Listeners*******************************************************************************************************
+# Rows of the table can be selected together with Shift or Control and a click, and then deleted or given a new league
+# or match name with one click. Each batch is a single transaction, so either every row is changed or, if SQLite
+# refuses one of them, none is. The last batch can be taken back with the 'Undo' button
+
+# Returns the keys of the rows selected in the table, or an empty list after telling the user why there are none
+def selected_keys():
+    if updateSection not in batch.KEYS:
+        tkMessageBox.showinfo('Cannot Change Rows', 'The rows of a standings or record table cannot be changed!')
+        return []
+    keys = [values[0] for values in resultGrid.selected()]  # The 0-th item is always the primary key
+    if len(keys) == 0:
+        tkMessageBox.showinfo('No Rows Selected', 'Select rows of the table first!')
+    return keys
+
+
+# Runs job(conn) on the writer thread, timed under 'name'. It returns the batch.Undo of what it changed, which the
+# 'Undo' button uses
+def run_batch(job, name):
+    def done(undo):
+        global lastUndo
+        lastUndo = undo
+        undoButton['state'] = 'normal'
+        tkMessageBox.showinfo('Batch', 'Done: ' + undo.description)
+        resultGrid.show(resultGrid.search)  # Read the rows again as they are now
+
+    queryExecutor.submit(rated(job), done, lambda er: tkMessageBox.showinfo('Batch Failed', er), write=True,
+                         name=name)
+
+
+# This function is called when the 'Delete Selected' button is clicked
+def delete_selected_click():
+    keys = selected_keys()
+    table = updateSection
+    if keys and tkMessageBox.askyesno('Delete Selected', 'Delete the %d selected row(s)?' % len(keys)):
+        run_batch(lambda conn: batch.delete_rows(conn, table, keys), 'delete selected')
+
+
+# This function is called when the 'Set League' button is clicked. It sets the league of the selected clubs or games
+def set_league_click():
+    set_selected('league_name', 'League Name')
+
+
+# This function is called when the 'Set Match' button is clicked. It sets the match name of the selected games
+def set_match_click():
+    set_selected('match_name', 'Match Name')
+
+
+def set_selected(column, label):
+    table = updateSection
+    if column not in batch.SETTABLE.get(table, []):
+        tkMessageBox.showinfo('Cannot Change Rows', 'The %s of these rows cannot be set!' % label)
+        return
+    keys = selected_keys()
+    if keys:
+        value = tkSimpleDialog.askstring('Set ' + label, '%s of the %d selected row(s):' % (label, len(keys)))
+        kind = reference.LEAGUE if column == 'league_name' else reference.MATCH
+        if value and not refused('Batch Failed', [] if referenceCache.exists(kind, value) else
+                                 ['%s is not a %s' % (value, kind)]):
+            run_batch(lambda conn: batch.set_column(conn, table, column, value, keys), 'set ' + column)
+
+
+# This function is called when the 'Undo' button is clicked. It puts back the rows the last batch changed
+def undo_click():
+    global lastUndo
+    undo = lastUndo
+    lastUndo = None
+    undoButton['state'] = 'disabled'
+
+    def undone(count):
+        message = 'Undone: ' + undo.description
+        if undo.skipped:  # Rows changed again since the batch are left as they are
+            message += '\n%d row(s) changed since were left as they are: %s' % (
+                len(undo.skipped), ', '.join(['%s' % key for key in undo.skipped[0:10]]) +
+                (' ...' if len(undo.skipped) > 10 else ''))
+        tkMessageBox.showinfo('Undo', message)
+        resultGrid.show(resultGrid.search)
+
+    queryExecutor.submit(rated(undo.undo), undone, lambda er: tkMessageBox.showinfo('Undo Failed', er), write=True,
+                         name='undo')
+
+# Export Listener*******************************************************************************************************
+# This function is called when the 'Export' button is clicked. It writes every row of the search shown in the table,
+# not only the rows loaded, to a CSV, NDJSON or Parquet file. The rows are read and written a chunk at a time on a
+# thread of the executor, so a large export neither freezes the window nor fills the memory
+def export_click():
+    search = resultGrid.search
+    if search is None:
+        tkMessageBox.showinfo('Nothing to Export', 'Search something first!')
+        return
+
+    path = tkFileDialog.asksaveasfilename(defaultextension='.csv', filetypes=[
+        ('CSV', '*.csv'), ('Compressed CSV', '*.csv.gz'), ('Newline-delimited JSON', '*.ndjson'),
+        ('Compressed JSON', '*.ndjson.gz'), ('Parquet', '*.parquet')])
+    if not path:
+        return  # The user cancelled
+
+    queryExecutor.submit(lambda conn: export.export_search(conn, search, path),
+                         lambda rows: tkMessageBox.showinfo('Export', '%d row(s) written to %s' % (rows, path)),
+                         lambda er: tkMessageBox.showinfo('Export Failed', er), name='export')
+
+
+# Status Listener*******************************************************************************************************
+# This function is called when the 'Status' button is clicked. It opens a window with the time every action spent
+# waiting for a worker, in the database and in its Tk callback, the time of every statement and of the feed downloads,
+# and the slow-query log with the plan of every slow statement, so a slow window can be told apart from a slow query or
+# a slow network (see footballdb/metrics.py). The numbers can be saved to a JSON file
+def status_click():
+    window = Toplevel(top)
+    window.title('Status')
+    text = Text(window, width=130, height=40, font=('Courier', 9), wrap=NONE)
+    text.grid(row=0, column=0, columnspan=3)
+
+    def refresh():
+        text.delete('1.0', END)
+        text.insert(END, '\n'.join(metrics.RECORDER.report()))
+
+    def save():
+        path = tkFileDialog.asksaveasfilename(defaultextension='.json', filetypes=[('JSON', '*.json')])
+        if path:
+            metrics.RECORDER.dump(path)
+
+    def reset():
+        metrics.RECORDER.reset()
+        refresh()
+
+    Button(window, text='Refresh', command=refresh).grid(row=1, column=0, sticky=W + E)
+    Button(window, text='Save JSON', command=save).grid(row=1, column=1, sticky=W + E)
+    Button(window, text='Reset', command=reset).grid(row=1, column=2, sticky=W + E)
+    refresh()
 
 # GUI CODE STARTS*******************************************************************************************************
-conn = sqlite3.connect('footballdb.sqlite')
-cur = conn.cursor()
-cur.execute('PRAGMA foreign_keys = ON;')
-updateSection = 'league'  # Global variable so when table is double clicked, it knows to which Entries assign values to
-tree = NoneType  # Treeview (Table) as global to destroy it and create it again when necessary
-updateKey = ''  # Global variable to save the table primary key so it can be used to update the record
-
-top = Tk()  # Top frame
-top.minsize(width=1040, height=600)  # Set size
-top.maxsize(width=1040, height=600)  # Set size
-top.resizable(width=True, height=True)
-top.title('Football')
-top.configure(background='forest green')
-
-# Top Title
-searchLabel = Label(top, text='European Football Information Center', background='forest green')
-searchLabel.config(font=("Symbol", 20))
-searchLabel.grid(row=0, column=3, sticky=W, columnspan=2)
-searchLabel.configure(background='forest green', foreground='white')
-
-# Search League GUI Section*********************************************************************************************
-Label(top, text='Leagues', background='forest green', foreground='white').grid(row=1, column=0, sticky=W)
-
-Label(top, text='League Name:', background='forest green', foreground='white').grid(row=2, sticky=W)
-
-searchLeagueEntry = Entry(top)
-searchLeagueEntry.grid(row=2, column=1)
-# searchLeagueEntry.configure(background='forest green')
-
-addLeagueButton = Button(text='Add League', command=add_league_click)
-addLeagueButton.grid(row=3, column=0, sticky=W + E + N + S, columnspan=2)
-addLeagueButton.configure(background='forest green', foreground='white')
-searchLeagueButton = Button(text='Search League', command=search_league_click)
-searchLeagueButton.grid(row=4, column=0, sticky=W + E + N + S, columnspan=2)
-deleteLeagueButton = Button(text='Delete League', state=DISABLED, command=delete_league_click)
-deleteLeagueButton.grid(row=5, column=0, sticky=W + E + N + S, columnspan=2)
-updateLeagueButton = Button(text='Update League', state=DISABLED, command=update_league_click)
-updateLeagueButton.grid(row=6, column=0, sticky=W + E + N + S, columnspan=2)
-
-# Search Match GUI Section**********************************************************************************************
-Label(top, text='Matches', background='forest green', foreground='white').grid(row=7, column=0, sticky=W)
-
-Label(top, text='Match Name:', background='forest green', foreground='white').grid(row=8, column=0, sticky=W)
-matchNameEntry = Entry(top)
-matchNameEntry.grid(row=8, column=1)
-
-addMatchButton = Button(text='Add Match', command=add_match_click)
-addMatchButton.grid(row=9, column=0, columnspan=2, sticky=W + E + N + S)
-searchMatchButton = Button(text='Search Match', command=search_match_click)
-searchMatchButton.grid(row=10, column=0, sticky=W + E + N + S, columnspan=2)
-deleteMatchButton = Button(text='Delete Match', state=DISABLED, command=delete_match_click)
-deleteMatchButton.grid(row=11, column=0, sticky=W + E + N + S, columnspan=2)
-updateMatchButton = Button(text='Update Match', state=DISABLED, command=update_match_click)
-updateMatchButton.grid(row=12, column=0, sticky=W + E + N + S, columnspan=2)
-
-# Search Club GUI Section***********************************************************************************************
-Label(top, text='Clubs', background='forest green', foreground='white').grid(row=1, column=2, sticky=W)
-
-Label(top, text='Club ID:', background='forest green', foreground='white').grid(row=2, column=3, sticky=W)
-clubIDEntry = Entry(top)
-clubIDEntry.grid(row=2, column=4)
-
-Label(top, text='Club Name:', background='forest green', foreground='white').grid(row=3, column=3, sticky=W)
-clubNameEntry = Entry(top)
-clubNameEntry.grid(row=3, column=4)
-
-Label(top, text='Club Abbr:', background='forest green', foreground='white').grid(row=4, column=3, sticky=W)
-clubAbbrEntry = Entry(top)
-clubAbbrEntry.grid(row=4, column=4)
-
-Label(top, text='League Name:', background='forest green', foreground='white').grid(row=5, column=3, sticky=W)
-clubLeagueEntry = Entry(top)
-clubLeagueEntry.grid(row=5, column=4)
-
-addClubButton = Button(text='Add Club', command=add_club_click)
-addClubButton.grid(row=7, column=3, columnspan=2, sticky=W + E + N + S)
-searchClubButton = Button(text='Search Club', command=search_club_click)
-searchClubButton.grid(row=8, column=3, sticky=W + E + N + S, columnspan=2)
-deleteClubButton = Button(text='Delete Club', state=DISABLED, command=delete_club_click)
-deleteClubButton.grid(row=9, column=3, sticky=W + E + N + S, columnspan=2)
-updateClubButton = Button(text='Update Club', state=DISABLED, command=update_club_click)
-updateClubButton.grid(row=10, column=3, sticky=W + E + N + S, columnspan=2)
-
-# Search Game GUI Section***********************************************************************************************
-Label(top, text='Games', background='forest green', foreground='white').grid(row=1, column=6, sticky=W)
-
-Label(top, text='Match Name:', background='forest green', foreground='white').grid(row=2, column=7, sticky=W)
-gameMatchNameEntry = Entry(top)
-gameMatchNameEntry.grid(row=2, column=8)
-
-Label(top, text='Game Date:', background='forest green', foreground='white').grid(row=3, column=7, sticky=W)
-gameDateEntry = Entry(top)
-gameDateEntry.grid(row=3, column=8)
-
-Label(top, text='Team One:', background='forest green', foreground='white').grid(row=4, column=7, sticky=W)
-teamOneEntry = Entry(top)
-teamOneEntry.grid(row=4, column=8)
-
-Label(top, text='Team Two:', background='forest green', foreground='white').grid(row=5, column=7, sticky=W)
-teamTwoEntry = Entry(top)
-teamTwoEntry.grid(row=5, column=8)
-
-Label(top, text='Score One:', background='forest green', foreground='white').grid(row=6, column=7, sticky=W)
-scoreOneEntry = Entry(top)
-scoreOneEntry.grid(row=6, column=8)
-
-Label(top, text='Score Two:', background='forest green', foreground='white').grid(row=7, column=7, sticky=W)
-scoreTwoEntry = Entry(top)
-scoreTwoEntry.grid(row=7, column=8)
-
-Label(top, text='Season Year:', background='forest green', foreground='white').grid(row=8, column=7, sticky=W)
-seasonYearEntry = Entry(top)
-seasonYearEntry.grid(row=8, column=8)
-
-Label(top, text='League Name:', background='forest green', foreground='white').grid(row=9, column=7, sticky=W)
-gameLeagueEntry = Entry(top)
-gameLeagueEntry.grid(row=9, column=8)
-
-addGameButton = Button(text='Add Game', background='forest green', foreground='white', command=add_game_click)
-addGameButton.grid(row=10, column=7, columnspan=2, sticky=W + E + N + S)
-searchGameButton = Button(text='Search Game', command=search_game_click)
-searchGameButton.grid(row=11, column=7, sticky=W + E + N + S, columnspan=2)
-deleteGameButton = Button(text='Delete Game', background='forest green', foreground='white', state=DISABLED,
-                          command=delete_game_click)
-deleteGameButton.grid(row=12, column=7, sticky=W + E + N + S, columnspan=2)
-updateGameButton = Button(text='Update Game', state=DISABLED, command=update_game_click)
-updateGameButton.grid(row=13, column=7, sticky=W + E + N + S, columnspan=2)
-
-top.mainloop()  # GUI Main Loop
-
-# Close Connections
-cur.close()
-conn.commit()
-conn.close()
+# Nothing runs when this file is imported, only when it is started, so the functions above can be reused and the
+# worker processes of the loader can import it. footballdb/cli.py does the same work from the command line, without Tk
+if __name__ == '__main__':
+    # Connect to the DB, creating or upgrading its tables, then download the feeds of footballdb/catalogue.py that may
+    # have changed and insert the changed ones. Feeds that have not changed since the last launch are skipped, and each
+    # feed is committed on its own. See footballdb/loader.py for the feed cache and the offline mirror
+    metrics.RECORDER.slow_log = slow_query_log
+    conn = loader.open_database(loader.DATABASE, full_reload)
+    full_text = schema.has_full_text(conn)  # Club and match names are searched with the full-text index if there is one
+    loader.load_feeds(conn, force=full_reload)
+    conn.close()
+
+    # Global variable so when table is double clicked, it knows to which Entries assign values to
+    updateSection = 'league'
+    updateKey = ''  # Global variable to save the table primary key so it can be used to update the record
+    lastUndo = None  # The batch.Undo of the last batch of changes to the selected rows, until it is undone
+
+    top = Tk()  # Top frame
+    top.minsize(width=1040, height=600)  # Set size
+    top.maxsize(width=1040, height=600)  # Set size
+    top.resizable(width=True, height=True)
+    top.title('Football')
+    top.configure(background='forest green')
+
+    # Searches and the add, delete and update buttons run their queries on the threads of this executor, each with its
+    # own connection with the foreign keys turned on. Their results come back to the main loop through top.after()
+    # The names of the leagues and matches and the keys of the clubs are kept in memory, read again after every write.
+    # The fields below complete them as they are typed, and the adds and updates are checked against them first
+    referenceCache = reference.ReferenceCache()
+    queryExecutor = executor.QueryExecutor(top, loader.DATABASE, on_write=reference_tables_changed)
+    referenceCache.refresh(queryExecutor)
+
+    # Top Title
+    searchLabel = Label(top, text='European Football Information Center', background='forest green')
+    searchLabel.config(font=("Symbol", 20))
+    searchLabel.grid(row=0, column=3, sticky=W, columnspan=2)
+    searchLabel.configure(background='forest green', foreground='white')
+    statusButton = Button(text='Status', command=status_click)
+    statusButton.grid(row=0, column=8, sticky=E)
+
+    # Search League GUI Section*****************************************************************************************
+    Label(top, text='Leagues', background='forest green', foreground='white').grid(row=1, column=0, sticky=W)
+
+    Label(top, text='League Name:', background='forest green', foreground='white').grid(row=2, sticky=W)
+
+    searchLeagueEntry = ttk.Combobox(top)
+    reference.complete_field(searchLeagueEntry, referenceCache, reference.LEAGUE)
+    searchLeagueEntry.grid(row=2, column=1)
+    # searchLeagueEntry.configure(background='forest green')
+
+    addLeagueButton = Button(text='Add League', command=add_league_click)
+    addLeagueButton.grid(row=3, column=0, sticky=W + E + N + S, columnspan=2)
+    addLeagueButton.configure(background='forest green', foreground='white')
+    searchLeagueButton = Button(text='Search League', command=search_league_click)
+    searchLeagueButton.grid(row=4, column=0, sticky=W + E + N + S, columnspan=2)
+    deleteLeagueButton = Button(text='Delete League', state=DISABLED, command=delete_league_click)
+    deleteLeagueButton.grid(row=5, column=0, sticky=W + E + N + S, columnspan=2)
+    updateLeagueButton = Button(text='Update League', state=DISABLED, command=update_league_click)
+    updateLeagueButton.grid(row=6, column=0, sticky=W + E + N + S, columnspan=2)
+
+    # Search Match GUI Section******************************************************************************************
+    Label(top, text='Matches', background='forest green', foreground='white').grid(row=7, column=0, sticky=W)
+
+    Label(top, text='Match Name:', background='forest green', foreground='white').grid(row=8, column=0, sticky=W)
+    matchNameEntry = ttk.Combobox(top)
+    reference.complete_field(matchNameEntry, referenceCache, reference.MATCH)
+    matchNameEntry.grid(row=8, column=1)
+
+    addMatchButton = Button(text='Add Match', command=add_match_click)
+    addMatchButton.grid(row=9, column=0, columnspan=2, sticky=W + E + N + S)
+    searchMatchButton = Button(text='Search Match', command=search_match_click)
+    searchMatchButton.grid(row=10, column=0, sticky=W + E + N + S, columnspan=2)
+    deleteMatchButton = Button(text='Delete Match', state=DISABLED, command=delete_match_click)
+    deleteMatchButton.grid(row=11, column=0, sticky=W + E + N + S, columnspan=2)
+    updateMatchButton = Button(text='Update Match', state=DISABLED, command=update_match_click)
+    updateMatchButton.grid(row=12, column=0, sticky=W + E + N + S, columnspan=2)
+
+    # Search Club GUI Section*******************************************************************************************
+    Label(top, text='Clubs', background='forest green', foreground='white').grid(row=1, column=2, sticky=W)
+
+    Label(top, text='Club ID:', background='forest green', foreground='white').grid(row=2, column=3, sticky=W)
+    clubIDEntry = ttk.Combobox(top)
+    reference.complete_field(clubIDEntry, referenceCache, reference.CLUB)
+    clubIDEntry.grid(row=2, column=4)
+
+    Label(top, text='Club Name:', background='forest green', foreground='white').grid(row=3, column=3, sticky=W)
+    clubNameEntry = Entry(top)
+    clubNameEntry.grid(row=3, column=4)
+
+    Label(top, text='Club Abbr:', background='forest green', foreground='white').grid(row=4, column=3, sticky=W)
+    clubAbbrEntry = Entry(top)
+    clubAbbrEntry.grid(row=4, column=4)
+
+    Label(top, text='League Name:', background='forest green', foreground='white').grid(row=5, column=3, sticky=W)
+    clubLeagueEntry = ttk.Combobox(top)
+    reference.complete_field(clubLeagueEntry, referenceCache, reference.LEAGUE)
+    clubLeagueEntry.grid(row=5, column=4)
+
+    addClubButton = Button(text='Add Club', command=add_club_click)
+    addClubButton.grid(row=7, column=3, columnspan=2, sticky=W + E + N + S)
+    searchClubButton = Button(text='Search Club', command=search_club_click)
+    searchClubButton.grid(row=8, column=3, sticky=W + E + N + S, columnspan=2)
+    deleteClubButton = Button(text='Delete Club', state=DISABLED, command=delete_club_click)
+    deleteClubButton.grid(row=9, column=3, sticky=W + E + N + S, columnspan=2)
+    updateClubButton = Button(text='Update Club', state=DISABLED, command=update_club_click)
+    updateClubButton.grid(row=10, column=3, sticky=W + E + N + S, columnspan=2)
+
+    # Search Game GUI Section*******************************************************************************************
+    Label(top, text='Games', background='forest green', foreground='white').grid(row=1, column=6, sticky=W)
+
+    Label(top, text='Match Name:', background='forest green', foreground='white').grid(row=2, column=7, sticky=W)
+    gameMatchNameEntry = ttk.Combobox(top)
+    reference.complete_field(gameMatchNameEntry, referenceCache, reference.MATCH)
+    gameMatchNameEntry.grid(row=2, column=8)
+
+    Label(top, text='Game Date:', background='forest green', foreground='white').grid(row=3, column=7, sticky=W)
+    gameDateEntry = Entry(top)
+    gameDateEntry.grid(row=3, column=8)
+
+    Label(top, text='Team One:', background='forest green', foreground='white').grid(row=4, column=7, sticky=W)
+    teamOneEntry = ttk.Combobox(top)
+    reference.complete_field(teamOneEntry, referenceCache, reference.CLUB)
+    teamOneEntry.grid(row=4, column=8)
+
+    Label(top, text='Team Two:', background='forest green', foreground='white').grid(row=5, column=7, sticky=W)
+    teamTwoEntry = ttk.Combobox(top)
+    reference.complete_field(teamTwoEntry, referenceCache, reference.CLUB)
+    teamTwoEntry.grid(row=5, column=8)
+
+    Label(top, text='Score One:', background='forest green', foreground='white').grid(row=6, column=7, sticky=W)
+    scoreOneEntry = Entry(top)
+    scoreOneEntry.grid(row=6, column=8)
+
+    Label(top, text='Score Two:', background='forest green', foreground='white').grid(row=7, column=7, sticky=W)
+    scoreTwoEntry = Entry(top)
+    scoreTwoEntry.grid(row=7, column=8)
+
+    Label(top, text='Season Year:', background='forest green', foreground='white').grid(row=8, column=7, sticky=W)
+    seasonYearEntry = ttk.Combobox(top, postcommand=lambda: seasonYearEntry.configure(
+        values=referenceCache.seasons(teamOneEntry.get())))  # The seasons of Team One
+    seasonYearEntry.grid(row=8, column=8)
+
+    Label(top, text='League Name:', background='forest green', foreground='white').grid(row=9, column=7, sticky=W)
+    gameLeagueEntry = ttk.Combobox(top)
+    reference.complete_field(gameLeagueEntry, referenceCache, reference.LEAGUE)
+    gameLeagueEntry.grid(row=9, column=8)
+
+    addGameButton = Button(text='Add Game', background='forest green', foreground='white', command=add_game_click)
+    addGameButton.grid(row=10, column=7, columnspan=2, sticky=W + E + N + S)
+    searchGameButton = Button(text='Search Game', command=search_game_click)
+    searchGameButton.grid(row=11, column=7, sticky=W + E + N + S, columnspan=2)
+    deleteGameButton = Button(text='Delete Game', background='forest green', foreground='white', state=DISABLED,
+                              command=delete_game_click)
+    deleteGameButton.grid(row=12, column=7, sticky=W + E + N + S, columnspan=2)
+    updateGameButton = Button(text='Update Game', state=DISABLED, command=update_game_click)
+    updateGameButton.grid(row=13, column=7, sticky=W + E + N + S, columnspan=2)
+    importGamesButton = Button(text='Import Games', command=import_games_click)
+    importGamesButton.grid(row=9, column=6, sticky=W + E + N + S)
+    ratingsButton = Button(text='Ratings', command=ratings_click)
+    ratingsButton.grid(row=8, column=6, sticky=W + E + N + S)
+    standingsButton = Button(text='Standings', command=standings_click)
+    standingsButton.grid(row=10, column=6, sticky=W + E + N + S)
+    headToHeadButton = Button(text='Head to Head', command=head_to_head_click)
+    headToHeadButton.grid(row=11, column=6, sticky=W + E + N + S)
+    formButton = Button(text='Form', command=form_click)
+    formButton.grid(row=12, column=6, sticky=W + E + N + S)
+    homeAwayButton = Button(text='Home/Away', command=home_away_click)
+    homeAwayButton.grid(row=13, column=6, sticky=W + E + N + S)
+
+    # Results Table*****************************************************************************************************
+    # The table below the sections, in row 14, that every search shows its results in. It only holds the rows near the
+    # ones in view and reads more as the user scrolls
+    resultGrid = resultgrid.ResultGrid(top, queryExecutor, onDoubleClick)
+    exportButton = Button(text='Export', command=export_click)
+    exportButton.grid(row=12, column=3, sticky=W + E + N + S, columnspan=2)
+
+    # Batch Buttons, for the rows selected in the table
+    deleteSelectedButton = Button(text='Delete Selected', command=delete_selected_click)
+    deleteSelectedButton.grid(row=11, column=3, sticky=W + E + N + S, columnspan=2)
+    undoButton = Button(text='Undo', state=DISABLED, command=undo_click)
+    undoButton.grid(row=13, column=3, sticky=W + E + N + S, columnspan=2)
+    setLeagueButton = Button(text='Set League', command=set_league_click)
+    setLeagueButton.grid(row=13, column=0, sticky=W + E + N + S)
+    setMatchButton = Button(text='Set Match', command=set_match_click)
+    setMatchButton.grid(row=13, column=1, sticky=W + E + N + S)
+
+    top.mainloop()  # GUI Main Loop
+
+    # Close Connections
+    queryExecutor.close()
@@ -0,0 +1,66 @@
+"""
+Benchmark for exporting a large game table. A database of synthetic games is written once, then exported to every
+format with export.export_table, which reads the cursor a chunk at a time, and to CSV after reading the whole result
+with fetchall as the search handlers used to. The peak of the memory allocated by Python is measured for each with
+tracemalloc (Python 3).
+
+Usage: python benchmarks/bench_export.py [--games 500000]
+"""
+import argparse
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_ingest import fresh_database, synthetic_feeds
+from footballdb import export, ingest
+
+
+def fetchall(conn, path):
+    cursor = conn.execute(export.TABLES['game'].sql)
+    rows = cursor.fetchall()
+    with open(path, 'w', newline='') as output:
+        writer = csv.writer(output)
+        writer.writerow([column[0] for column in cursor.description])
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the memory and speed of exporting games.')
+    parser.add_argument('--games', type=int, default=500000, help='number of games in the database')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        conn = fresh_database(os.path.join(directory, 'bench.sqlite'))
+        with ingest.bulk_load(conn):
+            for season, data in synthetic_feeds(args.games, 100000):
+                with conn:
+                    ingest.write_matches(conn, data, season)
+
+        runs = [('fetchall', 'fetchall.csv', fetchall)]
+        for name in ('games.csv', 'games.csv.gz', 'games.ndjson', 'games.ndjson.gz'):
+            runs.append((name, name, lambda conn, path: export.export_table(conn, 'game', path)))
+        for name, file_name, run in runs:
+            path = os.path.join(directory, file_name)
+            tracemalloc.start()
+            start = time.time()
+            run(conn, path)
+            elapsed = time.time() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            size = os.path.getsize(path)
+            print('%-16s %7.3fs, %6.1f MB written (%5.1f MB/s), peak memory %7.1f MB' % (
+                name, elapsed, size / 1e6, size / 1e6 / elapsed, peak / 1e6))
+        conn.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark for the startup download stage. A local HTTP server stands in for raw.githubusercontent.com and waits a
+fixed amount of time before answering every request, so the numbers do not depend on the real network. The same 16
+feeds are then downloaded one after another, the way Football.py used to, and through feeds.fetch_all.
+
+Usage: python benchmarks/bench_fetch.py [--latency 0.25] [--feeds 16] [--workers 8]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+try:  # Python 2
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+except ImportError:  # Python 3
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+
+from footballdb import feeds
+
+# A feed shaped like the openfootball match files, big enough that the body is not free to send
+FEED_BODY = json.dumps({
+    'name': 'Benchmark League 2015/16',
+    'rounds': [{'name': 'Round %d' % r,
+                'matches': [{'date': '2015-08-08', 'team1': {'key': 'home%d' % m}, 'team2': {'key': 'away%d' % m},
+                             'score1': 1, 'score2': 0} for m in range(10)]} for r in range(38)]
+}).encode('utf-8')
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+# Answers every GET with the same feed after sleeping for the injected latency
+class SlowFeedHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(FEED_BODY)))
+        self.end_headers()
+        self.wfile.write(FEED_BODY)
+
+    def log_message(self, *args):
+        pass  # Keep the benchmark output readable
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare serial and concurrent feed downloads.')
+    parser.add_argument('--latency', type=float, default=0.25, help='seconds the stand-in server waits per request')
+    parser.add_argument('--feeds', type=int, default=16, help='number of feeds to download')
+    parser.add_argument('--workers', type=int, default=feeds.MAX_WORKERS, help='concurrent downloads')
+    args = parser.parse_args()
+
+    SlowFeedHandler.latency = args.latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SlowFeedHandler)
+    server_thread = threading.Thread(target=server.serve_forever)
+    server_thread.daemon = True
+    server_thread.start()
+
+    base = 'http://127.0.0.1:%d/' % server.server_address[1]
+    urls = [base + 'feed%d.json' % i for i in range(args.feeds)]
+
+    try:
+        start = time.time()
+        for url in urls:
+            json.loads(feeds.fetch_feed(url).body.decode('utf-8'))
+        serial = time.time() - start
+
+        start = time.time()
+        responses = feeds.fetch_all(urls, max_workers=args.workers)
+        for url in urls:
+            json.loads(responses[url].body.decode('utf-8'))
+        concurrent = time.time() - start
+    finally:
+        server.shutdown()
+
+    print('feeds: %d, latency: %.3fs, workers: %d' % (args.feeds, args.latency, args.workers))
+    print('serial:     %.3fs' % serial)
+    print('concurrent: %.3fs' % concurrent)
+    print('speedup:    %.1fx' % (serial / concurrent))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark for writing games. A synthetic matches feed with the requested number of games is written into a fresh
+database twice: execute() per game and a commit per feed the way Football.py used to, and through ingest.write_matches
+with a transaction per feed inside ingest.bulk_load. Each load is then repeated over the full database, which is what a
+re-sync of changed feeds costs.
+
+Usage: python benchmarks/bench_ingest.py [--games 100000] [--per-feed 380]
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import sqlite3
+
+from footballdb import ingest, schema
+
+
+# Builds matches feeds shaped like the openfootball files, 'per_feed' games per season, 10 games per weekly round
+def synthetic_feeds(games, per_feed):
+    feeds = []
+    for start in range(0, games, per_feed):
+        season = 1900 + len(feeds)
+        count = min(per_feed, games - start)
+        rounds = []
+        for number in range(0, count, 10):
+            rounds.append({'name': 'Round %d' % (number // 10 + 1), 'matches': [
+                {'date': str(datetime.date(season, 1, 1) + datetime.timedelta(days=7 * (number // 10))),
+                 'team1': {'key': 'club%d' % (2 * i)}, 'team2': {'key': 'club%d' % (2 * i + 1)},
+                 'score1': i % 4, 'score2': (number + i) % 3} for i in range(min(10, count - number))]})
+        feeds.append((season, {'name': 'Benchmark League %d/%02d' % (season, (season + 1) % 100), 'rounds': rounds}))
+    return feeds
+
+
+# Creates an empty database with the league and clubs the synthetic games refer to
+def fresh_database(path):
+    conn = sqlite3.connect(path)
+    schema.migrate(conn)
+    conn.execute('PRAGMA foreign_keys = ON')
+    with conn:
+        ingest.write_clubs(conn, {'name': 'Benchmark League 2015/16', 'clubs': [
+            {'key': 'club%d' % i, 'name': 'Club %d' % i, 'code': 'C%02d' % i} for i in range(20)]}, 2015)
+    return conn
+
+
+# The loop Football.py used before the bulk path: an update and an insert statement per game
+def per_row(conn, feeds):
+    cur = conn.cursor()
+    for season, data in feeds:
+        league = ingest.league_name(data)
+        for match in data['rounds']:
+            cur.execute('''INSERT OR IGNORE INTO match(match_name) VALUES(?)''', (match['name'],))
+            for item in match['matches']:
+                row = (item['team1']['key'], item['team2']['key'], item['score1'], item['score2'], item['date'],
+                       match['name'], season, league)
+                cur.execute(ingest.UPDATE_GAME, (row[2], row[3], row[5], row[6], row[7], row[0], row[1], row[4],
+                                                 row[2], row[3], row[5], row[6], row[7]))
+                cur.execute(ingest.INSERT_GAME, row)
+        conn.commit()
+
+
+def bulk(conn, feeds):
+    with ingest.bulk_load(conn):
+        for season, data in feeds:
+            with conn:
+                ingest.write_matches(conn, data, season)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-row and executemany game inserts.')
+    parser.add_argument('--games', type=int, default=100000, help='total number of games')
+    parser.add_argument('--per-feed', type=int, default=380, help='games per feed (one season of one league)')
+    args = parser.parse_args()
+
+    feeds = synthetic_feeds(args.games, args.per_feed)
+    directory = tempfile.mkdtemp()
+    try:
+        results = []
+        for name, load in (('per-row', per_row), ('bulk', bulk)):
+            conn = fresh_database(os.path.join(directory, name + '.sqlite'))
+            start = time.time()
+            load(conn, feeds)
+            elapsed = time.time() - start
+            start = time.time()
+            load(conn, feeds)
+            again = time.time() - start
+            count = conn.execute('SELECT COUNT(*) FROM game').fetchone()[0]
+            conn.close()
+            results.append((elapsed, again))
+            print('%-8s %8d games: load %7.3fs (%d games/s), reload %7.3fs' % (name, count, elapsed,
+                                                                             count / elapsed, again))
+        print('speedup: load %.1fx, reload %.1fx' % (results[0][0] / results[1][0], results[0][1] / results[1][1]))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark for loading a large catalogue. Synthetic clubs and matches feeds for many competitions and seasons, made by
+synthetic.py, are written to a folder laid out like the openfootball repository, and loaded through sync.sync_feeds
+with that folder as the mirror: once with the rows built in this process while the feeds are streamed, and once with
+the rows built in a pool of worker processes.
+
+Usage: python benchmarks/bench_pipeline.py [--competitions 10] [--seasons 10] [--processes N]
+"""
+import argparse
+import functools
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from footballdb import catalogue, feeds, schema, sync
+from synthetic import write_mirror
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare loading a catalogue in one process and in a pool.')
+    parser.add_argument('--competitions', type=int, default=10, help='number of competitions')
+    parser.add_argument('--seasons', type=int, default=10, help='number of seasons of every competition')
+    parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count(), help='worker processes')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        seasons = list(range(2000, 2000 + args.seasons))
+        codes = write_mirror(os.path.join(directory, 'mirror'), args.competitions, seasons)
+        feed_list = catalogue.feed_list(codes, seasons)
+        fetch_all = functools.partial(feeds.fetch_all, mirror=os.path.join(directory, 'mirror'))
+
+        results = []
+        for name, processes in (('serial', None), ('pool', args.processes)):
+            conn = sqlite3.connect(os.path.join(directory, name + '.sqlite'))
+            schema.migrate(conn)
+            start = time.time()
+            sync.sync_feeds(conn, feed_list, fetch_all=fetch_all, processes=processes)
+            elapsed = time.time() - start
+            count = conn.execute('SELECT COUNT(*) FROM game').fetchone()[0]
+            conn.close()
+            results.append(elapsed)
+            print('%-6s %4d feeds, %7d games: %7.3fs (%s processes)' % (name, len(feed_list), count, elapsed,
+                                                                      processes or 1))
+        print('speedup: %.1fx' % (results[0] / results[1]))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
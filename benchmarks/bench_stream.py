@@ -0,0 +1,63 @@
+"""
+Benchmark for loading one large matches feed. The feed is written to a file and loaded into a fresh database twice:
+read whole and decoded with json.loads before ingest.write_matches, and read as it is parsed with
+ingest.stream_matches. The peak of the memory allocated by Python is measured for each with tracemalloc (Python 3).
+
+Usage: python benchmarks/bench_stream.py [--games 200000] [--batch-size 1000]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_ingest import fresh_database, synthetic_feeds
+from footballdb import ingest
+
+
+def whole(conn, path, batch_size):
+    with open(path, 'rb') as feed:
+        ingest.write_matches(conn, json.loads(feed.read().decode('utf-8')), 2015)
+
+
+def streamed(conn, path, batch_size):
+    with open(path, 'rb') as feed:
+        ingest.stream_matches(conn, feed, 2015, batch_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the memory of loading a feed whole and streamed.')
+    parser.add_argument('--games', type=int, default=200000, help='number of games in the feed')
+    parser.add_argument('--batch-size', type=int, default=ingest.BATCH_SIZE, help='games written at a time')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'feed.json')
+        with open(path, 'w') as feed:
+            json.dump(synthetic_feeds(args.games, args.games)[0][1], feed)
+        print('feed: %d games, %.1f MB' % (args.games, os.path.getsize(path) / 1e6))
+
+        for name, load in (('whole', whole), ('streamed', streamed)):
+            conn = fresh_database(os.path.join(directory, name + '.sqlite'))
+            tracemalloc.start()
+            start = time.time()
+            with conn:
+                load(conn, path, args.batch_size)
+            elapsed = time.time() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            count = conn.execute('SELECT COUNT(*) FROM game').fetchone()[0]
+            conn.close()
+            print('%-8s %8d games: %7.3fs, peak memory %7.1f MB' % (name, count, elapsed, peak / 1e6))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+"""
+The benchmark suite. A database is loaded from synthetic feeds (see synthetic.py) through sync.sync_feeds and a mirror,
+the way the application loads the openfootball feeds, and every scenario is then timed on it: the SQL of every search
+handler of Football.py and of the pages read as the table scrolls, the club records, the standings, the exports, with
+NumPy the snapshot and its analytics and, when there is a display, filling the Treeview of the result table. Every
+scenario but the loads is run --repeat times.
+
+The results are written as JSON with the commit, the versions and the sizes they were measured with. Given the file of
+another commit with --compare, the median of every scenario is compared with it, and the exit status is 1 if one is
+slower by more than --tolerance.
+
+Usage: python benchmarks/suite.py [--leagues 10] [--seasons 5] [--clubs 20] [--repeat 5] [--output FILE]
+                                  [--compare BASELINE] [--tolerance 1.25]
+"""
+import argparse
+import functools
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from footballdb import (analytics, catalogue, export, feeds, metrics, paging, pool, queries, records, schema, snapshot,
+                        standings, sync)
+from synthetic import CLUBS, FIRST_SEASON, SEED, league_code, write_mirror
+
+VERSION = 1  # Of the JSON written, changed if its layout changes
+MIN_RUN = 0.05  # Seconds a run lasts at least: a quick scenario is called as many times as that takes, like timeit does
+
+
+# Returns the commit the suite runs on, or None outside of a git checkout
+def git_commit():
+    try:
+        output = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                         cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.STDOUT)
+        return output.decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Times function() 'repeat' times. A run calls it 'number' times, enough to last MIN_RUN, unless 'calibrate' is False.
+# Returns the result of the scenario: the seconds of one call in every run, the best and the median, and the rows the
+# last call returned
+def measure(function, repeat, calibrate=True):
+    number = 1
+    while calibrate:
+        start = metrics.clock()
+        for call in range(number):
+            function()
+        if metrics.clock() - start >= MIN_RUN:
+            break
+        number *= 2
+    runs = []
+    rows = None
+    for run in range(repeat):
+        start = metrics.clock()
+        for call in range(number):
+            rows = function()
+        runs.append((metrics.clock() - start) / number)
+    ordered = sorted(runs)
+    return {'runs': [round(run, 7) for run in runs], 'best': round(ordered[0], 7),
+            'median': round(ordered[len(ordered) // 2], 7), 'number': number, 'rows': rows}
+
+
+# The number of games of the database
+def count_games(conn):
+    return conn.execute('SELECT COUNT(*) FROM games').fetchone()[0]
+
+
+# The loads: the whole catalogue into an empty database, every feed again although none changed, and a launch within
+# sync.MAX_AGE that asks for nothing. Returns their results and the time of every stage of the first load, as
+# metrics.RECORDER measured it
+def ingest_scenarios(conn, feed_list, mirror):
+    fetch_all = functools.partial(feeds.fetch_all, mirror=mirror)
+
+    def load(force=False):
+        return len(sync.sync_feeds(conn, feed_list, force=force, fetch_all=fetch_all))
+
+    results = {}
+    metrics.RECORDER.reset()
+    results['ingest/load'] = measure(load, 1, False)
+    stages = {}
+    for stat in metrics.RECORDER.snapshot()['stats']:
+        if stat['kind'] in (metrics.NETWORK, metrics.PARSE, metrics.INSERT):
+            stages['%s/%s' % (stat['kind'], stat['name'])] = {'ms': stat['total_ms'], 'rows': stat['rows'],
+                                                              'bytes': stat['bytes']}
+    results['ingest/reload'] = measure(lambda: load(force=True), 1, False)
+    results['ingest/warm start'] = measure(load, 1, False)
+    return results, stages
+
+
+# The first page of a search, as the search buttons of Football.py read it
+def search_page(conn, table, spec, values, full_text=False, after=None):
+    return len(paging.Search(table, spec, values, full_text).page(conn, after=after)[1])
+
+
+# Every league table of every season, as if the Standings button were clicked for each. Returns the number of rows
+def every_table(conn):
+    tables = conn.execute('''SELECT DISTINCT league_name, season_year FROM standing JOIN leagues USING (league_id)''')
+    return sum([len(standings.league_table(conn, league_name, season_year))
+                for league_name, season_year in tables.fetchall()])
+
+
+# Returns [(name, function(conn))] of the searches of every search button of Football.py, with what a user would type
+# in each field, and of the lookups of the game section
+def query_scenarios(conn, seasons):
+    league = 'Synthetic League 1'
+    club = league_code(1) + '-club5'
+    opponent = league_code(1) + '-club7'
+    year = str(seasons[0])
+    full_text = schema.has_full_text(conn)
+    middle = conn.execute('SELECT MAX(id) / 2 FROM games').fetchone()[0]
+    search = functools.partial(search_page, conn)
+    scenarios = [
+        ('search_league_click/all', lambda: search('league', queries.LEAGUE_SEARCH, [''])),
+        ('search_league_click/prefix', lambda: search('league', queries.LEAGUE_SEARCH, [league])),
+        ('search_match_click/prefix', lambda: search('match', queries.MATCH_SEARCH, ['Matchday 1'])),
+        ('search_club_click/all', lambda: search('club', queries.CLUB_SEARCH, ['', '', '', ''])),
+        ('search_club_click/key', lambda: search('club', queries.CLUB_SEARCH, [league_code(1), '', '', ''])),
+        ('search_club_click/name', lambda: search('club', queries.CLUB_SEARCH, ['', 'Riverton', '', ''], full_text)),
+        ('search_club_click/name anywhere', lambda: search('club', queries.CLUB_SEARCH, ['', '*ver', '', ''])),
+        ('search_club_click/league', lambda: search('club', queries.CLUB_SEARCH, ['', '', '', league])),
+        ('search_game_click/all', lambda: search('game', queries.GAME_SEARCH, [''] * 8)),
+        ('search_game_click/next page', lambda: search('game', queries.GAME_SEARCH, [''] * 8, after=middle)),
+        ('search_game_click/team', lambda: search('game', queries.GAME_SEARCH, ['', '', club, '', '', '', '', ''])),
+        ('search_game_click/month', lambda: search('game', queries.GAME_SEARCH,
+                                                   ['', year + '-09', '', '', '', '', '', ''])),
+        ('search_game_click/scores', lambda: search('game', queries.GAME_SEARCH, ['', '', '', '', '>3', '0-1', year,
+                                                                                  ''])),
+        ('search_game_click/league season', lambda: search('game', queries.GAME_SEARCH,
+                                                           ['', '', '', '', '', '', year, league])),
+        ('search_game_click/match anywhere', lambda: search('game', queries.GAME_SEARCH,
+                                                            ['*day 3', '', '', '', '', '', '', ''])),
+        ('head_to_head_click', lambda: len(records.HeadToHead(club, opponent).page(conn)[1])),
+        ('form_click', lambda: len(records.Form(club).page(conn)[1])),
+        ('home_away_click', lambda: len(records.Splits(club).page(conn)[1])),
+        ('standings_click', lambda: len(standings.Standings(league, year).page(conn)[1])),
+        ('standings_click/every table', lambda: every_table(conn)),
+    ]
+    return [('query/' + name, function) for name, function in scenarios]
+
+
+# Returns [(name, function(conn))] of the exports of the whole game table and of the standings to 'directory'
+def export_scenarios(conn, directory):
+    scenarios = []
+    for table, name in (('game', 'games.csv'), ('game', 'games.ndjson.gz'), ('standings', 'standings.csv')):
+        path = os.path.join(directory, name)
+        scenarios.append(('export/' + name, functools.partial(export.export_table, conn, table, path)))
+    return scenarios
+
+
+# Returns [(name, function())] of writing a snapshot of the games to 'directory' and of the analytics on it. Returns an
+# empty list and the reason when NumPy is not installed
+def analytics_scenarios(conn, directory):
+    if snapshot.numpy is None:
+        return [], 'no analytics: NumPy is not installed'
+    path = os.path.join(directory, 'games.snapshot')
+    snapshot.write_snapshot(conn, path)
+    games = snapshot.Snapshot(path)
+    return [('analytics/write snapshot', functools.partial(snapshot.write_snapshot, conn, path + '.new')),
+            ('analytics/goals', lambda: len(analytics.goal_distribution(games))),
+            ('analytics/home advantage', lambda: len(analytics.home_advantage(games))),
+            ('analytics/scores', lambda: int(analytics.score_matrix(games).sum()))], None
+
+
+# Returns [(name, function())] of filling a Treeview like the result table with a page of games and with as many rows as
+# it keeps (see resultgrid.MAX_ROWS), and emptying it. Returns an empty list and the reason when Tk cannot open a window
+def treeview_scenarios(conn):
+    try:
+        from footballdb import resultgrid
+        root = resultgrid.tk.Tk()
+    except Exception as er:  # No Tkinter, or no display
+        return [], 'no Treeview: %s' % er
+    root.withdraw()
+    tree = resultgrid.ttk.Treeview(root, show='headings')
+    columns, rows = paging.Search('game', queries.GAME_SEARCH, [''] * 8).page(conn, limit=resultgrid.MAX_ROWS)
+    tree['columns'] = columns
+
+    def fill(count):
+        tree.delete(*tree.get_children())
+        for key, values in rows[0:count]:
+            tree.insert('', 'end', iid=str(key), values=values)
+        root.update_idletasks()
+        return count
+
+    return [('treeview/page', lambda: fill(paging.PAGE_SIZE)),
+            ('treeview/full table', lambda: fill(resultgrid.MAX_ROWS))], None
+
+
+# Prints the change of every scenario from 'baseline', a dictionary loaded from the JSON of another run. Returns the
+# names of the scenarios slower than 'tolerance' times their baseline
+def compare(results, baseline, tolerance):
+    slower = []
+    print('\nCompared with %s (%s):' % (baseline.get('commit'), baseline.get('date')))
+    for name in sorted(results):
+        if name not in baseline['results']:
+            print('%-44s %12.3f ms  new' % (name, results[name]['median'] * 1000))
+            continue
+        before = baseline['results'][name]['median']
+        ratio = results[name]['median'] / before if before else 1.0
+        flag = ''
+        if ratio > tolerance:
+            flag = '  SLOWER'
+            slower.append(name)
+        print('%-44s %12.3f ms %12.3f ms %6.2fx%s' % (name, before * 1000, results[name]['median'] * 1000, ratio,
+                                                     flag))
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time loading, searching, standings and exports on synthetic data.')
+    parser.add_argument('--leagues', type=int, default=10, help='number of leagues')
+    parser.add_argument('--seasons', type=int, default=5, help='number of seasons of every league')
+    parser.add_argument('--clubs', type=int, default=CLUBS, help='clubs in every league and season')
+    parser.add_argument('--seed', type=int, default=SEED, help='seed of the scores')
+    parser.add_argument('--repeat', type=int, default=5, help='runs of every scenario but the loads')
+    parser.add_argument('--output', default='benchmark-results.json', help='the JSON file the results are written to')
+    parser.add_argument('--compare', help='the JSON file of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help='how many times slower than the earlier run a scenario may be')
+    args = parser.parse_args()
+    if args.leagues < 2:
+        parser.error('--leagues must be at least 2, the searches look for the second league')
+
+    directory = tempfile.mkdtemp()
+    try:
+        seasons = list(range(FIRST_SEASON, FIRST_SEASON + args.seasons))
+        mirror = os.path.join(directory, 'mirror')
+        start = time.time()
+        codes = write_mirror(mirror, args.leagues, seasons, args.clubs, args.seed)
+        print('%d feeds generated in %.1fs' % (2 * len(codes) * len(seasons), time.time() - start))
+
+        conn = pool.connect(os.path.join(directory, 'bench.sqlite'))
+        schema.migrate(conn)
+        results, stages = ingest_scenarios(conn, catalogue.feed_list(codes, seasons), mirror)
+        scenarios = query_scenarios(conn, seasons) + export_scenarios(conn, directory)
+        numbers, no_numpy = analytics_scenarios(conn, directory)
+        treeview, no_display = treeview_scenarios(conn)
+        skipped = '; '.join([reason for reason in (no_numpy, no_display) if reason]) or None
+        for name, function in scenarios + numbers + treeview:
+            results[name] = measure(function, args.repeat)
+        games = count_games(conn)
+        conn.close()
+
+        for name in sorted(results):
+            result = results[name]
+            print('%-44s best %12.3f ms  median %12.3f ms  %8s row(s)' % (name, result['best'] * 1000,
+                                                                         result['median'] * 1000, result['rows']))
+        if skipped:
+            print(skipped)
+
+        report = {'version': VERSION, 'commit': git_commit(), 'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                  'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+                  'platform': platform.platform(), 'repeat': args.repeat, 'skipped': skipped,
+                  'size': {'leagues': args.leagues, 'seasons': args.seasons, 'clubs': args.clubs, 'seed': args.seed,
+                           'feeds': 2 * len(codes) * len(seasons), 'games': games},
+                  'results': results, 'stages': stages}
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=1, sort_keys=True)
+        print('results written to %s' % args.output)
+
+        if args.compare:
+            with open(args.compare) as baseline_file:
+                baseline = json.load(baseline_file)
+            if baseline.get('size') != report['size']:
+                print('The sizes differ from the earlier run: %s' % baseline.get('size'))
+            if compare(results, baseline, args.tolerance):
+                return 1
+        return 0
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
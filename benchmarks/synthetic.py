@@ -0,0 +1,122 @@
+"""
+Generator of synthetic openfootball feeds for the benchmarks. Every league has a clubs feed ({"name", "clubs": [...]})
+and a matches feed ({"name", "rounds": [{"name", "matches": [...]}]}) for every season, in which its clubs play each
+other twice, once at home and once away. A few clubs of every league change from one season to the next, as they are
+promoted and relegated. The feeds only depend on the sizes and the seed, so two runs, or two commits, load exactly the
+same data.
+
+Usage: python benchmarks/synthetic.py FOLDER [--leagues 50] [--seasons 30] [--clubs 20] [--seed 0]
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from footballdb import catalogue
+
+CLUBS = 20  # Clubs in every league and season
+FIRST_SEASON = 2000
+SEED = 0
+CHANGES = 3  # Clubs of a league replaced every season
+
+# The words the club names are made of, so the names can be searched by word like the real ones
+TOWNS = ['Northport', 'Eastfield', 'Westbury', 'Southam', 'Kingsbridge', 'Ashford', 'Riverton', 'Millbrook',
+         'Oakham', 'Stonehaven', 'Fairview', 'Highcliff', 'Lakeside', 'Redhill', 'Greenwood', 'Bridgewater']
+SUFFIXES = ['United', 'City', 'Athletic', 'Rovers', 'Wanderers', 'Town', 'Albion', 'Sporting']
+GOALS = [0, 0, 0, 1, 1, 1, 1, 2, 2, 2, 3, 3, 4, 5]  # Drawn from for every score
+
+
+# The code of the n-th league, in place of 'en.1'
+def league_code(number):
+    return 'bench%d.1' % number
+
+
+# The clubs of a league that can play in it: CLUBS + CHANGES * seasons of them, as {'key', 'name', 'code'}
+def club_pool(code, seasons, clubs=CLUBS):
+    pool = []
+    for number in range(clubs + CHANGES * len(seasons)):
+        name = '%s %s %d' % (TOWNS[number % len(TOWNS)], SUFFIXES[(number + number // len(TOWNS)) % len(SUFFIXES)],
+                             number)
+        pool.append({'key': '%s-club%d' % (code, number), 'name': name, 'code': 'C%02d' % (number % 100)})
+    return pool
+
+
+# The clubs playing the index-th season: a window of the pool moving by CHANGES clubs a season
+def season_clubs(pool, index, clubs=CLUBS):
+    return pool[index * CHANGES:index * CHANGES + clubs]
+
+
+# Returns the rounds of a double round robin between the clubs, one round a week from the start of the season. Every
+# club plays once per round, and the second half of the season is the first with home and away swapped. The first
+# game of the season has a negative score, which the searches, standings and analytics are given like the real data
+def season_rounds(clubs, year, rng):
+    order = list(clubs) + ([None] if len(clubs) % 2 else [])  # A bye when the number of clubs is odd
+    half = []
+    for number in range(len(order) - 1):
+        half.append([(order[i], order[len(order) - 1 - i]) for i in range(len(order) // 2)])
+        order = [order[0], order[-1]] + order[1:-1]  # The circle method: every club but the first moves one place
+    pairings = half + [[(away, home) for home, away in pairs] for pairs in half]
+
+    rounds = []
+    for number, pairs in enumerate(pairings):
+        date = str(datetime.date(year, 8, 1) + datetime.timedelta(days=7 * number))
+        matches = [{'date': date, 'team1': home, 'team2': away, 'score1': rng.choice(GOALS),
+                    'score2': rng.choice(GOALS)} for home, away in pairs if home is not None and away is not None]
+        rounds.append({'name': 'Matchday %d' % (number + 1), 'matches': matches})
+    if rounds and rounds[0]['matches']:
+        rounds[0]['matches'][0]['score1'] = -5  # A score typed wrong, as game 376 of footballdb.sqlite has
+    return rounds
+
+
+# Yields (code, year, clubs feed, matches feed) for every league and season, the feeds as the dictionaries the JSON
+# files hold
+def league_feeds(leagues, seasons, clubs=CLUBS, seed=SEED):
+    for number in range(leagues):
+        code = league_code(number)
+        pool = club_pool(code, seasons, clubs)
+        for index, year in enumerate(seasons):
+            name = 'Synthetic League %d %s' % (number, catalogue.season_folder(year).replace('-', '/'))
+            members = season_clubs(pool, index, clubs)
+            rng = random.Random(seed * 1000003 + number * 1009 + year)  # The same scores whatever is generated
+            yield code, year, {'name': name, 'clubs': members}, {'name': name,
+                                                                  'rounds': season_rounds(members, year, rng)}
+
+
+# Writes the feeds of every league and season into 'directory', laid out like the openfootball repository, so it can be
+# used as the mirror of feeds.fetch_all. Returns the league codes, for catalogue.feed_list
+def write_mirror(directory, leagues, seasons, clubs=CLUBS, seed=SEED):
+    codes = []
+    for code, year, clubs_feed, matches_feed in league_feeds(leagues, seasons, clubs, seed):
+        folder = os.path.join(directory, catalogue.season_folder(year))
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        with open(os.path.join(folder, code + '.clubs.json'), 'w') as feed:
+            json.dump(clubs_feed, feed)
+        with open(os.path.join(folder, code + '.json'), 'w') as feed:
+            json.dump(matches_feed, feed)
+        if code not in codes:
+            codes.append(code)
+    return codes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write synthetic openfootball feeds to a folder.')
+    parser.add_argument('folder', help='where the season folders are written')
+    parser.add_argument('--leagues', type=int, default=50, help='number of leagues')
+    parser.add_argument('--seasons', type=int, default=30, help='number of seasons of every league')
+    parser.add_argument('--clubs', type=int, default=CLUBS, help='clubs in every league and season')
+    parser.add_argument('--seed', type=int, default=SEED, help='seed of the scores')
+    args = parser.parse_args()
+
+    seasons = list(range(FIRST_SEASON, FIRST_SEASON + args.seasons))
+    write_mirror(args.folder, args.leagues, seasons, args.clubs, args.seed)
+    games = args.leagues * args.seasons * args.clubs * (args.clubs - 1)
+    print('%d feeds, %d games written to %s' % (2 * args.leagues * args.seasons, games, args.folder))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,4 @@
+"""
+Support package for Football.py. The modules in here hold the parts of the application that do not need the GUI, such
+as downloading the openfootball feeds.
+"""
@@ -0,0 +1,65 @@
+"""
+This module answers questions about all the games at once from a snapshot.Snapshot: how many goals games have, how
+much playing at home is worth in every league, and how often every score happens. Each is a few NumPy operations over
+the columns of the snapshot, such as a bincount, so it takes milliseconds over millions of games and never opens the
+database. Only games with both scores count, as in the standings, and only if neither is negative.
+"""
+from footballdb import snapshot
+
+MAX_GOALS = 6  # The score matrix puts every score above it in its last row or column
+
+GOAL_COLUMNS = ['goals', 'games', 'share']
+HOME_COLUMNS = ['league', 'games', 'home_wins', 'draws', 'away_wins', 'home_goals', 'away_goals', 'home_points']
+
+
+# Returns the boolean mask of the games played, in the league and the season when they are given. A negative score,
+# typed wrong, leaves its game out: it cannot be counted by goals, and every question is asked of the same games
+def played(games, league_name=None, season_year=None):
+    mask = (games.score_one >= 0) & (games.score_two >= 0)  # MISSING is negative too
+    if league_name is not None:
+        mask &= games.league == games.league_code(league_name)
+    if season_year is not None:
+        mask &= games.season_year == season_year
+    return mask
+
+
+# Returns the number of games with every total of goals as a list of rows in the order of GOAL_COLUMNS, from 0 goals
+# to the most any game had
+def goal_distribution(games, league_name=None, season_year=None):
+    mask = played(games, league_name, season_year)
+    totals = games.score_one[mask].astype('int32') + games.score_two[mask]
+    counts = snapshot.numpy.bincount(totals) if len(totals) else []
+    return [(goals, int(count), float(count) / len(totals)) for goals, count in enumerate(counts)]
+
+
+# Returns the home advantage of every league with a game played, as a list of rows in the order of HOME_COLUMNS sorted
+# by league: the share of home wins, draws and away wins, the goals a game of each side and the points a game at home
+def home_advantage(games, season_year=None):
+    numpy = snapshot.numpy
+    mask = played(games, season_year=season_year) & (games.league != snapshot.MISSING)
+    leagues = games.league[mask]
+    difference = games.score_one[mask].astype('int32') - games.score_two[mask]
+    size = len(games.leagues)
+    count = numpy.bincount(leagues, minlength=size)
+    home_wins = numpy.bincount(leagues, weights=difference > 0, minlength=size)
+    draws = numpy.bincount(leagues, weights=difference == 0, minlength=size)
+    home_goals = numpy.bincount(leagues, weights=games.score_one[mask], minlength=size)
+    away_goals = numpy.bincount(leagues, weights=games.score_two[mask], minlength=size)
+    rows = []
+    for code in numpy.nonzero(count)[0]:
+        total = float(count[code])
+        rows.append((games.leagues[code], int(count[code]), home_wins[code] / total, draws[code] / total,
+                     (total - home_wins[code] - draws[code]) / total, home_goals[code] / total,
+                     away_goals[code] / total, (3 * home_wins[code] + draws[code]) / total))
+    return sorted(rows, key=lambda row: row[0])
+
+
+# Returns the number of games of every score as a (max_goals + 1) x (max_goals + 1) NumPy array, the goals of the home
+# side in the rows and those of the away side in the columns. A score above max_goals is counted as max_goals
+def score_matrix(games, league_name=None, season_year=None, max_goals=MAX_GOALS):
+    numpy = snapshot.numpy
+    mask = played(games, league_name, season_year)
+    home = numpy.minimum(games.score_one[mask], max_goals).astype('int32')
+    away = numpy.minimum(games.score_two[mask], max_goals).astype('int32')
+    side = max_goals + 1
+    return numpy.bincount(home * side + away, minlength=side * side).reshape(side, side)
@@ -0,0 +1,193 @@
+"""
+This module moves closed seasons out of the database into archive files, so the tables the application writes to, and
+their indexes, only hold the seasons still played. An archive holds the games of a span of seasons with their
+standings and club records, in the tables and indexes they had in the database. It is written once and never changed
+again: the file is made read-only, and the readers attach it with immutable=1, so SQLite reads it through a memory map
+without taking or checking any lock.
+
+Every reader connection (see pool.ConnectionPool) attaches the archives listed in the archive table and puts temporary
+views in front of the games, game, standing and club_season tables, each a UNION ALL of the table of the database and
+of its copy in every archive. The searches, standings, records and exports read them unchanged: SQLite pushes their
+conditions into every arm, each using the indexes of its file, and a query giving the season skips the archives that
+cannot hold it. The writer only sees the database: the triggers of schema.ARCHIVE_SCRIPT leave out the games of an
+archived season when a feed or a file adds them again.
+"""
+import os
+import sqlite3
+import stat
+import sys
+
+try:  # Python 2
+    from urllib import pathname2url
+except ImportError:  # Python 3
+    from urllib.request import pathname2url
+
+FOLDER = 'archive'  # Where the archives are written, next to the database
+MMAP_SIZE = 256 * 1024 * 1024  # Bytes of every archive a reader maps in memory
+MAX_ARCHIVES = 10  # SQLite attaches at most 10 databases to a connection unless it was built for more
+
+# The tables copied to an archive, in the order they are copied
+TABLES = ['games', 'standing', 'club_season']
+
+# The game view of schema.COMPATIBILITY_VIEWS over the games of one database. The names are always those of main
+GAME_ARM = '''SELECT games.id, matches.match_name, club_one.id AS team_one, club_two.id AS team_two,
+    games.score_one, games.score_two, games.game_date, games.season_year, leagues.league_name
+    FROM %(schema)s.games games LEFT JOIN main.matches matches ON matches.match_id = games.match_id
+    LEFT JOIN main.clubs club_one ON club_one.club_id = games.team_one_id
+    LEFT JOIN main.clubs club_two ON club_two.club_id = games.team_two_id
+    LEFT JOIN main.leagues leagues ON leagues.league_id = games.league_id%(seasons)s'''
+
+# Keeps the arm of an archive to its seasons. A query giving the season, such as 'season_year = ?', then skips the
+# archives that cannot hold it before reading any of their pages: SQLite puts the season in place of season_year and
+# tests the condition once, at the start of the arm
+SEASONS = '''
+    WHERE +%s.season_year BETWEEN %d AND %d'''
+
+# The statements creating the tables copied and their indexes, by name
+DEFINITIONS = '''SELECT name, type, sql FROM main.sqlite_master WHERE type IN ('table', 'index') AND sql IS NOT NULL
+    AND tbl_name IN (%s)'''
+
+# The keys of the names of main the games of an archive use, written to schema.ARCHIVE_KEY_SCRIPT
+USED_KEYS = '''SELECT 'clubs', team_one_id FROM %(schema)s.games WHERE team_one_id IS NOT NULL
+    UNION SELECT 'clubs', team_two_id FROM %(schema)s.games WHERE team_two_id IS NOT NULL
+    UNION SELECT 'matches', match_id FROM %(schema)s.games WHERE match_id IS NOT NULL
+    UNION SELECT 'leagues', league_id FROM %(schema)s.games WHERE league_id IS NOT NULL'''
+INSERT_KEYS = '''INSERT OR IGNORE INTO main.archive_key(key_table, key_id) '''
+
+ARCHIVES = '''SELECT archive_name, path, first_season, last_season, games FROM main.archive ORDER BY first_season'''
+
+
+# Returns (archive_name, path, first_season, last_season, games) of every archive, the oldest first, or [] if the
+# database has no archive table yet
+def archives(conn):
+    if conn.execute("SELECT COUNT(*) FROM main.sqlite_master WHERE name = 'archive'").fetchone()[0] == 0:
+        return []
+    return conn.execute(ARCHIVES).fetchall()
+
+
+# The path of a file named relative to the folder of the database, as the archive table stores them
+def database_path(conn, path):
+    main = [row[2] for row in conn.execute('PRAGMA database_list').fetchall() if row[1] == 'main'][0]
+    return os.path.join(os.path.dirname(main), path)
+
+
+# Copies the games of the seasons from 'first_season' to 'last_season' into a new archive file in 'folder', with their
+# standings and club records, then deletes them from the database, in one transaction of 'conn', which must not be
+# in one. Only closed seasons can be archived: the latest season of the database stays in it. Raises ValueError if the
+# seasons cannot be archived. Returns (archive_name, games archived)
+def archive_seasons(conn, first_season, last_season, folder=FOLDER):
+    latest = conn.execute('SELECT MAX(season_year) FROM games').fetchone()[0]
+    if first_season > last_season:
+        raise ValueError('the first season %d is after the last season %d' % (first_season, last_season))
+    if latest is None or last_season >= latest:
+        raise ValueError('only closed seasons are archived, the latest season %s stays in the database' % latest)
+    existing = archives(conn)
+    for archive_name, path, first, last, games in existing:
+        if first <= last_season and last >= first_season:
+            raise ValueError('the seasons %d to %d are already archived in %s' % (first, last, path))
+    if len(existing) >= MAX_ARCHIVES:
+        raise ValueError('there are already %d archives, archive more seasons at a time' % len(existing))
+
+    archive_name = 'archive_%d_%d' % (first_season, last_season)
+    relative = os.path.join(folder, 'seasons-%d-%d.sqlite' % (first_season, last_season))
+    path = database_path(conn, relative)
+    if os.path.exists(path):
+        raise ValueError('%s already exists' % path)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+
+    # The tables are created as they are in the database, their indexes once their rows are in. Their foreign keys
+    # name tables the archive does not have, so they are not checked while it is written, and never after
+    definitions = dict([(row[0], row[1:]) for row in conn.execute(DEFINITIONS % ', '.join(['?'] * len(TABLES)),
+                                                                 TABLES).fetchall()])
+    foreign_keys = conn.execute('PRAGMA foreign_keys').fetchone()[0]
+    conn.execute('PRAGMA foreign_keys = OFF')
+    conn.execute('ATTACH DATABASE ? AS archive_new', (path,))
+    try:
+        for table in TABLES:
+            conn.execute(definitions[table][1].replace(table, 'archive_new.' + table, 1))
+        with conn:
+            for table in TABLES:
+                conn.execute('INSERT INTO archive_new.%s SELECT * FROM main.%s WHERE season_year BETWEEN ? AND ?' % (
+                    table, table), (first_season, last_season))
+            games, last_id = conn.execute('SELECT COUNT(*), MAX(id) FROM archive_new.games').fetchone()
+            conn.execute('INSERT INTO archive(archive_name, path, first_season, last_season, games, last_id) '
+                         'VALUES (?, ?, ?, ?, ?, ?)', (archive_name, relative, first_season, last_season, games,
+                                                       last_id or 0))
+            conn.execute(INSERT_KEYS + USED_KEYS % {'schema': 'archive_new'})
+            conn.execute('DELETE FROM main.games WHERE season_year BETWEEN ? AND ?', (first_season, last_season))
+    except Exception:
+        conn.execute('DETACH DATABASE archive_new')
+        os.remove(path)
+        raise
+    finally:
+        conn.execute('PRAGMA foreign_keys = %d' % foreign_keys)
+    conn.executescript(''.join([sql.replace(' IF NOT EXISTS', '', 1).replace('INDEX ', 'INDEX archive_new.', 1) + ';\n'
+                                for kind, sql in definitions.values() if kind == 'index']))
+    conn.execute('DETACH DATABASE archive_new')
+    os.chmod(path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+    return archive_name, games
+
+
+# Returns the (key_table, key_id) the games of every archive use, reading each file through a connection of its own,
+# so nothing is attached to 'conn'. An archive whose file is missing is left out with a warning
+def used_keys(conn):
+    keys = []
+    for archive_name, path, first_season, last_season, games in archives(conn):
+        path = database_path(conn, path)
+        if not os.path.isfile(path):
+            sys.stderr.write('Archive of the seasons %d to %d not found: %s\n' % (first_season, last_season, path))
+            continue
+        archive_conn = sqlite3.connect(path)
+        try:
+            keys.extend(archive_conn.execute(USED_KEYS % {'schema': 'main'}).fetchall())
+        finally:
+            archive_conn.close()
+    return keys
+
+
+# Attaches every archive to 'conn' and puts the UNION ALL views in front of the tables they copy. Returns the names
+# attached
+def attach(conn, uri=False):
+    attached = attach_files(conn, uri)
+    if attached:
+        conn.executescript(union_views(conn, attached))
+    return [archive_name for archive_name, first_season, last_season in attached]
+
+
+# Attaches every archive to 'conn' under its name, without the views. With 'uri', when the connection reads URI
+# filenames, they are attached read-only with immutable=1. An archive whose file is missing is left out with a
+# warning, as its seasons are no longer in the database. Returns (archive_name, first_season, last_season) of every
+# archive attached
+def attach_files(conn, uri=False):
+    attached = []
+    for archive_name, path, first_season, last_season, games in archives(conn):
+        path = os.path.abspath(database_path(conn, path))
+        if not os.path.isfile(path):
+            sys.stderr.write('Archive of the seasons %d to %d not found: %s\n' % (first_season, last_season, path))
+            continue
+        if uri:
+            path = 'file:%s?mode=ro&immutable=1' % pathname2url(path)
+        conn.execute('ATTACH DATABASE ? AS %s' % archive_name, (path,))
+        conn.execute('PRAGMA %s.mmap_size = %d' % (archive_name, MMAP_SIZE))
+        attached.append((archive_name, first_season, last_season))
+    return attached
+
+
+# The script creating the temporary views of the tables of main and of the archives 'attached', a list of
+# (archive_name, first_season, last_season). Their columns are named, so an archive made before a column was added to
+# a table fails loudly instead of shifting the others
+def union_views(conn, attached):
+    script = []
+    for table in TABLES:
+        columns = ', '.join([row[1] for row in conn.execute('PRAGMA main.table_info(%s)' % table).fetchall()])
+        arms = ['SELECT %s FROM main.%s' % (columns, table)]
+        for archive_name, first_season, last_season in attached:
+            arms.append('SELECT %s FROM %s.%s%s' % (columns, archive_name, table,
+                                                   SEASONS % (table, first_season, last_season)))
+        script.append('CREATE TEMP VIEW %s AS %s;\n' % (table, '\nUNION ALL '.join(arms)))
+    arms = [GAME_ARM % {'schema': 'main', 'seasons': ''}]
+    for archive_name, first_season, last_season in attached:
+        arms.append(GAME_ARM % {'schema': archive_name, 'seasons': SEASONS % ('games', first_season, last_season)})
+    script.append('CREATE TEMP VIEW game AS %s;\n' % '\nUNION ALL '.join(arms))
+    return ''.join(script)
@@ -0,0 +1,93 @@
+"""
+This module changes many rows at once, such as the rows selected in the result table: it deletes them, or sets one
+column of all of them to the same value. A batch is one executemany in one transaction, so cleaning up hundreds of
+rows costs one commit, and either every row is changed or, if SQLite refuses one of them, none is. The rows are read
+before they are changed, and the Undo returned puts them back, again in one transaction, except the rows changed
+again since.
+"""
+# The column that identifies a row of every table, as in the first column of its search results
+KEYS = {'league': 'league_name', 'match': 'match_name', 'club': 'id', 'game': 'id'}
+
+# The columns a batch can set in every table
+SETTABLE = {'club': ['league_name'], 'game': ['league_name', 'match_name']}
+
+MAX_PARAMETERS = 500  # Keys read in one statement, below the 999 parameters SQLite allows by default
+
+
+# Returns (columns, rows) of the rows of a table whose key is in 'keys'
+def read_rows(conn, table, keys):
+    columns = None
+    rows = []
+    for start in range(0, len(keys), MAX_PARAMETERS):
+        part = keys[start:start + MAX_PARAMETERS]
+        marks = ', '.join(['?'] * len(part))
+        cursor = conn.execute('SELECT * FROM %s WHERE %s IN (%s)' % (table, KEYS[table], marks), part)
+        rows.extend(cursor.fetchall())
+        columns = [column[0] for column in cursor.description]
+    return columns, rows
+
+
+# What a batch changed: the rows of 'table' as they were, in 'columns'. They were deleted if 'deleted' is True, and
+# otherwise the batch only changed their last column, to 'value'
+class Undo(object):
+    def __init__(self, table, columns, rows, deleted, description, value=None):
+        self.table = table
+        self.columns = columns
+        self.rows = rows
+        self.deleted = deleted
+        self.description = description  # Such as 'delete 12 game row(s)', for the GUI
+        self.value = value
+        self.skipped = []  # The keys of the rows undo left as they were, see undo
+
+    # Puts the rows back as they were, in one transaction. A row changed since the batch is left as it is and its key
+    # added to 'skipped': a deleted row whose key is in the table again, or a row that was deleted since or whose
+    # column is no longer the value the batch wrote. Returns the number of rows put back
+    def undo(self, conn):
+        if not self.rows:
+            return 0
+        key = KEYS[self.table]
+        position = self.columns.index(key)
+        keys = [row[position] for row in self.rows]
+        with conn:
+            columns, rows = read_rows(conn, self.table, keys)
+            if self.deleted:
+                present = set([row[columns.index(key)] for row in rows])
+                undone = [row for row in self.rows if row[position] not in present]
+                conn.executemany('INSERT INTO %s(%s) SELECT %s WHERE NOT EXISTS (SELECT 1 FROM %s WHERE %s = ?)' % (
+                    self.table, ', '.join(self.columns), ', '.join(['?'] * len(self.columns)), self.table, key),
+                    [tuple(row) + (row[position],) for row in undone])
+            else:
+                column = self.columns[1]
+                current = dict([(row[columns.index(key)], row[columns.index(column)]) for row in rows])
+                undone = [row for row in self.rows if row[0] in current and current[row[0]] == self.value]
+                conn.executemany('UPDATE %s SET %s = ? WHERE %s = ? AND %s IS ?' % (self.table, column, key, column),
+                                 [(old, row_key, self.value) for row_key, old in undone])
+        undone_keys = set([row[position] for row in undone])
+        self.skipped = [row_key for row_key in keys if row_key not in undone_keys]
+        return len(undone)
+
+
+# Deletes the rows of a table whose key is in 'keys', in one transaction. Raises sqlite3.IntegrityError, and deletes
+# nothing, if another row still refers to one of them, such as a game to its club. Returns the Undo
+def delete_rows(conn, table, keys):
+    keys = list(keys)
+    with conn:
+        columns, rows = read_rows(conn, table, keys)
+        conn.executemany('DELETE FROM %s WHERE %s = ?' % (table, KEYS[table]), [(key,) for key in keys])
+    return Undo(table, columns, rows, True, 'delete %d %s row(s)' % (len(rows), table))
+
+
+# Sets 'column' of the rows of a table whose key is in 'keys' to 'value', in one transaction. Raises
+# sqlite3.IntegrityError, and changes nothing, if the value is not a row of the table the column refers to, such as a
+# league that does not exist. Returns the Undo
+def set_column(conn, table, column, value, keys):
+    if column not in SETTABLE.get(table, []):
+        raise ValueError('%s of %s cannot be set for many rows at once' % (column, table))
+    keys = list(keys)
+    key = KEYS[table]
+    with conn:
+        columns, rows = read_rows(conn, table, keys)
+        old = [(row[columns.index(key)], row[columns.index(column)]) for row in rows]
+        conn.executemany('UPDATE %s SET %s = ? WHERE %s = ?' % (table, column, key),
+                         [(value, row_key) for row_key in keys])
+    return Undo(table, [key, column], old, False, 'set %s of %d %s row(s)' % (column, len(rows), table), value)
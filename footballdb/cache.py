@@ -0,0 +1,127 @@
+"""
+This module keeps a copy of every downloaded feed on disk, so the loader can start without a network and does not
+download a feed again while the server says it has not changed. The feeds are stored gzip compressed under the SHA-1 of
+their content, so a feed published at several urls is stored once, and an index maps every url to its content and to
+the ETag and Last-Modified it was served with. When the files grow past MAX_BYTES the least recently used are removed.
+"""
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+
+from footballdb import feeds
+
+MAX_BYTES = 50 * 1024 * 1024  # Compressed size the cache is trimmed to
+CHUNK_SIZE = 64 * 1024
+
+
+class FeedCache(object):
+    def __init__(self, directory, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()  # The downloads of feeds.fetch_all use the cache from several threads
+        self.index_path = os.path.join(directory, 'index.json')
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        try:
+            with open(self.index_path) as index:
+                self.index = json.load(index)  # url -> {'hash', 'etag', 'last_modified', 'used'}
+        except (IOError, OSError, ValueError):  # No cache yet, or an index cut short by a crash
+            self.index = {}
+
+    def path(self, content_hash):
+        return os.path.join(self.directory, content_hash[0:2], content_hash + '.json.gz')
+
+    # Returns the entry of a url, or None if its feed is not in the cache
+    def get(self, url):
+        with self.lock:
+            entry = self.index.get(url)
+            if entry is None or not os.path.exists(self.path(entry['hash'])):
+                return None
+            return dict(entry)
+
+    # Opens the feed of a url as a binary file, or returns None if it is not in the cache. Marks it as used
+    def open(self, url):
+        entry, body = self.open_entry(url)
+        return body
+
+    # Returns (entry, binary file) of the feed of a url, or (None, None) if it is not in the cache. The entry is looked
+    # up, marked as used and its file opened under one hold of the lock, so another thread trimming the cache cannot
+    # remove them in between. An open file can still be read once it is removed
+    def open_entry(self, url):
+        with self.lock:
+            entry = self.index.get(url)
+            if entry is None or not os.path.exists(self.path(entry['hash'])):
+                return None, None
+            entry['used'] = time.time()
+            self.save()
+            return dict(entry), gzip.open(self.path(entry['hash']), 'rb')
+
+    # Returns the feed of a url as a feeds.FeedResponse, with the content read or as a file if 'spool' is True, or None
+    # if it is not in the cache
+    def response(self, url, spool=False):
+        entry, body = self.open_entry(url)
+        if body is None:
+            return None
+        if not spool:
+            with body:
+                body = body.read()
+        return feeds.FeedResponse(url, body, entry['etag'], entry['last_modified'], entry['hash'])
+
+    # Stores the content of a feeds.FeedResponse for its url, then trims the cache. The file is written under the lock
+    # as well, so another thread trimming the cache does not take it for a file no url points to
+    def put(self, url, response):
+        path = self.path(response.content_hash)
+        with self.lock:
+            if not os.path.exists(path):
+                if not os.path.isdir(os.path.dirname(path)):
+                    os.makedirs(os.path.dirname(path))
+                with gzip.open(path + '.tmp', 'wb') as compressed:
+                    shutil.copyfileobj(response.stream(), compressed, CHUNK_SIZE)
+                os.rename(path + '.tmp', path)  # A crash never leaves a file that is half written
+
+            self.index[url] = {'hash': response.content_hash, 'etag': response.etag,
+                               'last_modified': response.last_modified, 'used': time.time()}
+            self.trim(keep=response.content_hash)
+            self.save()
+
+    # Removes the files no url points to any more, then the least recently used ones until the cache fits in max_bytes.
+    # The feed of the hash 'keep', just stored, is never removed, so a feed larger than max_bytes is kept on its own
+    # instead of being removed at once and downloaded again every time
+    def trim(self, keep=None):
+        used = {}
+        for entry in self.index.values():
+            used[entry['hash']] = max(used.get(entry['hash'], 0), entry['used'])
+
+        sizes = {}
+        for folder in os.listdir(self.directory):
+            if not os.path.isdir(os.path.join(self.directory, folder)):
+                continue
+            for name in os.listdir(os.path.join(self.directory, folder)):
+                content_hash = name.split('.')[0]
+                if name.endswith('.json.gz') and content_hash in used:
+                    sizes[content_hash] = os.path.getsize(self.path(content_hash))
+                elif name.endswith('.json.gz'):
+                    os.remove(self.path(content_hash))
+
+        total = sum(sizes.values())
+        for content_hash in sorted(sizes, key=lambda content: used[content]):
+            if total <= self.max_bytes:
+                break
+            if content_hash == keep:
+                continue
+            os.remove(self.path(content_hash))
+            total -= sizes[content_hash]
+            for url in [url for url, entry in self.index.items() if entry['hash'] == content_hash]:
+                del self.index[url]
+
+    # Writes the index to a new file that then replaces the old one, so a crash never leaves half an index
+    def save(self):
+        temporary = self.index_path + '.tmp'
+        with open(temporary, 'w') as index:
+            json.dump(self.index, index)
+        if os.path.exists(self.index_path) and os.name == 'nt':
+            os.remove(self.index_path)  # os.rename does not replace a file on Windows
+        os.rename(temporary, self.index_path)
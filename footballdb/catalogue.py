@@ -0,0 +1,40 @@
+"""
+This module lists the feeds the database is loaded from. Every competition is the code of its openfootball files and
+every season the year it starts in, and the url of each feed is made from a template, so adding a league or a season
+is one more entry in a list instead of new variables and insert calls.
+"""
+from footballdb import feeds, ingest
+
+# openfootball code of every competition loaded
+COMPETITIONS = [
+    'en.1',  # English Premier League
+    'de.1',  # Deutsche Bundesliga
+    'es.1',  # Spanish Primera Division ("La Liga")
+    'it.1',  # Italian Serie A
+]
+
+SEASONS = [2015, 2016]  # 2015-16 and 2016-17
+
+# The feeds of a competition in a season: its clubs, which also name its league, and its matches
+TEMPLATES = [
+    (ingest.CLUBS, '{root}{season}/{competition}.clubs.json'),
+    (ingest.MATCHES, '{root}{season}/{competition}.json'),
+]
+
+
+# The folder of a season, such as '2015-16'
+def season_folder(year):
+    return '%d-%02d' % (year, (year + 1) % 100)
+
+
+# Returns a list of (kind, url, year) for every feed of the competitions and seasons, as sync.sync_feeds takes it.
+# The feeds of a competition are listed together, with the clubs of every season before its matches, because a game
+# refers to its clubs and league
+def feed_list(competitions=COMPETITIONS, seasons=SEASONS, root=feeds.FEED_ROOT):
+    entries = []
+    for competition in competitions:
+        for kind, template in TEMPLATES:
+            for year in seasons:
+                entries.append((kind, template.format(root=root, season=season_folder(year), competition=competition),
+                                year))
+    return entries
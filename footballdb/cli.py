@@ -0,0 +1,363 @@
+"""
+The command line of the database, for servers and scripts without a display. It never imports Tkinter, and a query
+only opens the database, so it answers in milliseconds.
+
+Usage:
+    python -m footballdb.cli ingest [--force] [--mirror FOLDER_OR_URL] [--processes N]
+    python -m footballdb.cli query TABLE [COLUMN=VALUE ...] [--full-text] [--limit N]
+    python -m footballdb.cli standings LEAGUE SEASON_YEAR
+    python -m footballdb.cli export SOURCE FILE [COLUMN=VALUE ...] [--full-text] [--format FORMAT] [--gzip]
+    python -m footballdb.cli import FILE [--create-matches]
+    python -m footballdb.cli archive [FIRST_SEASON [LAST_SEASON]] [--folder FOLDER]
+    python -m footballdb.cli snapshot FILE
+    python -m footballdb.cli analytics FILE {goals,home,scores} [--league LEAGUE] [--season SEASON_YEAR]
+    python -m footballdb.cli ratings [--club CLUB] [--season SEASON_YEAR] [--league LEAGUE]
+
+The values of a query are typed as in the search fields of the GUI, for example
+    python -m footballdb.cli query game team_one=arsenal game_date=2015-08 score_one=">2"
+
+An export writes a whole table, or the result of a search when conditions are given, and its format is told by the
+extension of the file, for example
+    python -m footballdb.cli export game games.csv.gz season_year=2015
+    python -m footballdb.cli export standings standings.ndjson
+
+The queries, standings and exports also read the seasons moved to archive files, for example after
+    python -m footballdb.cli archive 2000 2009
+
+The analytics read a snapshot of every game written by the snapshot command, and not the database, for example
+    python -m footballdb.cli snapshot games.snapshot
+    python -m footballdb.cli analytics games.snapshot home --season 2015
+
+The Elo ratings of a club after every date it played, or of every club of a league at the end of a season, for example
+    python -m footballdb.cli ratings --club arsenal --season 2015
+    python -m footballdb.cli ratings --season 2015 --league "English Premier League"
+
+Every command can write what it measured (see metrics.py) to a JSON file with --metrics FILE, and its slow statements
+to a log with --slow-log FILE, for example
+    python -m footballdb.cli --metrics ingest.json --slow-log slow.log ingest --force
+"""
+import argparse
+import sys
+
+from footballdb import (analytics, archive, export, fixtures, metrics, paging, pool, queries, ratings, schema, snapshot,
+                        standings)
+
+# The searches of every table, as in the GUI
+SEARCHES = {'league': queries.LEAGUE_SEARCH, 'match': queries.MATCH_SEARCH, 'club': queries.CLUB_SEARCH,
+            'game': queries.GAME_SEARCH}
+
+
+# Writes a line to the standard output, in UTF-8 on Python 2 whatever the terminal
+def echo(line):
+    if sys.version_info[0] < 3:
+        line = line.encode('utf-8')
+    sys.stdout.write(line)
+    sys.stdout.write('\n')
+
+
+# Decodes an argument of Python 2 in the encoding of the system, or in UTF-8 when the locale is plain ASCII
+def decode(argument):
+    try:
+        return argument.decode(sys.getfilesystemencoding() or 'utf-8')
+    except UnicodeDecodeError:
+        return argument.decode('utf-8')
+
+
+def text(value):
+    return u'' if value is None else u'%s' % value
+
+
+def ingest(args):
+    from footballdb import loader  # Only this command needs the download code
+    conn = loader.open_database(args.database, args.full_reload)
+    applied = loader.load_feeds(conn, force=args.force or args.full_reload, max_age=args.max_age, mirror=args.mirror,
+                                processes=args.processes)
+    conn.close()
+    echo(u'%d feed(s) applied' % len(applied))
+    return 0
+
+
+# Returns the paging.Search of a table from the COLUMN=VALUE conditions typed. Raises ValueError if a condition does not
+# name a column of the table or a value cannot be read
+def build_search(conn, table, conditions, full_text):
+    spec = SEARCHES[table]
+    typed = {}
+    for condition in conditions:
+        column, separator, value = condition.partition('=')
+        if not separator or column not in [field for field, kind in spec]:
+            columns = ', '.join([field for field, kind in spec])
+            raise ValueError(u'Unknown condition %s, the columns of %s are: %s' % (condition, table, columns))
+        typed[column] = value
+    return paging.Search(table, spec, [typed.get(column, '') for column, kind in spec],
+                         full_text and schema.has_full_text(conn))
+
+
+# Prints the rows of a search, tab separated with a header line, a page at a time
+def query(args):
+    conn = open_existing(args.database, archives=True)
+    try:
+        search = build_search(conn, args.table, args.conditions, args.full_text)
+    except ValueError as er:
+        echo(u'Invalid search: %s' % er)
+        conn.close()
+        return 2
+
+    columns, rows = search.page(conn, limit=min(args.limit, paging.PAGE_SIZE))
+    echo(u'\t'.join(columns))
+    shown = 0
+    while rows:
+        for key, values in rows:
+            echo(u'\t'.join([text(value) for value in values]))
+        shown += len(rows)
+        if shown >= args.limit or len(rows) < paging.PAGE_SIZE:
+            break
+        rows = search.page(conn, after=rows[-1][0], limit=min(args.limit - shown, paging.PAGE_SIZE))[1]
+    conn.close()
+    return 0
+
+
+# Writes a table, or a search of it when conditions are given, to a file
+def export_file(args):
+    conn = open_existing(args.database, archives=True)
+    try:
+        export_format, compress = (args.format, False) if args.format else export.file_format(args.file)
+        if args.conditions or args.full_text:
+            if args.source not in SEARCHES:
+                raise ValueError(u'%s cannot be searched, the tables are: %s' % (args.source,
+                                                                               ', '.join(sorted(SEARCHES))))
+            search = build_search(conn, args.source, args.conditions, args.full_text)
+            rows = export.export_search(conn, search, args.file, export_format, compress or args.gzip)
+        else:
+            rows = export.export_table(conn, args.source, args.file, export_format, compress or args.gzip)
+    except ValueError as er:
+        echo(u'Cannot export: %s' % er)
+        return 2
+    finally:
+        conn.close()
+    echo(u'%d row(s) written to %s' % (rows, args.file))
+    return 0
+
+
+# Adds or updates the games of a fixture file in one transaction, then lists the lines that were left out
+def import_fixtures(args):
+    conn = open_existing(args.database)
+    try:
+        report = fixtures.import_file(conn, args.file, args.create_matches)
+        ratings.update_ratings(conn)
+    except (IOError, OSError, ValueError) as er:
+        echo(u'Cannot import: %s' % er)
+        return 2
+    finally:
+        conn.close()
+    for line, reason in report.rejected:
+        echo(u'line %d: %s' % (line, reason))
+    echo(u'%s' % report)
+    return 1 if report.rejected else 0
+
+
+# Prints the table of a league in a season, one club per line
+def standings_table(args):
+    conn = open_existing(args.database, archives=True)
+    try:
+        rows = standings.Standings(args.league, args.season).page(conn)[1]
+    except ValueError as er:
+        echo(u'Invalid season: %s' % er)
+        return 2
+    finally:
+        conn.close()
+
+    echo(u'%3s %-28s %3s %3s %3s %3s %4s %4s %4s %4s  %s' % ('#', 'Club', 'P', 'W', 'D', 'L', 'GF', 'GA', 'GD', 'Pts',
+                                                          'Form'))
+    for key, row in rows:
+        echo(u'%3d %-28s %3d %3d %3d %3d %4d %4d %+4d %4d  %s' % row)
+    return 0
+
+
+# Moves the seasons from FIRST_SEASON to LAST_SEASON to an archive file, then lists the archives
+def archive_seasons(args):
+    conn = open_existing(args.database)
+    try:
+        if args.first_season is not None:
+            last_season = args.first_season if args.last_season is None else args.last_season
+            archive_name, games = archive.archive_seasons(conn, args.first_season, last_season, args.folder)
+            echo(u'%d game(s) archived in %s' % (games, archive_name))
+        for archive_name, path, first_season, last_season, games in archive.archives(conn):
+            echo(u'%d-%d\t%d game(s)\t%s' % (first_season, last_season, games, path))
+    except ValueError as er:
+        echo(u'Cannot archive: %s' % er)
+        return 2
+    finally:
+        conn.close()
+    return 0
+
+
+# Writes every game, archived or not, to a snapshot file for the analytics
+def write_snapshot(args):
+    conn = open_existing(args.database, archives=True)
+    try:
+        games = snapshot.write_snapshot(conn, args.file)
+    except ValueError as er:
+        echo(u'Cannot write the snapshot: %s' % er)
+        return 2
+    finally:
+        conn.close()
+    echo(u'%d game(s) written to %s' % (games, args.file))
+    return 0
+
+
+# Prints an aggregate of the games of a snapshot, tab separated with a header line
+def print_analytics(args):
+    try:
+        games = snapshot.Snapshot(args.file)
+    except (IOError, OSError, ValueError) as er:
+        echo(u'Cannot read the snapshot: %s' % er)
+        return 2
+    if args.league is not None:
+        try:
+            games.league_code(args.league)
+        except ValueError as er:
+            echo(u'Invalid league: %s' % er)
+            return 2
+
+    if args.question == 'goals':
+        columns = analytics.GOAL_COLUMNS
+        rows = analytics.goal_distribution(games, args.league, args.season)
+    elif args.question == 'home':
+        columns = analytics.HOME_COLUMNS
+        rows = analytics.home_advantage(games, args.season)
+    else:
+        matrix = analytics.score_matrix(games, args.league, args.season)
+        columns = ['home \\ away'] + [str(goals) for goals in range(len(matrix))]
+        rows = [[goals] + list(row) for goals, row in enumerate(matrix)]
+        rows[-1][0] = columns[-1] = '%d+' % (len(matrix) - 1)
+    echo(u'\t'.join(columns))
+    for row in rows:
+        echo(u'\t'.join([u'%.3f' % value if isinstance(value, float) else text(value) for value in row]))
+    return 0
+
+
+# Prints the ratings of a club after every date it played, or of every club at the end of a season, tab separated
+# with a header line. They are first brought up to date with the games
+def print_ratings(args):
+    if args.club is None and args.season is None:
+        echo(u'Give a club, a season or both')
+        return 2
+    conn = open_existing(args.database)
+    try:
+        ratings.update_ratings(conn)
+    finally:
+        conn.close()
+
+    conn = open_existing(args.database, archives=True)  # The standings of the archived seasons give their leagues
+    try:
+        if args.club is not None:
+            columns, rows = ratings.CLUB_COLUMNS, ratings.club_ratings(conn, args.club, args.season)
+        else:
+            columns, rows = ratings.SEASON_COLUMNS, ratings.season_ratings(conn, args.season, args.league)
+    finally:
+        conn.close()
+    echo(u'\t'.join(columns))
+    for row in rows:
+        echo(u'\t'.join([text(value) for value in row]))
+    return 0
+
+
+# Opens a database for reading, upgrading its tables if it was made by an older version but without downloading. With
+# 'archives' it also reads the archived seasons, and can no longer write to the games
+def open_existing(path, archives=False):
+    conn = pool.connect(path)
+    schema.migrate(conn)
+    if archives:
+        archive.attach(conn, pool.URI)
+    return conn
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='European Football Information Center, without the window.')
+    parser.add_argument('--database', default='footballdb.sqlite', help='path of the database')
+    parser.add_argument('--metrics', help='write the time spent in every statement and stage to this JSON file')
+    parser.add_argument('--slow-log', help='append the slow statements, with their parameters and plan, to this file')
+    parser.add_argument('--slow-ms', type=float, default=metrics.SLOW_SECONDS * 1000,
+                        help='milliseconds above which a statement is slow')
+    commands = parser.add_subparsers(dest='command')
+
+    command = commands.add_parser('ingest', help='download the feeds of the catalogue and write the changed ones')
+    command.add_argument('--force', action='store_true', help='download and write every feed again')
+    command.add_argument('--full-reload', action='store_true', help='drop every table first')
+    command.add_argument('--max-age', type=float, default=0,
+                         help='seconds a feed checked before is not asked for again, 0 asks for every feed')
+    command.add_argument('--mirror', help='folder or address to read the feeds from instead of openfootball')
+    command.add_argument('--processes', type=int, default=None, help='worker processes that build the rows')
+    command.set_defaults(function=ingest)
+
+    command = commands.add_parser('query', help='search a table like the GUI does')
+    command.add_argument('table', choices=sorted(SEARCHES))
+    command.add_argument('conditions', nargs='*', metavar='COLUMN=VALUE')
+    command.add_argument('--full-text', action='store_true', help='search the club and match names by word')
+    command.add_argument('--limit', type=int, default=1000, help='most rows printed')
+    command.set_defaults(function=query)
+
+    command = commands.add_parser('export', help='write a table or a search to a CSV, NDJSON or Parquet file')
+    command.add_argument('source', choices=sorted(export.TABLES))
+    command.add_argument('file', help='the extension tells the format, .gz compresses it')
+    command.add_argument('conditions', nargs='*', metavar='COLUMN=VALUE')
+    command.add_argument('--full-text', action='store_true', help='search the club and match names by word')
+    command.add_argument('--format', choices=[export.CSV, export.NDJSON, export.PARQUET],
+                         help='the format of the file, whatever its extension')
+    command.add_argument('--gzip', action='store_true', help='compress the file')
+    command.set_defaults(function=export_file)
+
+    command = commands.add_parser('import', help='add or update the games of a CSV or JSON file')
+    command.add_argument('file', help='.csv, .json ({"games": [...]}), .ndjson or .jsonl, and .gz compresses it')
+    command.add_argument('--create-matches', action='store_true',
+                         help='create the match names that do not exist instead of leaving their games out')
+    command.set_defaults(function=import_fixtures)
+
+    command = commands.add_parser('standings', help='print the table of a league in a season')
+    command.add_argument('league')
+    command.add_argument('season')
+    command.set_defaults(function=standings_table)
+
+    command = commands.add_parser('archive', help='move closed seasons to a read-only file, or list the archives')
+    command.add_argument('first_season', type=int, nargs='?')
+    command.add_argument('last_season', type=int, nargs='?', help='the first season by default')
+    command.add_argument('--folder', default=archive.FOLDER, help='folder of the archive, next to the database')
+    command.set_defaults(function=archive_seasons)
+
+    command = commands.add_parser('snapshot', help='write every game to a file the analytics read')
+    command.add_argument('file')
+    command.set_defaults(function=write_snapshot)
+
+    command = commands.add_parser('analytics', help='aggregate the games of a snapshot')
+    command.add_argument('file', help='written by the snapshot command')
+    command.add_argument('question', choices=['goals', 'home', 'scores'],
+                         help='the goals a game, the home advantage of every league or the count of every score')
+    command.add_argument('--league', help='only the games of this league, for goals and scores')
+    command.add_argument('--season', type=int, help='only the games of this season')
+    command.set_defaults(function=print_analytics)
+
+    command = commands.add_parser('ratings', help='print the Elo ratings of a club or of a season')
+    command.add_argument('--club', help='the key of the club, its rating after every date it played')
+    command.add_argument('--season', type=int, help='only this season, or every club at its end without --club')
+    command.add_argument('--league', help='only the clubs of this league, with --season')
+    command.set_defaults(function=print_ratings)
+
+    if argv is None:
+        argv = sys.argv[1:]
+    if sys.version_info[0] < 3:  # The arguments are bytes on Python 2, and the names of the feeds are not ASCII
+        argv = [decode(argument) for argument in argv]
+    args = parser.parse_args(argv)
+    if getattr(args, 'function', None) is None:  # Python 3 does not require a command
+        parser.print_help()
+        return 2
+    metrics.RECORDER.slow_seconds = args.slow_ms / 1000.0
+    metrics.RECORDER.slow_log = args.slow_log
+    try:
+        return args.function(args)
+    finally:
+        if args.metrics:
+            metrics.RECORDER.dump(args.metrics)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
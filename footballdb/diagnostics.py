@@ -0,0 +1,97 @@
+"""
+This module checks how SQLite runs the queries of the GUI. It prints the EXPLAIN QUERY PLAN of every statement in
+queries.py, and of every search with a single field filled in, and flags the ones that read a whole table. It also
+flags foreign keys without an index, which make every delete or rename of the parent row scan the child table.
+
+Usage: python -m footballdb.diagnostics [database]
+"""
+import sqlite3
+import sys
+
+from footballdb import queries, ratings, records, schema, standings  # Importing them registers their statements
+
+
+# A value for every kind of search field, used to build the searches to explain
+SAMPLE_VALUES = {queries.TEXT: 'a', queries.NUMBER: '1', queries.DATE: '2015'}
+
+
+# Returns a list of (name, sql) for every named statement, such as those of queries.py and the standings, sorted by
+# name, followed by the search of every table with only one of its fields filled in, through the full-text index if
+# 'full_text' is True
+def gui_queries(full_text=False):
+    statements = sorted([(name, query.sql) for name, query in queries.NAMED.items()], key=lambda query: query[0])
+
+    for table, spec in (('league', queries.LEAGUE_SEARCH), ('match', queries.MATCH_SEARCH),
+                        ('club', queries.CLUB_SEARCH), ('game', queries.GAME_SEARCH)):
+        for column, kind in spec:
+            values = [SAMPLE_VALUES[kind] if field == column else '' for field, field_kind in spec]
+            statements.append(('SEARCH %s.%s' % (table, column),
+                               queries.build_search(table, spec, values, full_text)[0]))
+    return statements
+
+
+# Returns the plan of a statement as a list of detail lines. The parameters do not change the plan, so NULLs are bound
+def query_plan(conn, sql):
+    params = (None,) * sql.count('?')
+    return [row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+
+# A plan line that starts with SCAN reads every row of a table or index. Scans of a constant row or of a subquery that
+# was already filtered are fine, and so is a virtual table given a constraint, such as a full-text MATCH ('32:M1').
+# A virtual table without one ends in ':' ('SCAN club_fts VIRTUAL TABLE INDEX 0:'). A statement writing one of 'views'
+# first finds the rows it changes through the tables of the view, then scans those rows ('SCAN game')
+def is_full_scan(detail, views=()):
+    if 'VIRTUAL TABLE INDEX' in detail:
+        return detail.rstrip().endswith(':')
+    if detail.startswith('SCAN') and detail.split()[1] in views:
+        return False
+    return detail.startswith('SCAN') and not detail.startswith('SCAN CONSTANT') and 'SUBQUERY' not in detail.upper()
+
+
+# Returns a list of (table, columns, parent) for every foreign key whose columns are not the start of an index
+def unindexed_foreign_keys(conn):
+    missing = []
+    tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    for table in tables:
+        indexed = []
+        for index in conn.execute('PRAGMA index_list(%s)' % table).fetchall():
+            indexed.append([row[2] for row in conn.execute('PRAGMA index_info(%s)' % index[1])])
+
+        foreign_keys = {}
+        for row in conn.execute('PRAGMA foreign_key_list(%s)' % table):
+            foreign_keys.setdefault(row[0], (row[2], []))[1].append(row[3])
+        for parent, columns in foreign_keys.values():
+            if not any(index[0:len(columns)] == columns for index in indexed):
+                missing.append((table, columns, parent))
+    return missing
+
+
+# Prints the report and returns the number of problems found
+def report(conn, out=sys.stdout):
+    problems = 0
+    views = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'view'")]
+    for name, sql in gui_queries(schema.has_full_text(conn)):
+        plan = query_plan(conn, sql)
+        scans = [detail for detail in plan if is_full_scan(detail, views)]
+        problems += len(scans)
+        out.write('%-24s %s\n' % (name, 'FULL SCAN' if scans else 'ok'))
+        for detail in plan:
+            out.write('    %s%s\n' % (detail, '   <-- full scan' if is_full_scan(detail, views) else ''))
+
+    for table, columns, parent in unindexed_foreign_keys(conn):
+        problems += 1
+        out.write('UNINDEXED FOREIGN KEY %s(%s) -> %s\n' % (table, ', '.join(columns), parent))
+
+    out.write('%d problem(s) found\n' % problems)
+    return problems
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    conn = sqlite3.connect(argv[0] if argv else 'footballdb.sqlite')
+    schema.migrate(conn)
+    return 1 if report(conn) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+This module runs the queries of the GUI on background threads, so a slow search or a large update never freezes the
+window. Searches are shared by a few reader threads and every write goes through a single writer thread, using the
+connections of a pool.ConnectionPool. The results are handed back to the Tk thread with after(), which is the only
+thread allowed to touch the widgets. Jobs can be put in a group: a newer job of the same group cancels the older one,
+and a query of the older job that is still running is stopped with sqlite3 interrupt(). Every job is timed by
+metrics.RECORDER under its name: the time it waited for a worker, ran on it and took to call back on the Tk thread.
+"""
+import sys
+import threading
+
+try:  # Python 2
+    import Queue as queue
+except ImportError:  # Python 3
+    import queue
+
+from footballdb import metrics, pool
+
+READERS = pool.READERS  # Threads running searches at the same time
+POLL_INTERVAL = 20  # Milliseconds between two looks at the finished jobs while some are pending
+
+
+# One function submitted to the executor. 'connection' is the connection running it, or None when it is not running
+class Job(object):
+    def __init__(self, function, callback, errback, group, name, write):
+        self.function = function
+        self.callback = callback
+        self.errback = errback
+        self.group = group
+        self.name = name
+        self.write = write
+        self.cancelled = False
+        self.connection = None
+        self.submitted = metrics.clock()
+
+
+class QueryExecutor(object):
+    # 'root' is any widget, its after() is used to call back on the Tk thread. 'database' is the path of the database.
+    # 'on_write' is called on the Tk thread after every write job that worked, before its callback, for example to
+    # forget what was read from the tables it may have changed
+    def __init__(self, root, database, readers=READERS, poll_interval=POLL_INTERVAL, on_write=None):
+        self.root = root
+        self.database = database
+        self.pool = pool.ConnectionPool(database, readers)
+        self.poll_interval = poll_interval
+        self.on_write = on_write
+        self.lock = threading.Lock()  # Guards Job.cancelled and Job.connection, which the workers also use
+        self.reads = queue.Queue()
+        self.writes = queue.Queue()
+        self.done = queue.Queue()  # (job, result, error) of every finished job, emptied on the Tk thread
+        self.latest = {}  # group -> the last job submitted in it
+        self.pending = 0  # Jobs submitted and not yet called back
+        self.polling = False
+
+        self.threads = []
+        for jobs, lend in [(self.reads, self.pool.reader)] * readers + [(self.writes, self.pool.writer)]:
+            thread = threading.Thread(target=self.work, args=(jobs, lend))
+            thread.daemon = True  # A query still running does not keep the application open
+            thread.start()
+            self.threads.append(thread)
+
+    # Runs function(conn) on a worker thread, then callback(result) on the Tk thread, or errback(error) if it raised.
+    # With 'write' it runs on the writer thread, and it should commit what it changed, for example inside 'with conn:'.
+    # Submitting a job to a group cancels the job submitted to it before. 'name' is what the job is timed under, the
+    # name of the function by default. Returns the Job
+    def submit(self, function, callback=None, errback=None, group=None, write=False, name=None):
+        job = Job(function, callback, errback, group, name or getattr(function, '__name__', 'job'), write)
+        if group is not None:
+            if group in self.latest:
+                self.cancel(self.latest[group])
+            self.latest[group] = job
+        self.pending += 1
+        if write:
+            self.writes.put(job)
+        else:
+            self.reads.put(job)
+        self.schedule_poll()
+        return job
+
+    # Cancels a job: it is not started if it is still waiting, its query is interrupted if it is running, and its
+    # callbacks are never called
+    def cancel(self, job):
+        with self.lock:
+            job.cancelled = True
+            if job.connection is not None:
+                job.connection.interrupt()
+
+    # The loop of a worker thread. 'lend' is the method of the pool lending it a connection for every job
+    def work(self, jobs, lend):
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            if job.cancelled:  # No need to wait for a connection
+                self.done.put((job, None, None))
+                continue
+
+            result = error = None
+            with lend() as conn:
+                with self.lock:
+                    if not job.cancelled:
+                        job.connection = conn
+                started = metrics.clock()
+                metrics.RECORDER.record(metrics.WAIT, job.name, started - job.submitted)
+                try:
+                    if job.connection is not None:
+                        result = job.function(conn)
+                except Exception as er:  # Handed to the errback on the Tk thread
+                    conn.rollback()
+                    error = er
+                metrics.RECORDER.record(metrics.DB, job.name, metrics.clock() - started, error=error is not None)
+                with self.lock:
+                    job.connection = None
+            self.done.put((job, result, error))
+
+    def schedule_poll(self):
+        if not self.polling:
+            self.polling = True
+            self.root.after(self.poll_interval, self.poll)
+
+    # Calls back the jobs that finished since the last poll. It runs on the Tk thread, and only while jobs are pending
+    def poll(self):
+        self.polling = False
+        while True:
+            try:
+                job, result, error = self.done.get_nowait()
+            except queue.Empty:
+                break
+            self.pending -= 1
+            if job.group is not None and self.latest.get(job.group) is job:
+                del self.latest[job.group]
+            if error is None and job.write and self.on_write is not None:
+                self.on_write()  # Even for a cancelled job, which may have written before it was cancelled
+            if job.cancelled:
+                continue
+            with metrics.RECORDER.timed(metrics.TK, job.name):
+                if error is None:
+                    if job.callback is not None:
+                        job.callback(result)
+                elif job.errback is not None:
+                    job.errback(error)
+                else:
+                    sys.stderr.write('Query failed: %s\n' % error)
+
+        if self.pending > 0:
+            self.schedule_poll()
+
+    # Stops the workers once the jobs already submitted are done, and closes their connections. The jobs of groups,
+    # such as the searches, are cancelled first so a long search does not hold up the exit
+    def close(self):
+        for job in list(self.latest.values()):
+            self.cancel(job)
+        for thread in self.threads[0:-1]:
+            self.reads.put(None)
+        self.writes.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.pool.close()
@@ -0,0 +1,246 @@
+"""
+This module writes tables and search results to files: CSV, newline-delimited JSON, or Parquet when pyarrow is
+installed, each optionally gzip compressed. The rows are read from the cursor CHUNK_ROWS at a time with fetchmany and
+written before the next chunk is read, so the memory used does not grow with the number of rows exported.
+"""
+import csv
+import gzip
+import io
+import json
+import marshal
+import os
+import sys
+import tempfile
+
+from footballdb import queries, snapshot
+
+CHUNK_ROWS = 1000  # Rows read from the cursor and written at a time
+GZIP_LEVEL = 6  # The default of zlib: about the size of the gzip default of 9, in half the time
+
+CSV = 'csv'
+NDJSON = 'ndjson'
+PARQUET = 'parquet'
+
+# The format of every file extension, after removing a '.gz'
+EXTENSIONS = {'.csv': CSV, '.ndjson': NDJSON, '.jsonl': NDJSON, '.json': NDJSON, '.parquet': PARQUET}
+
+# The tables that can be exported whole, in the order of their rows
+TABLES = {
+    'game': queries.Query('EXPORT_GAME', '''SELECT * FROM game ORDER BY id'''),
+    'club': queries.Query('EXPORT_CLUB', '''SELECT * FROM club ORDER BY id'''),
+    'club_year': queries.Query('EXPORT_CLUB_YEAR', '''SELECT * FROM club_year ORDER BY club_key, club_year'''),
+    'league': queries.Query('EXPORT_LEAGUE', '''SELECT * FROM league ORDER BY league_name'''),
+    'match': queries.Query('EXPORT_MATCH', '''SELECT * FROM match ORDER BY match_name'''),
+    'standings': queries.Query('EXPORT_STANDINGS', '''SELECT leagues.league_name, standing.season_year,
+        clubs.id AS club_key, clubs.club_name, played, won, drawn, lost, goals_for, goals_against,
+        goals_for - goals_against AS goal_difference, points
+        FROM standing JOIN leagues ON leagues.league_id = standing.league_id
+        JOIN clubs ON clubs.club_id = standing.club_id
+        ORDER BY leagues.league_name, standing.season_year, points DESC, goals_for - goals_against DESC,
+        goals_for DESC, clubs.id'''),
+}
+
+# Parquet types of the Python values, any other value is written as a string
+PARQUET_TYPES = {int: 'int64', float: 'float64', bool: 'bool'}
+if sys.version_info[0] < 3:
+    PARQUET_TYPES[long] = 'int64'
+
+
+# Returns (format, compress) of a file name such as 'games.csv.gz'. Raises ValueError for an unknown extension
+def file_format(path):
+    compress = path.lower().endswith('.gz')
+    name = path[0:-3] if compress else path
+    for extension, export_format in EXTENSIONS.items():
+        if name.lower().endswith(extension):
+            return export_format, compress
+    raise ValueError("Cannot tell the format of '%s', the extensions are %s" % (path, ', '.join(sorted(EXTENSIONS))))
+
+
+# Yields the rows of a cursor as lists of at most 'size' rows
+def chunks(cursor, size=CHUNK_ROWS):
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            break
+        yield rows
+
+
+# Yields the chunks of the standings with the position of every club in its league table in front of its row
+def with_positions(row_chunks):
+    table = None
+    position = 0
+    for rows in row_chunks:
+        numbered = []
+        for row in rows:
+            position = position + 1 if row[0:2] == table else 1
+            table = row[0:2]
+            numbered.append((position,) + tuple(row))
+        yield numbered
+
+
+# Opens the file to write in binary mode, through gzip if 'compress' is True
+def open_binary(path, compress):
+    if compress:
+        return gzip.open(path, 'wb', GZIP_LEVEL)
+    return open(path, 'wb')
+
+
+def text(value):
+    return value if isinstance(value, type(u'')) else u'%s' % value
+
+
+def write_csv(output, columns, row_chunks):
+    if sys.version_info[0] < 3:  # The csv module of Python 2 writes bytes, so the values are encoded first
+        writer = csv.writer(output)
+        writer.writerow(columns)
+        for rows in row_chunks:
+            writer.writerows([[u'' if value is None else text(value).encode('utf-8') for value in row]
+                              for row in rows])
+        return
+
+    stream = io.TextIOWrapper(output, encoding='utf-8', newline='')
+    writer = csv.writer(stream)
+    writer.writerow(columns)
+    for rows in row_chunks:
+        writer.writerows(rows)
+    stream.flush()
+    stream.detach()  # The caller closes the file
+
+
+# Writes one JSON object per row, its keys in the order of the columns. The keys are encoded once, not on every row
+def write_ndjson(output, columns, row_chunks):
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    keys = [encode(column) + u': ' for column in columns]
+    for rows in row_chunks:
+        lines = [u'{' + u', '.join([key + encode(value) for key, value in zip(keys, row)]) + u'}' for row in rows]
+        output.write((u'\n'.join(lines) + u'\n').encode('utf-8'))
+
+
+# Writes a Parquet file, one row group per chunk. The type of a column is told by all its values, which are only known
+# at the end, so the chunks are first spooled to a temporary file with marshal while their types are looked at, then
+# read back and written. A column that mixes numbers and text, like a score stored as the text 'None', is written as
+# strings, and one that mixes integers and reals as reals. The file is written next to 'path' and renamed to it at the
+# end, so a failed export leaves no file that is half written. Parquet compresses its pages itself, so 'compress'
+# selects gzip pages instead of a .gz file
+def write_parquet(path, columns, row_chunks, compress):
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError('Parquet export needs pyarrow, install it with: pip install pyarrow')
+
+    kinds = [set() for column in columns]
+    spool = tempfile.TemporaryFile()
+    try:
+        for rows in row_chunks:
+            for column_kinds, values in zip(kinds, zip(*rows)):
+                column_kinds.update([PARQUET_TYPES.get(type(value), 'string') for value in values
+                                     if value is not None])
+            marshal.dump([tuple(row) for row in rows], spool)
+        spool.seek(0)
+        types = [column_type(column_kinds) for column_kinds in kinds]
+        schema = pyarrow.schema([(name, getattr(pyarrow, kind)()) for name, kind in zip(columns, types)])
+        write_spooled(pyarrow, path, schema, types, spool, compress)
+    finally:
+        spool.close()
+
+
+def write_spooled(pyarrow, path, schema, types, spool, compress):
+    temporary = path + '.tmp'
+    written = False
+    try:
+        writer = pyarrow.parquet.ParquetWriter(temporary, schema, compression='gzip' if compress else 'snappy')
+        try:
+            while True:
+                try:
+                    rows = marshal.load(spool)
+                except EOFError:
+                    break
+                arrays = [parquet_array(pyarrow, column, kind) for column, kind in zip(zip(*rows), types)]
+                writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+        finally:
+            writer.close()
+        snapshot.replace(temporary, path)
+        written = True
+    except pyarrow.ArrowException as er:
+        raise ValueError('Cannot write the Parquet file: %s' % er)
+    finally:
+        if not written and os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def parquet_array(pyarrow, values, kind):
+    if kind == 'string':
+        values = [None if value is None else text(value) for value in values]
+    elif kind == 'float64':
+        values = [None if value is None else float(value) for value in values]
+    return pyarrow.array(values, type=getattr(pyarrow, kind)())
+
+
+# The type of a column from the types of its values that are not NULL, see write_parquet. A column of NULLs only is
+# written as strings
+def column_type(kinds):
+    if len(kinds) == 1:
+        return list(kinds)[0]
+    if kinds == set(['int64', 'float64']):
+        return 'float64'
+    return 'string'
+
+
+# Writes the columns and the chunks of rows to 'path' in 'export_format', gzip compressed if 'compress' is True
+def write_file(path, columns, row_chunks, export_format=CSV, compress=False):
+    if export_format == PARQUET:
+        write_parquet(path, columns, row_chunks, compress)
+        return
+    output = open_binary(path, compress)
+    try:
+        if export_format == CSV:
+            write_csv(output, columns, row_chunks)
+        else:
+            write_ndjson(output, columns, row_chunks)
+    finally:
+        output.close()
+
+
+# Counts the rows of the chunks as they are written
+class Counter(object):
+    def __init__(self, row_chunks):
+        self.row_chunks = row_chunks
+        self.rows = 0
+
+    def __iter__(self):
+        for rows in self.row_chunks:
+            self.rows += len(rows)
+            yield rows
+
+
+# Exports the whole result of a cursor. The format is told by the extension of 'path' unless it is given. With
+# 'positions' the rows are league tables and a first column numbers the clubs of each. Returns the number of rows
+def export_cursor(cursor, path, export_format=None, compress=None, positions=False):
+    if export_format is None:
+        export_format, compress = file_format(path)
+    columns = [column[0] for column in cursor.description]
+    counter = Counter(chunks(cursor))
+    row_chunks = counter
+    if positions:
+        columns = ['position'] + columns
+        row_chunks = with_positions(counter)
+    write_file(path, columns, row_chunks, export_format, bool(compress))
+    return counter.rows
+
+
+# Exports one of TABLES
+def export_table(conn, table, path, export_format=None, compress=None):
+    return export_cursor(TABLES[table].execute(conn), path, export_format, compress, positions=table == 'standings')
+
+
+# Exports the result of a search as shown in the resultgrid.ResultGrid: a paging.Search is read from its cursor, and
+# the standings and records, which are only a few rows, from their page
+def export_search(conn, search, path, export_format=None, compress=None):
+    if hasattr(search, 'cursor'):
+        return export_cursor(search.cursor(conn), path, export_format, compress)
+    if export_format is None:
+        export_format, compress = file_format(path)
+    columns, rows = search.page(conn)
+    write_file(path, columns, [[row for key, row in rows]], export_format, bool(compress))
+    return len(rows)
@@ -0,0 +1,199 @@
+"""
+This module downloads the openfootball JSON feeds. The downloads run on a small pool of worker threads, so the startup
+loader waits for the slowest feed instead of the sum of all of them. Parsing and inserting is left to the caller, so
+the SQLite connection is still only used from a single thread. A feed can be spooled to a temporary file as it is
+downloaded instead of being held in memory, for the streaming loaders of ingest.py. With a cache.FeedCache the feeds are
+kept on disk and used when the server has not changed them or cannot be reached, and a mirror can stand in for the
+openfootball server. Every download is timed by metrics.RECORDER, with the bytes it read.
+"""
+import hashlib
+import io
+import os
+import socket
+import tempfile
+import threading
+import time
+
+try:  # Python 2
+    from Queue import Queue, Empty
+    from urllib import pathname2url
+    from urllib2 import urlopen, Request, HTTPError, URLError
+except ImportError:  # Python 3
+    from queue import Queue, Empty
+    from urllib.request import pathname2url, urlopen, Request
+    from urllib.error import HTTPError, URLError
+
+from footballdb import metrics
+
+FEED_ROOT = 'https://raw.githubusercontent.com/openfootball/football.json/master/'  # Where the feeds are published
+
+MAX_WORKERS = 8  # How many downloads may run at the same time
+TIMEOUT = 10  # Seconds to wait on a single request before giving up on it
+RETRIES = 2  # How many times a failed request is tried again
+BACKOFF = 0.5  # Seconds to wait before the first retry, doubled for every retry after that
+CHUNK_SIZE = 64 * 1024  # Bytes read from a response at a time when it is spooled
+SPOOL_SIZE = 1024 * 1024  # A spooled feed is kept in memory up to this size, and moved to a temporary file above it
+
+
+# Raised when a feed could not be downloaded, even after retrying
+class FeedError(Exception):
+    def __init__(self, url, reason):
+        Exception.__init__(self, '%s: %s' % (url, reason))
+        self.url = url
+        self.reason = reason
+
+
+# The result of downloading a feed. 'body' is the content, or a file holding it if it was spooled, and None when the
+# server answered 304 Not Modified to a conditional request. 'content_hash' is the SHA-1 of the content
+class FeedResponse(object):
+    def __init__(self, url, body, etag=None, last_modified=None, content_hash=None):
+        self.url = url
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        if content_hash is None and isinstance(body, bytes):
+            content_hash = hashlib.sha1(body).hexdigest()
+        self.content_hash = content_hash
+
+    @property
+    def not_modified(self):
+        return self.body is None
+
+    # Returns the content as a binary file, from its start
+    def stream(self):
+        if isinstance(self.body, bytes):
+            return io.BytesIO(self.body)
+        self.body.seek(0)
+        return self.body
+
+    # Removes the temporary file of a spooled response
+    def close(self):
+        if self.body is not None and not isinstance(self.body, bytes):
+            self.body.close()
+
+
+# Copies a response into a temporary file a chunk at a time. Returns (file, sha1 of the content)
+def spool_response(response):
+    body = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    content_hash = hashlib.sha1()
+    while True:
+        chunk = response.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        content_hash.update(chunk)
+        body.write(chunk)
+    return body, content_hash.hexdigest()
+
+
+# Returns the address of a feed in a mirror of the openfootball feeds: either a directory holding the same folders, such
+# as 2015-16/en.1.json, or the address of a local server with them. Without a mirror the url is returned unchanged
+def mirror_url(url, mirror=None):
+    if not mirror:
+        return url
+    if url.startswith(FEED_ROOT):
+        path = url[len(FEED_ROOT):]
+    else:
+        path = url.split('://', 1)[-1].split('/', 1)[-1]  # The path of the url without its host
+    if '://' in mirror:
+        return mirror.rstrip('/') + '/' + path
+    return 'file:' + pathname2url(os.path.abspath(os.path.join(mirror, *path.split('/'))))
+
+
+# This function downloads a single feed and returns it as a FeedResponse. If the ETag or Last-Modified of an earlier
+# download are given, the request is made conditional so an unchanged feed is not sent again. Network errors and
+# server errors are retried, client errors such as a 404 are not because they will not go away on their own.
+# With 'spool' the body is a temporary file instead of a string (see spool_response)
+def fetch_feed(url, timeout=TIMEOUT, retries=RETRIES, backoff=BACKOFF, etag=None, last_modified=None, spool=False):
+    request = Request(url)
+    if etag:
+        request.add_header('If-None-Match', etag)
+    if last_modified:
+        request.add_header('If-Modified-Since', last_modified)
+
+    start = metrics.clock()
+    attempt = 0
+    while True:
+        try:
+            response = urlopen(request, timeout=timeout)
+            try:
+                if spool:
+                    body, content_hash = spool_response(response)
+                    size = body.tell()
+                else:
+                    body, content_hash = response.read(), None
+                    size = len(body)
+                metrics.RECORDER.record(metrics.NETWORK, 'download', metrics.clock() - start, 1, size)
+                return FeedResponse(url, body, response.info().get('ETag'), response.info().get('Last-Modified'),
+                                    content_hash)
+            finally:
+                response.close()
+        except HTTPError as er:
+            if er.code == 304:
+                metrics.RECORDER.record(metrics.NETWORK, 'not modified', metrics.clock() - start)
+                return FeedResponse(url, None, etag, last_modified)
+            if er.code < 500 or attempt >= retries:
+                metrics.RECORDER.record(metrics.NETWORK, 'download', metrics.clock() - start, error=True)
+                raise FeedError(url, er)
+        except (URLError, socket.timeout, socket.error) as er:
+            if attempt >= retries:
+                metrics.RECORDER.record(metrics.NETWORK, 'download', metrics.clock() - start, error=True)
+                raise FeedError(url, er)
+
+        time.sleep(backoff * (2 ** attempt))
+        attempt += 1
+
+
+# This function downloads all the urls given at the same time, using at most 'max_workers' threads. 'validators' can
+# map a url to the (etag, last_modified) pair of its previous download. It returns a dictionary of url -> FeedResponse
+# once every download is done. If any feed fails, the first error is raised. 'spool' is passed on to fetch_feed.
+# With a cache.FeedCache the request uses the validators of the cached copy instead, a feed the server has not changed
+# is read from the cache, and so is a feed that cannot be downloaded. With a mirror the feeds are read from it instead
+# of their url (see mirror_url), the responses keep the url they were asked for.
+def fetch_all(urls, max_workers=MAX_WORKERS, timeout=TIMEOUT, retries=RETRIES, backoff=BACKOFF, validators=None,
+              spool=False, cache=None, mirror=None):
+    validators = validators or {}
+    jobs = Queue()
+    for url in urls:
+        jobs.put(url)
+
+    responses = {}
+    errors = []
+    lock = threading.Lock()
+
+    # Each worker takes urls off the queue until it is empty
+    def worker():
+        while True:
+            try:
+                url = jobs.get_nowait()
+            except Empty:
+                return
+            etag, last_modified = validators.get(url, (None, None))
+            cached = cache.get(url) if cache is not None else None
+            if cached is not None:
+                etag, last_modified = cached['etag'], cached['last_modified']
+            try:
+                response = fetch_feed(mirror_url(url, mirror), timeout, retries, backoff, etag, last_modified, spool)
+                response.url = url
+                if cached is not None and response.not_modified:
+                    response = cache.response(url, spool)
+                elif cache is not None and not response.not_modified:
+                    cache.put(url, response)
+            except FeedError as er:
+                response = cache.response(url, spool) if cached is not None else None  # Work offline from the cache
+                if response is None:
+                    with lock:
+                        errors.append(er)
+                    continue
+            with lock:
+                responses[url] = response
+
+    threads = [threading.Thread(target=worker) for _ in range(max(1, min(max_workers, len(urls))))]
+    for thread in threads:
+        thread.daemon = True  # Do not keep the program alive if the user closes it during a download
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+    return responses
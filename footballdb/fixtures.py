@@ -0,0 +1,238 @@
+"""
+This module imports games from a fixture file typed or exported by a user: a CSV file with a header line, a JSON file
+holding {"games": [...]}, or a newline-delimited JSON file, each optionally gzip compressed. The columns are those of
+the game table, as export.py writes them, and the scores can be left empty for games not played yet.
+
+The rows are first copied to a staging table. They are then checked with one statement per rule for the whole file,
+instead of one query per row: empty fields, numbers and dates that cannot be read, clubs, leagues and matches that do
+not exist, and the same game twice in the file. A game already in the database, with the same teams and date, is
+updated with the values of the file, and the others are inserted, all in a single transaction. The rows that broke a
+rule are left out and reported with the reason.
+"""
+import csv
+import gzip
+import io
+import json
+import sys
+
+from footballdb import ingest, schema, streaming
+
+# The columns read from the file, in the order of the staging table. Every one but the scores must be filled in
+COLUMNS = ['match_name', 'game_date', 'team_one', 'team_two', 'score_one', 'score_two', 'season_year', 'league_name']
+REQUIRED = ['match_name', 'game_date', 'team_one', 'team_two', 'season_year', 'league_name']
+NUMBERS = ['score_one', 'score_two', 'season_year']
+
+# One row of the file per row, 'line' being its line in a CSV or NDJSON file, or its position in a JSON array.
+# The numbers have INTEGER affinity, so '2' read from a CSV file is stored as 2 and 'two' stays text. The integer keys
+# of the names are looked up once the rows are checked
+STAGE_TABLE = '''
+    CREATE TEMP TABLE IF NOT EXISTS fixture_stage (
+        line    INTEGER NOT NULL PRIMARY KEY,
+        match_name  TEXT,
+        game_date   TEXT,
+        team_one    TEXT,
+        team_two    TEXT,
+        score_one   INTEGER,
+        score_two   INTEGER,
+        season_year INTEGER,
+        league_name TEXT,
+        match_id    INTEGER,
+        team_one_id INTEGER,
+        team_two_id INTEGER,
+        league_id   INTEGER,
+        game_id INTEGER,
+        new_id  INTEGER,
+        error   TEXT
+    );
+    CREATE INDEX IF NOT EXISTS temp.fixture_stage_fixture ON fixture_stage(team_one, team_two, game_date);
+    CREATE INDEX IF NOT EXISTS temp.fixture_stage_game ON fixture_stage(game_id);
+'''
+
+STAGE_ROW = '''INSERT INTO temp.fixture_stage(line, match_name, game_date, team_one, team_two, score_one, score_two,
+    season_year, league_name) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+# The rules, each a condition on the staged row and the reason given when it is true. Each rule only looks at the rows
+# that passed the rules before it, so a row is reported for its first problem
+RULES = [('%s IS NULL' % column, '%s is empty' % column) for column in REQUIRED] + [
+    ("typeof(%s) NOT IN ('integer', 'null')" % column, '%s is not a whole number' % column) for column in NUMBERS] + [
+    ('date(game_date) IS NOT game_date', 'game_date is not a date such as 2015-08-09'),
+    ('team_one = team_two', 'team_one and team_two are the same club'),
+    ('NOT EXISTS (SELECT 1 FROM clubs WHERE id = team_one)', 'team_one is not a club'),
+    ('NOT EXISTS (SELECT 1 FROM clubs WHERE id = team_two)', 'team_two is not a club'),
+    ('NOT EXISTS (SELECT 1 FROM leagues WHERE leagues.league_name = fixture_stage.league_name)',
+     'league_name is not a league'),
+    (schema.ARCHIVED % 'fixture_stage.season_year', 'season_year is archived'),
+]
+MATCH_RULE = ('NOT EXISTS (SELECT 1 FROM matches WHERE matches.match_name = fixture_stage.match_name)',
+              'match_name is not a match')
+
+# A game that is in the file more than once is taken from its first line
+DUPLICATE_RULE = '''UPDATE temp.fixture_stage SET error = 'the same teams and date as line ' || (%(first)s)
+    WHERE error IS NULL AND line > (%(first)s)''' % {'first': '''SELECT MIN(line) FROM temp.fixture_stage earlier
+        WHERE earlier.error IS NULL AND earlier.team_one = fixture_stage.team_one
+        AND earlier.team_two = fixture_stage.team_two AND earlier.game_date = fixture_stage.game_date'''}
+
+CREATE_MATCHES = '''INSERT OR IGNORE INTO matches(match_name)
+    SELECT DISTINCT match_name FROM temp.fixture_stage WHERE error IS NULL'''
+
+# The integer keys of the clubs, league and match named by the valid rows
+FIND_KEYS = '''UPDATE temp.fixture_stage SET match_id = %s, team_one_id = %s, team_two_id = %s, league_id = %s
+    WHERE error IS NULL''' % (schema.MATCH_ID % 'fixture_stage.match_name', schema.CLUB_ID % 'fixture_stage.team_one',
+                              schema.CLUB_ID % 'fixture_stage.team_two',
+                              schema.LEAGUE_ID % 'fixture_stage.league_name')
+
+# The game each row is already in the database as, found through game_fixture
+FIND_GAMES = '''UPDATE temp.fixture_stage SET game_id = (SELECT id FROM games
+    WHERE games.team_one_id = fixture_stage.team_one_id AND games.team_two_id = fixture_stage.team_two_id
+    AND games.game_date = fixture_stage.game_date) WHERE error IS NULL'''
+
+# Updates the games the file changed. Only those are written, so the triggers of the others do not run for nothing
+UPDATE_GAMES = '''UPDATE games SET %s
+    WHERE id IN (SELECT stage.game_id FROM temp.fixture_stage stage JOIN games ON games.id = stage.game_id
+                 WHERE stage.error IS NULL AND (%s))''' % (
+    ', '.join(['%s = (SELECT %s FROM temp.fixture_stage WHERE game_id = games.id AND error IS NULL)' % (column, column)
+               for column in ('match_id', 'score_one', 'score_two', 'season_year', 'league_id')]),
+    ' OR '.join(['stage.%s IS NOT games.%s' % (column, column)
+                 for column in ('match_id', 'score_one', 'score_two', 'season_year', 'league_id')]))
+
+# The new games are given the ids that follow schema.NEXT_GAME_ID in the order of the file, and inserted with them
+NEW_LINES = '''SELECT line FROM temp.fixture_stage WHERE error IS NULL AND game_id IS NULL ORDER BY line'''
+SET_NEW_ID = '''UPDATE temp.fixture_stage SET new_id = ? WHERE line = ?'''
+INSERT_GAMES = '''INSERT INTO games(id, match_id, game_date, team_one_id, team_two_id, score_one, score_two,
+    season_year, league_id) SELECT new_id, match_id, game_date, team_one_id, team_two_id, score_one, score_two,
+    season_year, league_id FROM temp.fixture_stage WHERE error IS NULL AND game_id IS NULL ORDER BY line'''
+
+
+# What an import did. 'rejected' is a list of (line, reason) in the order of the file
+class ImportReport(object):
+    def __init__(self, inserted, updated, unchanged, rejected):
+        self.inserted = inserted
+        self.updated = updated
+        self.unchanged = unchanged
+        self.rejected = rejected
+
+    def __str__(self):
+        return '%d game(s) added, %d updated, %d unchanged, %d rejected' % (self.inserted, self.updated,
+                                                                            self.unchanged, len(self.rejected))
+
+
+# Turns a value of the file into what is staged: text is stripped, and empty text is NULL
+def cell(value):
+    if isinstance(value, bytes) and sys.version_info[0] < 3:
+        value = value.decode('utf-8')
+    if isinstance(value, type(u'')):
+        value = value.strip()
+        return value if value else None
+    return value
+
+
+# Yields (line, values) for every game of a CSV file opened in binary mode, the values in the order of COLUMNS
+def csv_rows(stream):
+    if sys.version_info[0] < 3:  # The csv module of Python 2 reads bytes, cell() decodes them
+        reader = csv.reader(stream)
+    else:
+        reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    header = [cell(name) for name in next(reader, [])]
+    if header and header[0] is not None and header[0].startswith(u'\ufeff'):
+        header[0] = header[0][1:]  # The byte order mark of a file saved by Excel, left by Python 2
+    for row in reader:
+        if any(row):
+            fields = dict(zip(header, row))
+            yield reader.line_num, [cell(fields.get(column)) for column in COLUMNS]
+
+
+# Returns the values of a game read from JSON in the order of COLUMNS. Raises ValueError, naming it by 'where', if it
+# is not an object, as the file cannot be read then
+def game_values(game, where):
+    if not isinstance(game, dict):
+        raise ValueError('%s is not a game object: %s' % (where, json.dumps(game)[0:50]))
+    return [cell(game.get(column)) for column in COLUMNS]
+
+
+# Yields (line, values) for every game of a newline-delimited JSON file opened in binary mode
+def ndjson_rows(stream):
+    for line, text in enumerate(stream, 1):
+        text = text.decode('utf-8-sig' if line == 1 else 'utf-8').strip()
+        if text:
+            yield line, game_values(json.loads(text), 'line %d' % line)
+
+
+# Yields (position, values) for every game of the "games" array of a JSON file opened in binary mode. The array is
+# parsed one game at a time
+def json_rows(stream):
+    position = 0
+    for key, game in streaming.iter_members(stream, arrays=('games',)):
+        if key == 'games':
+            position += 1
+            yield position, game_values(game, 'game %d of the array' % position)
+
+
+READERS = {'.csv': csv_rows, '.ndjson': ndjson_rows, '.jsonl': ndjson_rows, '.json': json_rows}
+
+
+# Returns the function reading the games of a file, told by its extension. Raises ValueError for an unknown one
+def file_reader(path):
+    name = path.lower()[0:-3] if path.lower().endswith('.gz') else path.lower()
+    for extension, reader in READERS.items():
+        if name.endswith(extension):
+            return reader
+    raise ValueError("Cannot tell the format of '%s', the extensions are %s" % (path, ', '.join(sorted(READERS))))
+
+
+# Copies the rows to the staging table, 'batch_size' at a time
+def stage_rows(conn, rows, batch_size=ingest.BATCH_SIZE):
+    batch = []
+    for line, values in rows:
+        batch.append([line] + values)
+        if len(batch) >= batch_size:
+            conn.executemany(STAGE_ROW, batch)
+            batch = []
+    conn.executemany(STAGE_ROW, batch)
+
+
+# Checks the staged rows and merges the valid ones into game. The matches named by the file are created with
+# 'create_matches', otherwise a row with an unknown match is rejected like one with an unknown club
+def merge_staged(conn, create_matches=False):
+    rules = RULES if create_matches else RULES + [MATCH_RULE]
+    for condition, reason in rules:
+        conn.execute('UPDATE temp.fixture_stage SET error = ? WHERE error IS NULL AND (%s)' % condition, (reason,))
+    conn.execute(DUPLICATE_RULE)
+    if create_matches:
+        conn.execute(CREATE_MATCHES)
+
+    conn.execute(FIND_KEYS)
+    conn.execute(FIND_GAMES)
+    existing = conn.execute('''SELECT COUNT(*) FROM temp.fixture_stage WHERE error IS NULL AND game_id IS NOT NULL''')
+    existing = existing.fetchone()[0]
+    updated = conn.execute(UPDATE_GAMES).rowcount
+    next_id = conn.execute('SELECT ' + schema.NEXT_GAME_ID).fetchone()[0]
+    conn.executemany(SET_NEW_ID, [(next_id + number, line)
+                                  for number, (line,) in enumerate(conn.execute(NEW_LINES).fetchall())])
+    inserted = conn.execute(INSERT_GAMES).rowcount
+    rejected = conn.execute('''SELECT line, error FROM temp.fixture_stage WHERE error IS NOT NULL ORDER BY line''')
+    return ImportReport(inserted, updated, existing - updated, rejected.fetchall())
+
+
+# Imports the games of a file opened in binary mode, read by one of READERS, in one transaction. Returns an
+# ImportReport. A file that cannot be read at all raises ValueError and nothing is imported
+def import_stream(conn, stream, reader, create_matches=False):
+    conn.executescript(STAGE_TABLE)
+    try:
+        with conn:
+            conn.execute('DELETE FROM temp.fixture_stage')
+            try:
+                stage_rows(conn, reader(stream))
+            except (csv.Error, UnicodeDecodeError) as er:
+                raise ValueError('The file cannot be read: %s' % er)
+            return merge_staged(conn, create_matches)
+    finally:
+        conn.execute('DELETE FROM temp.fixture_stage')
+        conn.commit()
+
+
+# Imports the games of the file at 'path', see import_stream
+def import_file(conn, path, create_matches=False):
+    reader = file_reader(path)
+    stream = gzip.open(path, 'rb') if path.lower().endswith('.gz') else open(path, 'rb')
+    with stream:
+        return import_stream(conn, stream, reader, create_matches)
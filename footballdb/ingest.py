@@ -0,0 +1,219 @@
+"""
+This module turns parsed openfootball feeds into row tuples and writes them with executemany, so every statement is
+prepared once per feed instead of once per club or game. The write functions do not commit: the caller wraps each
+feed in a single transaction (see sync.sync_feeds). The stream_* functions read a feed as it is parsed and write it a
+batch at a time, so a feed of any size is loaded in the memory of one batch. feed_rows and write_rows split the work in
+two, so the rows of many feeds can be built in other processes while a single connection writes them.
+"""
+import contextlib
+import json
+import sqlite3
+
+from footballdb import metrics, schema, streaming
+
+BATCH_SIZE = 1000  # Clubs or games held in memory before they are written, when a feed is streamed
+
+# The kinds of feed, see catalogue.py
+CLUBS = 'clubs'
+MATCHES = 'matches'
+
+# SQLite 3.24 and newer can insert-or-update a row in a single statement, older versions need an UPDATE and an INSERT
+HAS_UPSERT = sqlite3.sqlite_version_info >= (3, 24, 0)
+
+# The statements below write the tables of integer keys (see schema.SURROGATE_KEY_TABLES), and look the keys up from
+# the names of the feed bound to their parameters
+KEYS = {'league': schema.LEAGUE_ID % '?', 'match': schema.MATCH_ID % '?', 'club': schema.CLUB_ID % '?',
+        'game_id': schema.NEXT_GAME_ID}
+
+# Update a club only if the feed changed it, then insert it if it is new
+UPDATE_CLUB = '''UPDATE clubs SET club_name = ?, abbr = ?, league_id = %(league)s WHERE id = ?
+    AND (club_name IS NOT ? OR abbr IS NOT ? OR league_id IS NOT %(league)s)''' % KEYS
+INSERT_CLUB = '''INSERT OR IGNORE INTO clubs(id, club_name, abbr, league_id) VALUES(?, ?, ?, %(league)s)''' % KEYS
+INSERT_CLUB_YEAR = '''INSERT OR IGNORE INTO club_years(club_id, club_year) VALUES(%(club)s, ?)''' % KEYS
+
+# Update a game if the feed changed it, for example once it has been played, then insert it if it is new.
+# A game is identified by its two teams and its date. A new one is inserted with schema.NEXT_GAME_ID
+UPDATE_GAME = '''UPDATE games SET score_one = ?, score_two = ?, match_id = %(match)s, season_year = ?,
+    league_id = %(league)s WHERE team_one_id = %(club)s AND team_two_id = %(club)s AND game_date = ?
+    AND (score_one IS NOT ? OR score_two IS NOT ? OR match_id IS NOT %(match)s OR season_year IS NOT ?
+    OR league_id IS NOT %(league)s)''' % KEYS
+INSERT_GAME = '''INSERT OR IGNORE INTO games(id, team_one_id, team_two_id, score_one, score_two, game_date,
+    match_id, season_year, league_id)
+    VALUES(%(game_id)s, %(club)s, %(club)s, ?, ?, ?, %(match)s, ?, %(league)s)''' % KEYS
+UPSERT_GAME = '''INSERT INTO games(id, team_one_id, team_two_id, score_one, score_two, game_date, match_id,
+    season_year, league_id) VALUES(%(game_id)s, %(club)s, %(club)s, ?, ?, ?, %(match)s, ?, %(league)s)
+    ON CONFLICT(team_one_id, team_two_id, game_date) DO UPDATE SET
+    score_one = excluded.score_one, score_two = excluded.score_two, match_id = excluded.match_id,
+    season_year = excluded.season_year, league_id = excluded.league_id
+    WHERE score_one IS NOT excluded.score_one OR score_two IS NOT excluded.score_two
+    OR match_id IS NOT excluded.match_id OR season_year IS NOT excluded.season_year
+    OR league_id IS NOT excluded.league_id''' % KEYS
+
+ARCHIVED_SEASON = 'SELECT %s' % (schema.ARCHIVED % '?')
+
+
+# The feeds name a league like 'English Premier League 2015/16', so the last 8 characters are cut off
+def league_name(data_dictionary):
+    name = data_dictionary['name']
+    return name[0:len(name) - 8]
+
+
+# This function builds the rows of a clubs feed. Returns (league_name, club_rows, club_year_rows) where a club row is
+# (id, club_name, abbr, league_name) and a club_year row is (club_key, club_year)
+def club_rows(data_dictionary, year):
+    league = league_name(data_dictionary)
+    clubs = []
+    club_years = []
+    for club in data_dictionary['clubs']:
+        clubs.append((club['key'], club['name'], club['code'], league))
+        club_years.append((club['key'], year))
+    return league, clubs, club_years
+
+
+# This function builds the rows of a matches feed. Returns (league_name, match_names, game_rows) where a game row is
+# (team_one, team_two, score_one, score_two, game_date, match_name, season_year, league_name)
+def game_rows(matches_dictionary, season_year):
+    league = league_name(matches_dictionary)
+    match_names = []
+    games = []
+    for match in matches_dictionary['rounds']:
+        match_names.append(match['name'])
+        for item in match['matches']:
+            games.append((item['team1']['key'], item['team2']['key'], item['score1'], item['score2'], item['date'],
+                          match['name'], season_year, league))
+    return league, match_names, games
+
+
+# This function writes a parsed clubs feed: its league, its clubs and the year each club played in. Returns the number
+# of clubs
+def write_clubs(conn, data_dictionary, year):
+    return write_club_rows(conn, *club_rows(data_dictionary, year))
+
+
+# This function writes the rows built by club_rows. Returns the number of clubs
+def write_club_rows(conn, league, clubs, club_years):
+    conn.execute('''INSERT OR IGNORE INTO leagues(league_name) VALUES(?)''', (league,))
+    conn.executemany(UPDATE_CLUB, [(name, abbr, club_league, key, name, abbr, club_league)
+                                   for key, name, abbr, club_league in clubs])
+    conn.executemany(INSERT_CLUB, clubs)
+    conn.executemany(INSERT_CLUB_YEAR, club_years)
+    return len(clubs)
+
+
+# This function writes a parsed matches feed: its match names and its games. Returns the number of games written
+def write_matches(conn, matches_dictionary, season_year):
+    return write_game_rows(conn, *game_rows(matches_dictionary, season_year))
+
+
+# This function writes the rows built by game_rows. A club missing from the clubs feeds is added with only its key, so
+# its games keep it, as the standings do (see standings.league_table). The games of an archived season are left out,
+# as the triggers of schema.ARCHIVE_SCRIPT would ignore them. Returns the number of games written
+def write_game_rows(conn, league, match_names, games):
+    archived = set([season for season in set([game[6] for game in games])
+                    if conn.execute(ARCHIVED_SEASON, (season,)).fetchone()[0]])
+    games = [game for game in games if game[6] not in archived]
+    conn.execute('''INSERT OR IGNORE INTO leagues(league_name) VALUES(?)''', (league,))
+    conn.executemany('''INSERT OR IGNORE INTO matches(match_name) VALUES(?)''', [(name,) for name in match_names])
+    conn.executemany('''INSERT OR IGNORE INTO clubs(id) VALUES(?)''',
+                     [(key,) for key in sorted(set([game[0] for game in games] + [game[1] for game in games]))])
+    if HAS_UPSERT:
+        conn.executemany(UPSERT_GAME, games)
+        return len(games)
+    conn.executemany(UPDATE_GAME, [(score_one, score_two, match_name, season, game_league, team_one, team_two,
+                                    game_date, score_one, score_two, match_name, season, game_league)
+                                   for team_one, team_two, score_one, score_two, game_date, match_name, season,
+                                   game_league in games])
+    conn.executemany(INSERT_GAME, games)
+    return len(games)
+
+
+# This function writes a clubs feed read from a binary stream, 'batch_size' clubs at a time. It writes the same rows
+# as write_clubs
+def stream_clubs(conn, stream, year, batch_size=BATCH_SIZE):
+    stream_feed(conn, stream, year, CLUBS, 'clubs', lambda club: 1, write_clubs, batch_size)
+
+
+# This function writes a matches feed read from a binary stream, whole rounds at a time, once at least 'batch_size'
+# games are waiting. It writes the same rows as write_matches
+def stream_matches(conn, stream, season_year, batch_size=BATCH_SIZE):
+    stream_feed(conn, stream, season_year, MATCHES, 'rounds', lambda match: len(match['matches']), write_matches,
+                batch_size)
+
+
+# Reads the elements of the array 'key' of a feed and hands them to write_function in small feeds of their own, with
+# the name of the whole feed. 'size' tells how many rows an element makes, and write_function returns how many it
+# wrote. The name comes first in the openfootball feeds, the elements read before it are kept until it is found. The
+# time spent reading the JSON and writing the rows are recorded apart in metrics.RECORDER, under the kind of the feed,
+# with the rows read and the rows written
+def stream_feed(conn, stream, year, kind, key, size, write_function, batch_size):
+    start = metrics.clock()
+    writing = 0.0
+    total = 0
+    parsed = 0
+    name = None
+    batch = []
+    rows = 0
+    written = False
+    for member, value in streaming.iter_members(stream, arrays=(key,)):
+        if member == 'name':
+            name = value
+        elif member == key:
+            batch.append(value)
+            rows += size(value)
+        if name is not None and rows >= batch_size:
+            write_start = metrics.clock()
+            total += write_function(conn, {'name': name, key: batch}, year)
+            writing += metrics.clock() - write_start
+            parsed += rows
+            batch = []
+            rows = 0
+            written = True
+
+    if name is None:
+        raise ValueError('The feed has no name')
+    if batch or not written:  # A feed without any element still writes its league
+        write_start = metrics.clock()
+        total += write_function(conn, {'name': name, key: batch}, year)
+        writing += metrics.clock() - write_start
+        parsed += rows
+    metrics.RECORDER.record(metrics.PARSE, kind, metrics.clock() - start - writing, parsed, stream.tell())
+    metrics.RECORDER.record(metrics.INSERT, kind, writing, total)
+
+
+# This function builds the rows of a feed of the given kind from its content, as club_rows or game_rows. It only takes
+# and returns plain values, so it can run in a multiprocessing pool
+def feed_rows(kind, body, year):
+    data_dictionary = json.loads(body.decode('utf-8'))
+    if kind == CLUBS:
+        return club_rows(data_dictionary, year)
+    return game_rows(data_dictionary, year)
+
+
+# This function writes the rows built by feed_rows. Returns the number of clubs or games written
+def write_rows(conn, kind, rows):
+    if kind == CLUBS:
+        return write_club_rows(conn, *rows)
+    return write_game_rows(conn, *rows)
+
+
+# This function writes a feed of the given kind read from a binary stream, with stream_clubs or stream_matches
+def write_stream(conn, kind, stream, year):
+    if kind == CLUBS:
+        stream_clubs(conn, stream, year)
+    else:
+        stream_matches(conn, stream, year)
+
+
+# Use this around a large load. WAL lets the GUI keep reading while feeds are written, and synchronous=NORMAL only
+# syncs the disk at checkpoints instead of on every commit. The previous synchronous setting is put back afterwards;
+# the journal mode is stored in the database file and stays WAL.
+@contextlib.contextmanager
+def bulk_load(conn, wal=True):
+    synchronous = conn.execute('PRAGMA synchronous').fetchone()[0]
+    if wal:
+        conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    try:
+        yield conn
+    finally:
+        conn.execute('PRAGMA synchronous = %d' % synchronous)
@@ -0,0 +1,46 @@
+"""
+This module opens the database and brings it up to date with the feeds of the catalogue. It is shared by the GUI in
+Football.py and the command line in cli.py, and nothing here runs until it is called, so importing it is free.
+"""
+import functools
+import os
+
+from footballdb import cache, catalogue, feeds, pool, ratings, schema, sync
+
+DATABASE = 'footballdb.sqlite'
+
+# Every feed downloaded is kept compressed in this folder. A feed the server has not changed since is read from there
+# instead of being downloaded, and so is every feed when there is no network, so only the very first load needs one
+CACHE_DIRECTORY = 'feed_cache'
+
+# To run without the openfootball server at all, set this environment variable to a folder holding copies of the feeds
+# in their 2015-16 and 2016-17 folders, or to the address of a local server that has them
+MIRROR_VARIABLE = 'FOOTBALL_FEED_MIRROR'
+
+
+# Opens the database, creating the tables the first time and upgrading them if it was made by an older version. With
+# 'full_reload' every table is dropped first. The connection is made by pool.connect, with the foreign keys on and the
+# statement cache of the application
+def open_database(path=DATABASE, full_reload=False):
+    conn = pool.connect(path)
+    if full_reload:
+        schema.drop_schema(conn)
+    schema.migrate(conn)
+    return conn
+
+
+# Downloads the feeds that may have changed and writes the ones that did, see sync.sync_feeds, then brings the ratings
+# up to the games they changed. 'feed_list' defaults to every feed of the catalogue, and 'mirror' to the
+# MIRROR_VARIABLE environment variable. Set 'cache_directory' to None to use no cache. Returns the list of urls that
+# were applied
+def load_feeds(conn, feed_list=None, force=False, max_age=sync.MAX_AGE, cache_directory=CACHE_DIRECTORY, mirror=None,
+               processes=None):
+    if feed_list is None:
+        feed_list = catalogue.feed_list()
+    if mirror is None:
+        mirror = os.environ.get(MIRROR_VARIABLE)
+    feed_cache = cache.FeedCache(cache_directory) if cache_directory else None
+    fetch_all = functools.partial(feeds.fetch_all, cache=feed_cache, mirror=mirror)
+    applied = sync.sync_feeds(conn, feed_list, max_age, force, fetch_all, processes)
+    ratings.update_ratings(conn)
+    return applied
@@ -0,0 +1,331 @@
+"""
+This module measures where the time of the application goes, so a slow window can be told apart from a slow database
+or a slow network. Every SQL statement run through a connection of pool.connect is timed from its execute to its last
+row, with the rows it returned or changed. The jobs of executor.QueryExecutor are timed three times: waiting for a
+worker ('wait'), running on it ('db') and calling back on the Tk thread ('tk'). The feeds are timed as they download
+('network'), as their JSON is read ('parse') and as their rows are written ('insert').
+
+Every measure goes to a latency histogram under its kind and name. A statement slower than RECORDER.slow_seconds is
+also written to the slow-query log, with its bound parameters and its EXPLAIN QUERY PLAN, in memory and, when
+RECORDER.slow_log is set, as one JSON object per line in that file. report() is what the Status window of the GUI
+shows, and dump() writes everything as JSON.
+"""
+import bisect
+import collections
+import contextlib
+import json
+import sqlite3
+import threading
+import time
+
+from footballdb import queries
+
+clock = getattr(time, 'perf_counter', time.time)  # Python 2 has no perf_counter
+
+# The kinds of measures, in the order report() lists them
+WAIT = 'wait'
+DB = 'db'
+TK = 'tk'
+NETWORK = 'network'
+PARSE = 'parse'
+INSERT = 'insert'
+SQL = 'sql'
+KINDS = [WAIT, DB, TK, NETWORK, PARSE, INSERT, SQL]
+
+# The upper bounds of the buckets of a histogram, in seconds. A last bucket holds whatever is slower
+BOUNDS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+SLOW_SECONDS = 0.1  # Statements slower than this are written to the slow-query log
+SLOW_ENTRIES = 200  # Slow statements kept in memory, the oldest are dropped first
+
+
+# The latencies of one name, bucketed by BOUNDS
+class Histogram(object):
+    def __init__(self):
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    # Returns the upper bound of the bucket holding the latency below which 'fraction' of them are, at most the max
+    def percentile(self, fraction):
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(BOUNDS + [self.max], self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+# What was measured under one kind and name
+class Stat(object):
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.histogram = Histogram()
+        self.rows = 0
+        self.size = 0  # Bytes
+        self.errors = 0
+
+    def as_dict(self):
+        histogram = self.histogram
+        milliseconds = lambda seconds: round(seconds * 1000, 3)
+        return {
+            'kind': self.kind, 'name': self.name, 'count': histogram.count, 'errors': self.errors,
+            'rows': self.rows, 'bytes': self.size, 'total_ms': milliseconds(histogram.total),
+            'mean_ms': milliseconds(histogram.total / histogram.count) if histogram.count else 0,
+            'p50_ms': milliseconds(histogram.percentile(0.5)), 'p95_ms': milliseconds(histogram.percentile(0.95)),
+            'p99_ms': milliseconds(histogram.percentile(0.99)), 'max_ms': milliseconds(histogram.max),
+            'histogram': [[None if index == len(BOUNDS) else milliseconds(BOUNDS[index]), count]
+                          for index, count in enumerate(histogram.counts) if count]}
+
+
+# Filled in by the 'with' block of Recorder.timed
+class Measure(object):
+    def __init__(self):
+        self.rows = 0
+        self.size = 0
+
+
+# Collects the measures of every thread
+class Recorder(object):
+    def __init__(self, slow_seconds=SLOW_SECONDS, slow_log=None):
+        self.slow_seconds = slow_seconds
+        self.slow_log = slow_log  # Path of the file the slow statements are appended to, or None
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.since = time.time()
+            self.stats = {}  # (kind, name) -> Stat
+            self.slow = collections.deque(maxlen=SLOW_ENTRIES)
+
+    def record(self, kind, name, seconds, rows=0, size=0, error=False):
+        with self.lock:
+            stat = self.stats.get((kind, name))
+            if stat is None:
+                stat = self.stats[(kind, name)] = Stat(kind, name)
+            stat.histogram.add(seconds)
+            stat.rows += rows
+            stat.size += size
+            if error:
+                stat.errors += 1
+
+    # Times the 'with' block under a kind and name. The block can set the rows and size of the Measure it is given
+    @contextlib.contextmanager
+    def timed(self, kind, name):
+        measure = Measure()
+        start = clock()
+        error = True
+        try:
+            yield measure
+            error = False
+        finally:
+            self.record(kind, name, clock() - start, measure.rows, measure.size, error)
+
+    # Records a statement run by a Cursor, and logs it with its plan on 'conn' if it was slow
+    def statement(self, conn, name, sql, parameters, seconds, rows, error=False):
+        self.record(SQL, name, seconds, rows, error=error)
+        if seconds < self.slow_seconds:
+            return
+        entry = {'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'name': name, 'ms': round(seconds * 1000, 3),
+                 'rows': rows, 'error': error, 'sql': ' '.join(sql.split()), 'parameters': parameters,
+                 'plan': explain(conn, sql, parameters)}
+        with self.lock:
+            self.slow.append(entry)
+            if self.slow_log:
+                try:
+                    with open(self.slow_log, 'a') as log:
+                        log.write(json.dumps(entry, default=repr) + '\n')
+                except (IOError, OSError):
+                    pass  # The log is only a help, a full disk should not fail the query
+
+    # Everything measured as plain values: the stats in the order of KINDS, the slowest first, and the slow statements
+    def snapshot(self):
+        with self.lock:
+            stats = sorted(self.stats.values(), key=lambda stat: (KINDS.index(stat.kind), -stat.histogram.total))
+            return {'since': self.since, 'slow_seconds': self.slow_seconds,
+                    'stats': [stat.as_dict() for stat in stats], 'slow': list(self.slow)}
+
+    # Writes the snapshot to a JSON file
+    def dump(self, path):
+        with open(path, 'w') as output:
+            json.dump(self.snapshot(), output, default=repr, indent=1, sort_keys=True)
+
+    # The snapshot as lines of text: the total time of every kind first, then every name, then the slow statements
+    def report(self):
+        snapshot = self.snapshot()
+        totals = collections.OrderedDict((kind, 0.0) for kind in KINDS)
+        for stat in snapshot['stats']:
+            totals[stat['kind']] += stat['total_ms']
+        lines = ['Total ms: ' + ', '.join(['%s %.1f' % (kind, total) for kind, total in totals.items()]), '',
+                 '%-7s %-32s %6s %6s %10s %8s %8s %8s %8s %10s' % ('kind', 'name', 'count', 'errors', 'total ms',
+                                                                  'mean', 'p95', 'max', 'rows', 'bytes')]
+        for stat in snapshot['stats']:
+            lines.append('%-7s %-32s %6d %6d %10.1f %8.2f %8.2f %8.2f %8d %10d' % (
+                stat['kind'], stat['name'][0:32], stat['count'], stat['errors'], stat['total_ms'], stat['mean_ms'],
+                stat['p95_ms'], stat['max_ms'], stat['rows'], stat['bytes']))
+        lines.extend(['', 'Statements slower than %d ms, the latest last:' % (snapshot['slow_seconds'] * 1000)])
+        for entry in snapshot['slow']:
+            lines.append('%s %s %.1f ms, %d row(s), parameters %r' % (entry['time'], entry['name'], entry['ms'],
+                                                                     entry['rows'], entry['parameters']))
+            lines.append('    ' + entry['sql'])
+            lines.extend(['    ' + step for step in entry['plan']])
+        return lines
+
+
+RECORDER = Recorder()  # The recorder of the application
+
+NAMED_SQL = {}  # The SQL of every named statement of queries.py -> its name, filled in as statements are registered
+
+
+# The name a statement is measured under: its name in queries.NAMED, otherwise its verb and table, such as
+# 'SELECT game' or 'INSERT games', so the searches of a table add up under one name whatever their conditions
+def statement_name(sql):
+    if len(NAMED_SQL) != len(queries.NAMED):
+        NAMED_SQL.update((query.sql, name) for name, query in list(queries.NAMED.items()))
+    name = NAMED_SQL.get(sql)
+    if name is not None:
+        return name
+    words = sql.replace('(', ' ').split()
+    if not words:
+        return 'empty'
+    verb = words[0].upper()
+    if verb == 'PRAGMA' and len(words) > 1:
+        return verb + ' ' + words[1].split('=')[0]
+    for index, word in enumerate(words[0:-1]):
+        if word.upper() in ('FROM', 'INTO', 'UPDATE', 'TABLE'):
+            return verb + ' ' + words[index + 1]
+    return verb
+
+
+# Returns the lines of the query plan of a statement, or the reason it has none
+def explain(conn, sql, parameters):
+    try:
+        cursor = sqlite3.Cursor(conn)  # Not a Cursor of this module, the plan is not measured itself
+        return [row[-1] for row in cursor.execute('EXPLAIN QUERY PLAN ' + sql, parameters or ())]
+    except (sqlite3.Error, ValueError) as er:
+        return ['no plan: %s' % er]
+
+
+# A cursor that times every statement it runs, from its execute to its last row. The rows are counted as they are
+# fetched, and the statement is recorded once they are all read, the cursor runs another one or it is closed.
+# Iterating the cursor is left to sqlite3, so that a loop over its rows pays for no Python call per row: those rows
+# are neither timed nor counted, and the statement is recorded with the time of its execute
+class Cursor(sqlite3.Cursor):
+    def __init__(self, *args, **kwargs):
+        sqlite3.Cursor.__init__(self, *args, **kwargs)
+        self.statement = None  # [name, sql, parameters, seconds, rows] of the statement whose rows are being read
+
+    def execute(self, sql, parameters=()):
+        self.finish()
+        start = clock()
+        try:
+            sqlite3.Cursor.execute(self, sql, parameters)
+        except Exception:
+            RECORDER.statement(self.connection, statement_name(sql), sql, parameters, clock() - start, 0, True)
+            raise
+        self.statement = [statement_name(sql), sql, parameters, clock() - start, 0]
+        if self.description is None:  # Not a query, nothing to read
+            self.statement[4] = max(self.rowcount, 0)
+            self.finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self.finish()
+        if isinstance(seq_of_parameters, list):  # The log shows the first row and how many there were
+            logged = {'first': seq_of_parameters[0] if seq_of_parameters else None, 'count': len(seq_of_parameters)}
+        else:
+            logged = None
+        start = clock()
+        error = True
+        try:
+            sqlite3.Cursor.executemany(self, sql, seq_of_parameters)
+            error = False
+        finally:
+            RECORDER.statement(self.connection, statement_name(sql), sql, logged, clock() - start,
+                               max(self.rowcount, 0), error)
+        return self
+
+    def executescript(self, script):
+        self.finish()
+        with RECORDER.timed(SQL, 'script'):
+            sqlite3.Cursor.executescript(self, script)
+        return self
+
+    # Adds the time of a fetch and the rows it read to the statement, and records it if it has no more rows
+    def fetched(self, start, rows, last):
+        statement = self.statement
+        if statement is not None:
+            statement[3] += clock() - start
+            statement[4] += rows
+            if last:
+                self.finish()
+
+    def fetchone(self):
+        start = clock()
+        row = self.guarded(sqlite3.Cursor.fetchone)
+        self.fetched(start, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        start = clock()
+        size = self.arraysize if size is None else size
+        rows = self.guarded(sqlite3.Cursor.fetchmany, size)
+        self.fetched(start, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        start = clock()
+        rows = self.guarded(sqlite3.Cursor.fetchall)
+        self.fetched(start, len(rows), True)
+        return rows
+
+    # Calls a fetch method, recording the statement as failed if it raises, for example when it was interrupted
+    def guarded(self, method, *args):
+        try:
+            return method(self, *args)
+        except Exception:
+            self.finish(True)
+            raise
+
+    def close(self):
+        self.finish()
+        sqlite3.Cursor.close(self)
+
+    # Records the statement whose rows were being read
+    def finish(self, error=False):
+        statement = getattr(self, 'statement', None)
+        if statement is not None:
+            self.statement = None
+            RECORDER.statement(self.connection, statement[0], statement[1], statement[2], statement[3], statement[4],
+                               error)
+
+    def __del__(self):
+        try:
+            self.finish()
+        except Exception:
+            pass  # The interpreter may be shutting down
+
+
+# A connection whose cursors are Cursors, given to sqlite3.connect as its factory
+class Connection(sqlite3.Connection):
+    def cursor(self, factory=Cursor):
+        return sqlite3.Connection.cursor(self, factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
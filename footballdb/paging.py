@@ -0,0 +1,68 @@
+"""
+This module reads the result of a search one page at a time, so the GUI never has to hold the whole result. Pages are
+found by key instead of by OFFSET: the next page is the rows whose integer key (see queries.ROW_KEYS) comes after the
+last row shown, which an index finds directly however far the user has scrolled. Ranked full-text results have no
+such key and are paged by position, but they only hold the names that matched.
+"""
+from footballdb import queries
+
+PAGE_SIZE = 100  # Rows read from the database at a time
+
+
+# A search of one table that can be read a page at a time. The arguments are the same as queries.build_search
+class Search(object):
+    def __init__(self, table, spec, values, full_text=False):
+        self.table = table
+        self.key = table + '.' + queries.ROW_KEYS[table]
+        self.from_clause, self.conditions, self.parameters, self.rank = queries.search_parts(table, spec, values,
+                                                                                             full_text)
+
+    # Reads the page of rows just after the row with key 'after', or just before the row with key 'before', or the
+    # first page if neither is given. 'conn' can be a connection or a cursor.
+    # Returns (columns, rows) where every row is a (key, values) pair, in the order they are shown
+    def page(self, conn, after=None, before=None, limit=PAGE_SIZE):
+        if self.rank:
+            return self.ranked_page(conn, after, before, limit)
+
+        conditions = list(self.conditions)
+        parameters = list(self.parameters)
+        if after is not None:
+            conditions.append(self.key + ' > ?')
+            parameters.append(after)
+        if before is not None:
+            conditions.append(self.key + ' < ?')
+            parameters.append(before)
+
+        sql = 'SELECT %s, %s.* FROM %s' % (self.key, self.table, self.from_clause)
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY %s %s LIMIT ?' % (self.key, 'DESC' if before is not None else 'ASC')
+        cursor = conn.execute(sql, parameters + [limit])
+
+        rows = [(row[0], row[1:]) for row in cursor.fetchall()]
+        if before is not None:
+            rows.reverse()  # Read backwards from 'before', shown forwards
+        return [column[0] for column in cursor.description][1:], rows
+
+    # Runs the whole search, in the order of its pages, and returns the cursor, so the rows can be read a chunk at a
+    # time without paging (see export.py). The rows have no key in front
+    def cursor(self, conn):
+        sql = 'SELECT %s.* FROM %s' % (self.table, self.from_clause)
+        if self.conditions:
+            sql += ' WHERE ' + ' AND '.join(self.conditions)
+        sql += ' ORDER BY ' + (self.rank or self.key)
+        return conn.execute(sql, self.parameters)
+
+    # Full-text results are ordered by rank, so the key of a row is its position in the result
+    def ranked_page(self, conn, after, before, limit):
+        if before is not None:
+            offset = max(0, before - limit)
+            limit = before - offset
+        else:
+            offset = 0 if after is None else after + 1
+
+        sql = 'SELECT %s.* FROM %s WHERE %s ORDER BY %s LIMIT ? OFFSET ?' % (self.table, self.from_clause,
+                                                                           ' AND '.join(self.conditions), self.rank)
+        cursor = conn.execute(sql, self.parameters + [limit, offset])
+        rows = [(offset + number, row) for number, row in enumerate(cursor.fetchall())]
+        return [column[0] for column in cursor.description], rows
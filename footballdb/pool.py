@@ -0,0 +1,86 @@
+"""
+This module hands out the connections of the database: a few readers, which searches and exports can use at the same
+time, and a single writer, which the writes take in turn, so they never wait on each other's locks inside SQLite. The
+database is put in WAL mode, where readers see the last commit while the writer works instead of waiting for it.
+Every connection keeps the statements it compiled in an LRU cache, so the named statements of queries.py and the
+searches a user repeats are compiled once per connection instead of on every call. The readers also read the seasons
+moved to archive files (see archive.py).
+"""
+import contextlib
+import sqlite3
+import sys
+import threading
+
+try:  # Python 2
+    import Queue as queue
+except ImportError:  # Python 3
+    import queue
+
+from footballdb import archive, metrics
+
+READERS = 2  # Connections that can read at the same time
+TIMEOUT = 30  # Seconds a connection waits for a lock held by another one
+
+# Compiled statements kept by every connection. The named statements of queries.py and the standings take about 20,
+# and a search is one statement for every set of filled fields and page direction, so this keeps every search of a
+# session without recompiling it. Python's own default is 100 or 128
+STATEMENT_CACHE = 256
+
+# sqlite3.connect takes uri=True from Python 3.4. The connections then read URI filenames, which the archives are
+# attached with so they can be opened immutable
+URI = sys.version_info[0:2] >= (3, 4)
+
+
+# Opens a connection with the foreign keys on and the statement cache sized for the application. With 'read_only'
+# SQLite refuses any write through it. With 'archives' it also reads the archived seasons, see archive.attach: the
+# database must be up to date, and the connection can no longer write to the games. It can be used by any thread, one
+# at a time. Its statements are timed by metrics.RECORDER
+def connect(database, read_only=False, archives=False):
+    options = {'uri': True} if URI else {}
+    conn = sqlite3.connect(database, timeout=TIMEOUT, cached_statements=STATEMENT_CACHE, check_same_thread=False,
+                           factory=metrics.Connection, **options)
+    conn.execute('PRAGMA foreign_keys = ON')
+    if archives:
+        archive.attach(conn, URI)  # Before query_only, which also refuses to create its temporary views
+    if read_only:
+        conn.execute('PRAGMA query_only = ON')
+    return conn
+
+
+class ConnectionPool(object):
+    def __init__(self, database, readers=READERS):
+        self.database = database
+        self.writer_connection = connect(database)
+        self.writer_connection.execute('PRAGMA journal_mode = WAL')  # Stored in the file, so before the readers open
+        self.write_lock = threading.Lock()
+        self.readers = [connect(database, read_only=True, archives=True) for number in range(readers)]
+        self.idle = queue.Queue()
+        for conn in self.readers:
+            self.idle.put(conn)
+
+    # Lends a reader connection for the 'with' block, waiting for one if they are all in use
+    @contextlib.contextmanager
+    def reader(self):
+        conn = self.idle.get()
+        try:
+            yield conn
+        finally:
+            conn.rollback()  # A reader left in a transaction would hold on to its snapshot of the database
+            self.idle.put(conn)
+
+    # Lends the writer connection for the 'with' block, waiting while another thread has it. What the block changed
+    # should be committed inside it, for example with 'with conn:'
+    @contextlib.contextmanager
+    def writer(self):
+        with self.write_lock:
+            try:
+                yield self.writer_connection
+            except Exception:
+                self.writer_connection.rollback()
+                raise
+
+    # Closes every connection. The connections lent must have been given back
+    def close(self):
+        for conn in self.readers:
+            conn.close()
+        self.writer_connection.close()
@@ -0,0 +1,171 @@
+"""
+This module holds the SQL run by the buttons of the GUI, so the statements can be checked without starting it (see
+diagnostics.py). Every name matches the button handler in Football.py that runs it, and every statement is a Query
+object registered under that name. The searches are built from what
+the user typed by build_search, so that every filter can use an index.
+"""
+try:
+    unichr
+except NameError:  # Python 3
+    unichr = chr
+
+# How the value typed in a search field is compared with its column
+TEXT = 'text'  # Prefix match, without case. A leading '*' searches anywhere in the text instead, without an index
+NUMBER = 'number'  # '2' is an exact match, '1-3' or '1..3' a range, and '>2', '>=2', '<2', '<=2' open ranges
+DATE = 'date'  # '2015' or '2015-08' match every date that starts with it, '2015-08..2015-09' is a range of them
+
+# Fields searched through the full-text index when the database has one (see schema.create_full_text_index). The words
+# typed are matched anywhere in the name, as prefixes and without case or accents, and the best matches come first.
+# table -> (full-text table, column joining it to the table, columns in the index)
+FULL_TEXT = {'club': ('club_fts', 'id', ['id', 'club_name']), 'match': ('match_fts', 'match_name', ['match_name'])}
+
+# The integer key of the rows of every table searched, the last column of its view (see schema.COMPATIBILITY_VIEWS).
+# The results are shown in the order of their keys and paged by them
+ROW_KEYS = {'league': 'league_id', 'match': 'match_id', 'club': 'club_id', 'game': 'id'}
+
+# The fields of every search, in the order of the Entries of the GUI
+LEAGUE_SEARCH = [('league_name', TEXT)]
+MATCH_SEARCH = [('match_name', TEXT)]
+CLUB_SEARCH = [('id', TEXT), ('club_name', TEXT), ('abbr', TEXT), ('league_name', TEXT)]
+GAME_SEARCH = [('match_name', TEXT), ('game_date', DATE), ('team_one', TEXT), ('team_two', TEXT), ('score_one', NUMBER),
+               ('score_two', NUMBER), ('season_year', NUMBER), ('league_name', TEXT)]
+
+# Every named statement, by name
+NAMED = {}
+
+
+# A statement of the application under a name. Its SQL never changes, so a connection compiles it the first time it runs
+# it and then finds it in its statement cache (see pool.STATEMENT_CACHE)
+class Query(object):
+    def __init__(self, name, sql):
+        self.name = name
+        self.sql = sql
+        NAMED[name] = self
+
+    # Runs the statement on a connection or cursor and returns the cursor
+    def execute(self, conn, parameters=()):
+        return conn.execute(self.sql, parameters)
+
+
+# League Section
+ADD_LEAGUE = Query('ADD_LEAGUE', '''INSERT INTO league(league_name) VALUES (?)''')
+DELETE_LEAGUE = Query('DELETE_LEAGUE', '''DELETE FROM league WHERE league_name = ?''')
+UPDATE_LEAGUE = Query('UPDATE_LEAGUE', '''UPDATE league SET league_name = ? WHERE league_name = ?''')
+
+# Match Section
+ADD_MATCH = Query('ADD_MATCH', '''INSERT INTO match(match_name) VALUES (?)''')
+DELETE_MATCH = Query('DELETE_MATCH', '''DELETE FROM match WHERE match_name = ?''')
+UPDATE_MATCH = Query('UPDATE_MATCH', '''UPDATE match SET match_name = ? WHERE match_name = ?''')
+
+# Club Section
+ADD_CLUB = Query('ADD_CLUB', '''INSERT INTO club(id, club_name, abbr, league_name) VALUES (?, ?, ?, ?)''')
+DELETE_CLUB = Query('DELETE_CLUB', '''DELETE FROM club WHERE id = ?''')
+UPDATE_CLUB = Query('UPDATE_CLUB', '''UPDATE club SET id = ?, club_name = ?, abbr = ?, league_name = ? WHERE id = ?''')
+
+# Game Section
+ADD_GAME = Query('ADD_GAME', '''INSERT INTO game(match_name, game_date, team_one, team_two, score_one, score_two,
+    season_year, league_name) VALUES (?, ?, ?, ?, ?, ?, ?, ?)''')
+DELETE_GAME = Query('DELETE_GAME', '''DELETE FROM game WHERE match_name = ? AND game_date = ? AND team_one = ?
+    AND team_two = ?''')
+UPDATE_GAME = Query('UPDATE_GAME', '''UPDATE game SET match_name = ?, team_one = ?, team_two = ?, score_one = ?,
+    score_two = ?, game_date = ?, season_year = ?, league_name = ? WHERE id = ?''')
+
+
+# Returns the smallest string that is greater than every string starting with 'prefix', so that
+# "column >= prefix AND column < prefix_end(prefix)" is a case sensitive "column LIKE 'prefix%'" that can use an index
+def prefix_end(prefix):
+    return prefix[0:len(prefix) - 1] + unichr(ord(prefix[-1]) + 1)
+
+
+# The same as prefix_end for strings compared COLLATE NOCASE, which compares the letters A to Z as a to z. The prefix
+# is lowered first, and '@', whose next character 'A' compares as 'a', ends at '[', the next character after it that
+# is not a capital letter. The TEXT columns searched have a NOCASE index (see schema.NOCASE_SCRIPT)
+def nocase_prefix_end(prefix):
+    end = prefix_end(''.join([character.lower() if 'A' <= character <= 'Z' else character for character in prefix]))
+    return end[0:-1] + '[' if 'A' <= end[-1] <= 'Z' else end
+
+
+# Turns one search field into a list of conditions and parameters. Raises ValueError if a number cannot be read
+def field_conditions(column, kind, value):
+    if kind == TEXT:
+        if value.startswith('*'):
+            return [column + ' LIKE ?'], ['%' + value[1:] + '%']
+        return [column + ' >= ? COLLATE NOCASE', column + ' < ? COLLATE NOCASE'], [value, nocase_prefix_end(value)]
+
+    if kind == DATE:
+        if '..' in value:
+            low, high = value.split('..', 1)
+            return [column + ' >= ?', column + ' < ?'], [date_range(low)[0], date_range(high)[1]]
+        return [column + ' >= ?', column + ' < ?'], list(date_range(value))
+
+    for operator in ('>=', '<=', '>', '<'):
+        if value.startswith(operator):
+            return [column + ' ' + operator + ' ?'], [number(value[len(operator):])]
+    for separator in ('..', '-'):
+        if separator in value:
+            low, high = value.split(separator, 1)
+            return [column + ' BETWEEN ? AND ?'], [number(low), number(high)]
+    return [column + ' = ?'], [number(value)]
+
+
+# Returns the first date starting with 'value' and the string just after the last one. The dates are stored as text in a
+# DATE column, which has NUMERIC affinity, so SQLite would compare a bare year such as '2015', or the '2016' and '2015.'
+# that end its range, as numbers. The year 2015 is searched as '2015-' up to '2016-' instead
+def date_range(value):
+    value = value.strip()
+    if value.isdigit():
+        return value + '-', str(int(value) + 1) + '-'
+    return value, prefix_end(value)
+
+
+# Reads a whole number typed by the user
+def number(value):
+    try:
+        return int(value.strip())
+    except ValueError:
+        raise ValueError("'%s' is not a number" % value.strip())
+
+
+# Turns the words typed in a full-text field into an FTS5 query for that column: every word is quoted, so punctuation
+# such as the '^' of '10^ Giornata' is not read as syntax, and must be the start of a word of the name
+def full_text_query(column, value):
+    words = ['"%s"*' % word.replace('"', '""') for word in value.split()]
+    return column + ' : (' + ' AND '.join(words) + ')'
+
+
+# Turns what the user typed into the parts of a search query of a table. 'spec' is one of the *_SEARCH lists and
+# 'values' the text typed in each of its fields, in the same order. Empty fields are left out, so a search with no input
+# returns the whole table. With 'full_text' the fields listed in FULL_TEXT use the full-text index.
+# Returns (from_clause, conditions, parameters, rank) where rank is the column to order by for the best matches first,
+# or None when the full-text index is not used
+def search_parts(table, spec, values, full_text=False):
+    fts_table, fts_key, fts_columns = FULL_TEXT.get(table, (None, None, []))
+    conditions = []
+    parameters = []
+    matches = []
+    for (column, kind), value in zip(spec, values):
+        value = value.strip()
+        if len(value) == 0:
+            continue
+        if full_text and column in fts_columns and not value.startswith('*'):
+            matches.append(full_text_query(column, value))
+        else:
+            field_sql, field_parameters = field_conditions(table + '.' + column, kind, value)
+            conditions.extend(field_sql)
+            parameters.extend(field_parameters)
+
+    if not matches:
+        return table, conditions, parameters, None
+    from_clause = '%s JOIN %s ON %s.%s = %s.%s' % (fts_table, table, table, fts_key, fts_table, fts_key)
+    return from_clause, [fts_table + ' MATCH ?'] + conditions, [' AND '.join(matches)] + parameters, fts_table + '.rank'
+
+
+# Builds the whole search query of a table, see search_parts. Returns (sql, parameters)
+def build_search(table, spec, values, full_text=False):
+    from_clause, conditions, parameters, rank = search_parts(table, spec, values, full_text)
+    sql = 'SELECT %s.* FROM %s' % (table, from_clause)
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    if rank:
+        sql += ' ORDER BY ' + rank
+    return sql, parameters
@@ -0,0 +1,178 @@
+"""
+This module rates the clubs with the Elo system, from every game with a result in date order. A club starts at
+INITIAL_RATING, and after each game the winner takes points from the loser: more the less the result was expected
+from their ratings, the home club counting HOME_ADVANTAGE points stronger, and more for a wider margin. The rating of
+every club after each date it played is kept in the rating table (see schema.RATING_SCRIPT), so the ratings of a club
+in a season, or of every club at the end of one, are read rather than computed.
+
+A rating depends on every game before it, so a game added, deleted or changed changes the ratings of both its clubs
+from its date on, and those of every club they played after. The triggers on games write down the earliest date
+changed, and update_ratings computes the ratings again from that date only: the ratings before it are kept, and the
+games after it are played again from them. Adding the games of the last round of a season plays those games and
+nothing else. update_ratings runs after every write of the GUI and of the command line that can change a game.
+"""
+from footballdb import archive, pool, queries, schema, standings
+
+INITIAL_RATING = 1500.0  # The rating of a club before its first game
+K_FACTOR = 20.0  # The most points a club can win or lose in a game with a one-goal margin
+HOME_ADVANTAGE = 60.0  # Points added to the rating of the home club to tell how likely it is to win
+
+# The earliest date changed since the ratings were computed, or None if they are up to date
+STALE = '''SELECT MIN(from_date) FROM rating_stale'''
+
+# The rating of every club before a date, from its last row before it
+BEFORE = '''SELECT rating.club_id, rating.rating FROM rating
+    JOIN (SELECT club_id, MAX(game_date) AS game_date FROM rating WHERE game_date < ? GROUP BY club_id) latest
+    ON latest.club_id = rating.club_id AND latest.game_date = rating.game_date'''
+
+# The games of one database rated from a date on. The archives are read too, as a date may be before an archived season
+GAMES = '''SELECT game_date, id, season_year, team_one_id, team_two_id, score_one, score_two FROM %%s.games games
+    WHERE game_date >= ? AND %s''' % (schema.RATING_GAME % {'row': 'games'})
+
+INSERT_RATING = '''INSERT INTO rating(club_id, game_date, season_year, rating, change, games)
+    VALUES (?, ?, ?, ?, ?, ?)'''
+
+# The ratings of a club after every date it played, the latest first. They are kept unrounded, so the ratings played
+# again from a date are those a full replay gives, and only rounded when read
+CLUB = queries.Query('RATINGS_CLUB', '''SELECT game_date, season_year, ROUND(rating, 1), ROUND(change, 1), games
+    FROM rating WHERE club_id = %s ORDER BY game_date DESC''' % (schema.CLUB_ID % '?'))
+CLUB_SEASON = queries.Query('RATINGS_CLUB_SEASON', '''SELECT game_date, season_year, ROUND(rating, 1),
+    ROUND(change, 1), games FROM rating WHERE club_id = %s AND season_year = ? ORDER BY game_date DESC''' % (
+    schema.CLUB_ID % '?'))
+
+# The rating of every club that played in a season at the end of it, with its change and games in the season, the
+# best rated first. In a league, the clubs of its standings in that season
+SEASON = '''SELECT clubs.id, clubs.club_name, ROUND(rating.rating, 1),
+    ROUND((SELECT SUM(change) FROM rating season WHERE season.season_year = rating.season_year
+           AND season.club_id = rating.club_id), 1),
+    (SELECT SUM(games) FROM rating season WHERE season.season_year = rating.season_year
+     AND season.club_id = rating.club_id)
+    FROM rating JOIN clubs ON clubs.club_id = rating.club_id
+    WHERE rating.season_year = ?%s
+    AND rating.game_date = (SELECT MAX(game_date) FROM rating latest WHERE latest.season_year = rating.season_year
+                            AND latest.club_id = rating.club_id)
+    ORDER BY rating.rating DESC, clubs.id'''
+SEASON_ALL = queries.Query('RATINGS_SEASON', SEASON % '')
+SEASON_LEAGUE = queries.Query('RATINGS_SEASON_LEAGUE', SEASON % '''
+    AND rating.club_id IN (SELECT club_id FROM standing WHERE league_id = %s AND season_year = ?)''' % (
+    schema.LEAGUE_ID % '?'))
+
+CLUB_COLUMNS = ['game_date', 'season_year', 'rating', 'change', 'games']
+SEASON_COLUMNS = ['position', 'club', 'rating', 'change', 'games']
+
+
+# The result the home club is expected to get against the away club, from 0 for a certain loss to 1 for a certain win
+def expected(home_rating, away_rating, home_advantage=HOME_ADVANTAGE):
+    return 1.0 / (1.0 + 10.0 ** ((away_rating - home_rating - home_advantage) / 400.0))
+
+
+# How many times K_FACTOR a result with that margin is worth: once up to one goal, one and a half times for two, and
+# then an eighth more for every goal
+def margin(goal_difference):
+    goal_difference = abs(goal_difference)
+    if goal_difference <= 1:
+        return 1.0
+    if goal_difference == 2:
+        return 1.5
+    return (11.0 + goal_difference) / 8.0
+
+
+# Returns the points the home club wins from the away club in a game with that score, negative if it loses them
+def change(home_rating, away_rating, score_one, score_two):
+    result = 1.0 if score_one > score_two else 0.5 if score_one == score_two else 0.0
+    return K_FACTOR * margin(score_one - score_two) * (result - expected(home_rating, away_rating))
+
+
+# Plays the games of 'rows', in date order, from the 'ratings' of the clubs before them, a dictionary of club_id to
+# rating that is updated. Returns the rows of the rating table they give: one for every club and date it played
+def play(rows, ratings):
+    written = []
+    day = None
+    played = {}  # club_id -> [season_year, change, games] of the clubs that played on 'day'
+    for game_date, game_id, season_year, team_one, team_two, score_one, score_two in rows:
+        if game_date != day:
+            written.extend(day_rows(day, played, ratings))
+            day = game_date
+            played = {}
+        home = ratings.get(team_one, INITIAL_RATING)
+        away = ratings.get(team_two, INITIAL_RATING)
+        points = change(home, away, score_one, score_two)
+        ratings[team_one] = home + points
+        ratings[team_two] = away - points
+        for club_id, won in ((team_one, points), (team_two, -points)):
+            state = played.setdefault(club_id, [season_year, 0.0, 0])
+            state[0] = season_year
+            state[1] += won
+            state[2] += 1
+    written.extend(day_rows(day, played, ratings))
+    return written
+
+
+def day_rows(day, played, ratings):
+    return [(club_id, day, season_year, ratings[club_id], points, games)
+            for club_id, (season_year, points, games) in played.items()]
+
+
+# Computes the ratings again from the earliest date a game changed at, if one did, in one transaction of 'conn',
+# which must not be in one. Returns the number of games played again
+def update_ratings(conn):
+    from_date = conn.execute(STALE).fetchone()[0]
+    if from_date is None:
+        return 0
+    attached = archive.attach_files(conn, pool.URI)
+    try:
+        with conn:
+            ratings = dict(conn.execute(BEFORE, (from_date,)).fetchall())
+            sql = '\nUNION ALL '.join([GAMES % schema_name for schema_name in
+                                       ['main'] + [archive_name for archive_name, first, last in attached]])
+            rows = conn.execute(sql + '\nORDER BY game_date, id', (from_date,) * (len(attached) + 1)).fetchall()
+            conn.execute('DELETE FROM rating WHERE game_date >= ?', (from_date,))
+            conn.executemany(INSERT_RATING, play(rows, ratings))
+            conn.execute('DELETE FROM rating_stale')
+    finally:
+        for archive_name, first_season, last_season in attached:
+            conn.execute('DETACH DATABASE %s' % archive_name)
+    return len(rows)
+
+
+# Returns the ratings of a club after every date it played as a list of rows in the order of CLUB_COLUMNS, the latest
+# first, in one season when 'season_year' is given
+def club_ratings(conn, club_key, season_year=None):
+    if season_year is None:
+        return CLUB.execute(conn, (club_key,)).fetchall()
+    return CLUB_SEASON.execute(conn, (club_key, season_year)).fetchall()
+
+
+# Returns the rating of every club at the end of a season as a list of rows in the order of SEASON_COLUMNS, the best
+# first, only the clubs of a league when 'league_name' is given. A club is shown by standings.club_label
+def season_ratings(conn, season_year, league_name=None):
+    if league_name is None:
+        rows = SEASON_ALL.execute(conn, (season_year,)).fetchall()
+    else:
+        rows = SEASON_LEAGUE.execute(conn, (season_year, league_name, season_year)).fetchall()
+    return [(position + 1, standings.club_label(row[0], row[1])) + tuple(row[2:]) for position, row in enumerate(rows)]
+
+
+# The ratings below can be shown in the resultgrid.ResultGrid like a paging.Search. The arguments are what the user
+# typed. They are read whole on the first page, and their rows are keyed by position
+class ClubRatings(object):
+    def __init__(self, club_key, season_year=''):
+        self.club_key = club_key.strip()
+        self.season_year = queries.number(season_year) if season_year.strip() else None  # ValueError if not a year
+
+    def page(self, conn, after=None, before=None, limit=None):
+        if after is not None or before is not None:
+            return CLUB_COLUMNS, []
+        return CLUB_COLUMNS, list(enumerate(club_ratings(conn, self.club_key, self.season_year)))
+
+
+class SeasonRatings(object):
+    def __init__(self, season_year, league_name=''):
+        self.season_year = queries.number(season_year)  # Raises ValueError if it is not a year
+        self.league_name = league_name.strip() or None
+
+    def page(self, conn, after=None, before=None, limit=None):
+        if after is not None or before is not None:
+            return SEASON_COLUMNS, []
+        rows = season_ratings(conn, self.season_year, self.league_name)
+        return SEASON_COLUMNS, [(row[0], row) for row in rows]
@@ -0,0 +1,159 @@
+"""
+This module answers how a club did: against another club, in its last games, and at home and away in every season.
+A club can be team_one or team_two of a game, so every lookup reads both sides, each through an index that starts with
+the club (see schema.CLUB_SEASON_TABLE). The home and away records are read from the club_season table the triggers on
+games keep up to date, so they cost a few rows per club however many games it played.
+"""
+from footballdb import queries, schema
+
+FORM_GAMES = 10  # Games shown in the form of a club
+
+# Every game between two clubs, newest first, whichever was at home. Both halves use game_fixture
+HEAD_TO_HEAD = queries.Query('RECORDS_HEAD_TO_HEAD', '''SELECT game_date, team_one, team_two, score_one, score_two,
+    season_year, league_name
+    FROM game WHERE id IN (SELECT id FROM games WHERE team_one_id = %(club)s AND team_two_id = %(club)s
+                           UNION ALL
+                           SELECT id FROM games WHERE team_one_id = %(club)s AND team_two_id = %(club)s)
+    ORDER BY game_date DESC''' % {'club': schema.CLUB_ID % '?'})
+
+# The last games of a club that have a result, newest first, from its own side. Each half reads at most 'games' rows
+# from an index starting with the club and the date, and only those are given their names
+RECENT = queries.Query('RECORDS_RECENT', '''SELECT game_date, venue, opponent.id, goals_for, goals_against,
+    season_year, league_name
+    FROM (SELECT * FROM (SELECT game_date, 'home' AS venue, team_two_id AS opponent_id, score_one AS goals_for,
+                                score_two AS goals_against, season_year, league_id FROM games
+                         WHERE team_one_id = %(club)s AND typeof(score_one) = 'integer'
+                         AND typeof(score_two) = 'integer'
+                         ORDER BY game_date DESC LIMIT ?)
+          UNION ALL
+          SELECT * FROM (SELECT game_date, 'away', team_one_id, score_two, score_one, season_year, league_id
+                         FROM games WHERE team_two_id = %(club)s AND typeof(score_one) = 'integer'
+                         AND typeof(score_two) = 'integer'
+                         ORDER BY game_date DESC LIMIT ?)
+          ORDER BY game_date DESC LIMIT ?)
+    LEFT JOIN clubs opponent ON opponent.club_id = opponent_id LEFT JOIN leagues USING (league_id)
+    ORDER BY game_date DESC''' % {'club': schema.CLUB_ID % '?'})
+
+# The home and away records of a club, the latest season first
+SPLITS = queries.Query('RECORDS_SPLITS', '''SELECT season_year, venue, played, won, drawn, lost, goals_for,
+    goals_against FROM club_season WHERE club_id = %s ORDER BY season_year DESC, venue DESC''' % (
+    schema.CLUB_ID % '?'))
+
+HEAD_TO_HEAD_COLUMNS = ['game_date', 'team_one', 'team_two', 'score_one', 'score_two', 'result', 'season_year',
+                        'league_name']
+FORM_COLUMNS = ['game_date', 'venue', 'opponent', 'goals_for', 'goals_against', 'result', 'season_year', 'league_name']
+SPLIT_COLUMNS = ['season_year', 'venue', 'played', 'won', 'drawn', 'lost', 'goals_for', 'goals_against', 'points']
+
+
+# 'W', 'D' or 'L' for a club that scored 'goals_for', or None if the game has no result yet
+def result(goals_for, goals_against):
+    if goals_for is None or goals_against is None:
+        return None
+    if goals_for > goals_against:
+        return 'W'
+    return 'D' if goals_for == goals_against else 'L'
+
+
+# Returns every game between two clubs as a list of rows in the order of HEAD_TO_HEAD_COLUMNS, newest first. The
+# result is from the side of 'club_key'
+def head_to_head(conn, club_key, opponent_key):
+    games = []
+    for game_date, team_one, team_two, score_one, score_two, season_year, league_name in HEAD_TO_HEAD.execute(
+            conn, (club_key, opponent_key, opponent_key, club_key)).fetchall():
+        if team_one == club_key:
+            outcome = result(score_one, score_two)
+        else:
+            outcome = result(score_two, score_one)
+        games.append((game_date, team_one, team_two, score_one, score_two, outcome, season_year, league_name))
+    return games
+
+
+# Adds up the games of head_to_head: returns (played, won, drawn, lost, goals_for, goals_against) of 'club_key'
+def head_to_head_total(games, club_key):
+    total = [0, 0, 0, 0, 0, 0]
+    for game_date, team_one, team_two, score_one, score_two, outcome, season_year, league_name in games:
+        if outcome is None:
+            continue
+        goals_for, goals_against = (score_one, score_two) if team_one == club_key else (score_two, score_one)
+        total[0] += 1
+        total['WDL'.index(outcome) + 1] += 1
+        total[4] += goals_for
+        total[5] += goals_against
+    return tuple(total)
+
+
+# Returns the last games of a club as a list of rows in the order of FORM_COLUMNS, newest first
+def form(conn, club_key, games=FORM_GAMES):
+    rows = RECENT.execute(conn, (club_key, games, club_key, games, games)).fetchall()
+    return [row[0:5] + (result(row[3], row[4]),) + row[5:] for row in rows]
+
+
+# Returns the home and away records of a club as a list of rows in the order of SPLIT_COLUMNS, the latest season first.
+# Every season has its 'home' and 'away' rows, when the club played there, followed by an 'all' row adding them up.
+# With 'season_year' only that season is returned
+def splits(conn, club_key, season_year=None):
+    rows = []
+    for row in SPLITS.execute(conn, (club_key,)).fetchall():
+        if season_year is not None and row[0] != season_year:
+            continue
+        if rows and rows[-1][0] != row[0]:
+            rows.append(season_total(rows))
+        rows.append(row + (3 * row[3] + row[4],))
+    if rows:
+        rows.append(season_total(rows))
+    return rows
+
+
+# The 'all' row of the season of the last row of 'rows'
+def season_total(rows):
+    season = [row for row in rows if row[0] == rows[-1][0] and row[1] != 'all']
+    return (rows[-1][0], 'all') + tuple([sum(column) for column in zip(*[row[2:] for row in season])])
+
+
+# The lookups below can be shown in the resultgrid.ResultGrid like a paging.Search. The arguments are what the user
+# typed. They are read whole on the first page, and their rows are keyed by position
+class Lookup(object):
+    columns = []
+
+    def page(self, conn, after=None, before=None, limit=None):
+        if after is not None or before is not None:
+            return self.columns, []
+        return self.columns, list(enumerate(self.rows(conn)))
+
+
+# The games between two clubs, after a first row with the total of the first club
+class HeadToHead(Lookup):
+    columns = HEAD_TO_HEAD_COLUMNS
+
+    def __init__(self, club_key, opponent_key):
+        self.club_key = club_key.strip()
+        self.opponent_key = opponent_key.strip()
+
+    def rows(self, conn):
+        games = head_to_head(conn, self.club_key, self.opponent_key)
+        played, won, drawn, lost, goals_for, goals_against = head_to_head_total(games, self.club_key)
+        total = ('total', self.club_key, self.opponent_key, goals_for, goals_against,
+                 '%dW %dD %dL' % (won, drawn, lost), '', '')
+        return [total] + games
+
+
+class Form(Lookup):
+    columns = FORM_COLUMNS
+
+    def __init__(self, club_key, games=FORM_GAMES):
+        self.club_key = club_key.strip()
+        self.games = games
+
+    def rows(self, conn):
+        return form(conn, self.club_key, self.games)
+
+
+class Splits(Lookup):
+    columns = SPLIT_COLUMNS
+
+    def __init__(self, club_key, season_year=''):
+        self.club_key = club_key.strip()
+        self.season_year = queries.number(season_year) if season_year.strip() else None  # ValueError if not a year
+
+    def rows(self, conn):
+        return splits(conn, self.club_key, self.season_year)
@@ -0,0 +1,157 @@
+"""
+This module keeps the reference tables in memory: the names of the leagues and matches, the keys of the clubs and the
+seasons every club played. The GUI completes what the user types in the league, match and club fields from it, and
+checks an add or update against it before sending it, so a league that does not exist is refused at once instead of
+by a FOREIGN KEY error from SQLite. Typing never runs a query.
+
+The tables are read in one job on a reader thread, and read again after every write, which may have changed them (see
+executor.QueryExecutor on_write). Until they are read the checks pass everything, and SQLite refuses what is wrong as it
+did before.
+"""
+import bisect
+
+LEAGUE = 'league'
+MATCH = 'match'
+CLUB = 'club'
+
+COMPLETIONS = 30  # Values offered at most while a field is typed in
+
+# The values of every kind, and the seasons of every club
+READS = {
+    LEAGUE: '''SELECT league_name FROM leagues''',
+    MATCH: '''SELECT match_name FROM matches''',
+    CLUB: '''SELECT id FROM clubs''',
+}
+CLUB_YEARS = '''SELECT clubs.id, club_year FROM club_years JOIN clubs USING (club_id)'''
+ARCHIVED = '''SELECT first_season, last_season FROM archive'''  # The seasons no game can be added to, see archive.py
+
+
+# The names of one kind, sorted by their lower case so they can be completed without regard to case
+class Names(object):
+    def __init__(self, values):
+        self.values = set(values)
+        self.folded = sorted([(value.lower(), value) for value in self.values])
+
+    # Returns the values starting with 'prefix', whatever its case, in order
+    def complete(self, prefix, limit=COMPLETIONS):
+        prefix = prefix.lower()
+        found = []
+        for index in range(bisect.bisect_left(self.folded, (prefix,)), len(self.folded)):
+            folded, value = self.folded[index]
+            if not folded.startswith(prefix) or len(found) >= limit:
+                break
+            found.append(value)
+        return found
+
+
+# Reads the reference tables. It only returns plain values, so it can run on a reader thread. Returns
+# (names, club_years, archived) where names maps every kind to its list of values, club_years every club key to the
+# list of its seasons, and archived is the list of (first_season, last_season) of the archives
+def read_tables(conn):
+    names = {}
+    for kind, sql in READS.items():
+        names[kind] = [row[0] for row in conn.execute(sql).fetchall() if row[0] is not None]
+    club_years = {}
+    for club_key, club_year in conn.execute(CLUB_YEARS).fetchall():
+        club_years.setdefault(club_key, []).append(club_year)
+    return names, club_years, [tuple(row) for row in conn.execute(ARCHIVED).fetchall()]
+
+
+# The tables in memory. It is only used on the Tk thread, the reads are handed to it from the executor
+class ReferenceCache(object):
+    def __init__(self):
+        self.names = None  # kind -> Names, None until the tables are read
+        self.club_years = {}
+        self.archived = []
+        self.version = 0  # Changed by every invalidate, so a read started before a write is not kept
+        self.reading = False
+
+    @property
+    def loaded(self):
+        return self.names is not None
+
+    # Reads the tables on a reader thread of an executor.QueryExecutor, unless a read is already running
+    def refresh(self, executor):
+        if self.reading:
+            return
+        self.reading = True
+        version = self.version
+        executor.submit(read_tables, lambda tables: self.store(executor, version, tables), self.failed,
+                        name='read reference tables')
+
+    def store(self, executor, version, tables):
+        self.reading = False
+        if version != self.version:  # Written to while it was read
+            self.refresh(executor)
+            return
+        names, self.club_years, self.archived = tables
+        self.names = dict([(kind, Names(values)) for kind, values in names.items()])
+
+    def failed(self, error):
+        self.reading = False  # The checks pass everything until the next write reads the tables again
+
+    # Forgets the tables after a write. They are read again by the next refresh
+    def invalidate(self):
+        self.version += 1
+        self.names = None
+
+    # Returns the values of a kind starting with 'prefix', or [] if the tables are not read yet
+    def complete(self, kind, prefix, limit=COMPLETIONS):
+        if not self.loaded:
+            return []
+        return self.names[kind].complete(prefix, limit)
+
+    # True if 'value' is a value of the kind, and also when the tables are not read yet
+    def exists(self, kind, value):
+        return not self.loaded or value in self.names[kind].values
+
+    # The seasons a club played, newest first
+    def seasons(self, club_key):
+        return sorted(self.club_years.get(club_key, []), reverse=True)
+
+    # True if the season typed is in an archive
+    def is_archived(self, season_year):
+        try:
+            season_year = int(season_year)
+        except ValueError:
+            return False
+        return any([first_season <= season_year <= last_season for first_season, last_season in self.archived])
+
+    # The checks below return the reasons SQLite would refuse a write, as a list that is empty if it would not. They
+    # only know the reference tables: a game already played by the same clubs on the same day is left to SQLite
+
+    # A league or match name added, or renamed from 'old_name'
+    def name_problems(self, kind, name, old_name=None):
+        if self.loaded and name != old_name and name in self.names[kind].values:
+            return ['%s is already a %s' % (name, kind)]
+        return []
+
+    # A club added, or updated from 'old_key'
+    def club_problems(self, club_key, league_name, old_key=None):
+        problems = []
+        if self.loaded and club_key != old_key and club_key in self.names[CLUB].values:
+            problems.append('%s is already a club' % club_key)
+        if not self.exists(LEAGUE, league_name):
+            problems.append('%s is not a league' % league_name)
+        return problems
+
+    # A game added or updated. A game of an archived season would be left out of the database without an error
+    def game_problems(self, match_name, team_one, team_two, league_name, season_year=''):
+        problems = []
+        if self.is_archived(season_year):
+            problems.append('the season %s is archived' % season_year)
+        if not self.exists(MATCH, match_name):
+            problems.append('%s is not a match' % match_name)
+        for club_key in (team_one, team_two):
+            if not self.exists(CLUB, club_key):
+                problems.append('%s is not a club' % club_key)
+        if not self.exists(LEAGUE, league_name):
+            problems.append('%s is not a league' % league_name)
+        return problems
+
+
+# Makes a ttk.Combobox offer the values of 'kind' that start with what is typed in it, from the cache
+def complete_field(combobox, cache, kind):
+    def typed(event):
+        combobox['values'] = cache.complete(kind, combobox.get())
+    combobox.bind('<KeyRelease>', typed)
@@ -0,0 +1,156 @@
+"""
+This module is the table that shows the results of a search. The Treeview is made once and reused by every search,
+and it only ever holds a few pages of rows: the next page is read when the user scrolls near the bottom, and pages that
+are far out of view are dropped and read again if the user scrolls back. Showing a search of a million games costs
+the same as showing a search of ten. The pages are read by an executor.QueryExecutor, so the window keeps responding
+while a search runs, and a new search cancels the pages of the previous one that are still being read.
+"""
+try:  # Python 2
+    import Tkinter as tk
+    import tkMessageBox
+    import ttk
+except ImportError:  # Python 3
+    import tkinter as tk
+    from tkinter import messagebox as tkMessageBox
+    from tkinter import ttk
+
+from footballdb import paging
+
+MAX_ROWS = 3 * paging.PAGE_SIZE  # Rows kept in the table at once
+LOAD_MARGIN = 0.2  # Read another page when the view is this close to an end, as a fraction of the rows loaded
+
+
+# The name the pages of a search are timed under: the table of a paging.Search, or the kind of a lookup
+def search_name(search):
+    return getattr(search, 'table', type(search).__name__.lower())
+
+
+class ResultGrid(object):
+    # 'executor' is the executor.QueryExecutor the pages are read with, and 'on_double_click' is bound to a double
+    # click on a row. The table is placed in 'row' of the grid of 'master'
+    def __init__(self, master, executor, on_double_click, row=14, column_width=115):
+        self.executor = executor
+        self.column_width = column_width
+        self.tree = ttk.Treeview(master, show='headings', selectmode='extended')  # Shift and Control select many rows
+        self.tree.grid(row=row, column=0, columnspan=100, sticky=tk.W)
+        self.tree.bind('<Double-1>', on_double_click)
+        self.scrollbar = ttk.Scrollbar(master, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree['yscrollcommand'] = self.on_scroll
+
+        self.search = None  # The paging.Search shown
+        self.values = {}  # Item id -> the values of the row, as read from the database
+        self.more_before = False  # True if rows before the first row loaded were dropped
+        self.more_after = False  # True if the result may have rows after the last row loaded
+        self.loading = False  # True while a page is being read
+
+    # Runs job(conn) on a reader thread and passes what it returns to callback on the Tk thread. The table is the group
+    # of its jobs, so reading a page cancels the page that was read before it if it is not done yet. 'name' is what the
+    # job is timed under
+    def run(self, job, callback, name):
+        self.executor.submit(job, callback, self.failed, group=self, name=name)
+
+    def failed(self, error):
+        self.loading = False
+        tkMessageBox.showinfo('Search Failed', error)
+
+    # Empties the table and shows the first page of a paging.Search
+    def show(self, search):
+        self.search = search
+        self.loading = True
+        self.run(lambda conn: search.page(conn), lambda result: self.show_first_page(search, result),
+                 'search ' + search_name(search))
+
+    def show_first_page(self, search, result):
+        if search is not self.search:
+            return  # A newer search was started while this one was read
+        columns, rows = result
+        self.tree.delete(*self.tree.get_children())
+        self.values = {}
+        self.tree['columns'] = columns
+        for column in columns:  # Configure column headings
+            self.tree.heading(column, text=column.title())
+            self.tree.column(column, width=self.column_width, stretch=True)
+
+        self.insert(rows, 'end')
+        self.more_before = False
+        self.more_after = len(rows) == paging.PAGE_SIZE
+        self.loading = False
+
+    # Rows are stored with their key as the Treeview item id, and their values without it
+    def insert(self, rows, index):
+        for key, values in rows:
+            self.tree.insert('', index, iid=str(key), values=values)
+            self.values[str(key)] = values
+            if index != 'end':
+                index += 1
+
+    # Drops rows from the table
+    def drop(self, items):
+        self.tree.delete(*items)
+        for item in items:
+            del self.values[item]
+
+    # Returns the values of the rows selected, as read from the database rather than as Tk shows them, in the order
+    # they are shown. Only the rows loaded can be selected
+    def selected(self):
+        return [self.values[item] for item in self.tree.selection() if item in self.values]
+
+    # Called by the Treeview whenever its view moves. Asks for another page when the view gets close to an end
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self.loading or self.search is None:
+            return
+        if float(last) >= 1.0 - LOAD_MARGIN and self.more_after:
+            self.loading = True
+            self.tree.after_idle(self.load_after)
+        elif float(first) <= LOAD_MARGIN and self.more_before:
+            self.loading = True
+            self.tree.after_idle(self.load_before)
+
+    # Reads the page after the last row and drops rows from the top if there are too many
+    def load_after(self):
+        search = self.search
+        children = self.tree.get_children()
+        if len(children) == 0:
+            self.loading = False
+            return
+        last = children[-1]
+        self.run(lambda conn: search.page(conn, after=int(last)),
+                 lambda result: self.show_page_after(search, last, result[1]), 'page ' + search_name(search))
+
+    def show_page_after(self, search, last, rows):
+        if search is not self.search:
+            return
+        self.insert(rows, 'end')
+        self.more_after = len(rows) == paging.PAGE_SIZE
+
+        children = self.tree.get_children()
+        if len(children) > MAX_ROWS:
+            self.drop(children[0:len(children) - MAX_ROWS])
+            self.more_before = True
+            self.tree.see(last)  # Keep the row the user was looking at in view
+        self.loading = False
+
+    # Reads the page before the first row and drops rows from the bottom if there are too many
+    def load_before(self):
+        search = self.search
+        children = self.tree.get_children()
+        if len(children) == 0:
+            self.loading = False
+            return
+        first = children[0]
+        self.run(lambda conn: search.page(conn, before=int(first)),
+                 lambda result: self.show_page_before(search, first, result[1]), 'page ' + search_name(search))
+
+    def show_page_before(self, search, first, rows):
+        if search is not self.search:
+            return
+        self.insert(rows, 0)
+        self.more_before = len(rows) == paging.PAGE_SIZE
+
+        children = self.tree.get_children()
+        if len(children) > MAX_ROWS:
+            self.drop(children[MAX_ROWS:])
+            self.more_after = True
+        self.tree.see(first)
+        self.loading = False
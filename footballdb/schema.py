@@ -0,0 +1,801 @@
+"""
+This module creates and upgrades the database schema. Every entry in MIGRATIONS is a script, or a function taking the
+connection, that brings the database one version further. PRAGMA user_version records how many of them have been
+applied, so opening a database that is already up to date does not write anything.
+"""
+import sqlite3
+
+# Full-text index of the club and match names, kept up to date by triggers. The tables hold their own copy of the
+# names instead of pointing at the rowid of club and match, because those rowids can change on VACUUM.
+FULL_TEXT_SCRIPT = '''
+    CREATE VIRTUAL TABLE club_fts USING fts5(id, club_name, tokenize = '%(tokenize)s', prefix = '2 3');
+    CREATE VIRTUAL TABLE match_fts USING fts5(match_name, tokenize = '%(tokenize)s', prefix = '2 3');
+
+    INSERT INTO club_fts(id, club_name) SELECT id, club_name FROM club;
+    INSERT INTO match_fts(match_name) SELECT match_name FROM match;
+'''
+
+# The triggers of the full-text index, on the tables named 'club' and 'match'
+FULL_TEXT_TRIGGERS = '''
+    CREATE TRIGGER club_fts_insert AFTER INSERT ON %(club)s BEGIN
+        INSERT INTO club_fts(id, club_name) VALUES (new.id, new.club_name);
+    END;
+    CREATE TRIGGER club_fts_delete AFTER DELETE ON %(club)s BEGIN
+        DELETE FROM club_fts WHERE id = old.id;
+    END;
+    CREATE TRIGGER club_fts_update AFTER UPDATE OF id, club_name ON %(club)s BEGIN
+        UPDATE club_fts SET id = new.id, club_name = new.club_name WHERE id = old.id;
+    END;
+
+    CREATE TRIGGER match_fts_insert AFTER INSERT ON %(match)s BEGIN
+        INSERT INTO match_fts(match_name) VALUES (new.match_name);
+    END;
+    CREATE TRIGGER match_fts_delete AFTER DELETE ON %(match)s BEGIN
+        DELETE FROM match_fts WHERE match_name = old.match_name;
+    END;
+    CREATE TRIGGER match_fts_update AFTER UPDATE OF match_name ON %(match)s BEGIN
+        UPDATE match_fts SET match_name = new.match_name WHERE match_name = old.match_name;
+    END;
+'''
+
+
+# Returns the best tokenizer this SQLite can use for the full-text index, or None if it was built without FTS5.
+# remove_diacritics 2 (SQLite 3.27) also folds letters with more than one diacritic, which version 1 leaves alone
+def full_text_tokenizer(conn):
+    for tokenize in ('unicode61 remove_diacritics 2', 'unicode61 remove_diacritics 1'):
+        try:
+            conn.execute("CREATE VIRTUAL TABLE temp.fts_probe USING fts5(x, tokenize = '%s')" % tokenize)
+            conn.execute('DROP TABLE temp.fts_probe')
+            return tokenize
+        except sqlite3.OperationalError:
+            continue
+    return None
+
+
+# This migration creates the full-text index if FTS5 is available. Without it the searches keep using build_search
+def create_full_text_index(conn):
+    tokenize = full_text_tokenizer(conn)
+    if tokenize is None:
+        return ''
+    return FULL_TEXT_SCRIPT % {'tokenize': tokenize} + FULL_TEXT_TRIGGERS % {'club': 'club', 'match': 'match'}
+
+
+# Returns True if the database has the full-text index of club and match names
+def has_full_text(conn):
+    return conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'club_fts'").fetchone()[0] > 0
+
+
+# The columns the standings and the club records are kept from: those of the original game table, whose clubs and
+# league are their names, and those of the games table of migration 7, whose clubs and league are integer keys. 'club'
+# is the column of the standings that holds the club
+NAME_KEYS = {'game': 'game', 'team_one': 'team_one', 'team_two': 'team_two', 'league': 'league_name',
+             'club': 'club_key', 'type': 'TEXT'}
+ID_KEYS = {'game': 'games', 'team_one': 'team_one_id', 'team_two': 'team_two_id', 'league': 'league_id',
+           'club': 'club_id', 'type': 'INTEGER'}
+
+# League standings of every club, per league and season, kept up to date by triggers on game so reading a league table
+# does not have to add up all of its games. Only games with both scores count: fixtures not played yet have NULL scores.
+# The two indexes give the last games of a club in a season, in date order, for its form
+STANDINGS_TABLE = '''
+    CREATE TABLE standing (
+        %(league)s %(type)s NOT NULL,
+        season_year INTEGER NOT NULL,
+        %(club)s    %(type)s NOT NULL,
+        played  INTEGER NOT NULL DEFAULT 0,
+        won     INTEGER NOT NULL DEFAULT 0,
+        drawn   INTEGER NOT NULL DEFAULT 0,
+        lost    INTEGER NOT NULL DEFAULT 0,
+        goals_for   INTEGER NOT NULL DEFAULT 0,
+        goals_against   INTEGER NOT NULL DEFAULT 0,
+        points  INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY(%(league)s, season_year, %(club)s)
+    );
+
+    CREATE INDEX IF NOT EXISTS game_team_one_season ON %(game)s(%(team_one)s, season_year, %(league)s, game_date);
+    CREATE INDEX IF NOT EXISTS game_team_two_season ON %(game)s(%(team_two)s, season_year, %(league)s, game_date);
+'''
+
+# The condition for the game 'row' ('new' or 'old' in a trigger) to count in the standings
+STANDING_GAME = '''typeof(%(row)s.score_one) = 'integer' AND typeof(%(row)s.score_two) = 'integer'
+        AND %(row)s.%(team_one)s IS NOT NULL AND %(row)s.%(team_two)s IS NOT NULL
+        AND %(row)s.%(league)s IS NOT NULL AND %(row)s.season_year IS NOT NULL'''
+
+# Adds ('+') or takes away ('-') the result of the game 'row' for the club in column 'team', which scored 'goals'
+STANDING_CHANGE = '''
+        UPDATE standing SET played = played %(sign)s 1,
+            won = won %(sign)s (%(row)s.%(goals)s > %(row)s.%(against)s),
+            drawn = drawn %(sign)s (%(row)s.%(goals)s = %(row)s.%(against)s),
+            lost = lost %(sign)s (%(row)s.%(goals)s < %(row)s.%(against)s),
+            goals_for = goals_for %(sign)s %(row)s.%(goals)s,
+            goals_against = goals_against %(sign)s %(row)s.%(against)s,
+            points = points %(sign)s (CASE WHEN %(row)s.%(goals)s > %(row)s.%(against)s THEN 3
+                                           WHEN %(row)s.%(goals)s = %(row)s.%(against)s THEN 1 ELSE 0 END)
+        WHERE %(league)s = %(row)s.%(league)s AND season_year = %(row)s.season_year
+            AND %(club)s = %(row)s.%(team)s;'''
+
+
+# Returns the statements of a trigger that adds ('+') or takes away ('-') the game 'row' in the standings of both clubs.
+# A club gets its row on its first game, and loses it again when none of its games are left. 'keys' is NAME_KEYS or
+# ID_KEYS. The rows are added where missing rather than with INSERT OR IGNORE, because the conflict clause of the
+# statement firing the trigger replaces the one of its statements: an UPSERT updating a game made it fail
+def standing_statements(row, sign, keys):
+    names = dict(keys, row=row, sign=sign)
+    statements = []
+    if sign == '+':
+        statements.append('''
+        INSERT INTO standing(%(league)s, season_year, %(club)s)
+        SELECT %(row)s.%(league)s, %(row)s.season_year, team
+        FROM (SELECT %(row)s.%(team_one)s AS team UNION SELECT %(row)s.%(team_two)s) clubs_of_game
+        WHERE NOT EXISTS (SELECT 1 FROM standing WHERE %(league)s = %(row)s.%(league)s
+                          AND season_year = %(row)s.season_year AND %(club)s = clubs_of_game.team);''' % names)
+    for team, goals, against in ((keys['team_one'], 'score_one', 'score_two'),
+                                 (keys['team_two'], 'score_two', 'score_one')):
+        statements.append(STANDING_CHANGE % dict(names, team=team, goals=goals, against=against))
+    if sign == '-':
+        statements.append('''
+        DELETE FROM standing WHERE %(league)s = %(row)s.%(league)s AND season_year = %(row)s.season_year
+            AND %(club)s IN (%(row)s.%(team_one)s, %(row)s.%(team_two)s) AND played = 0;''' % names)
+    return ''.join(statements)
+
+
+STANDINGS_TRIGGERS = '''
+    CREATE TRIGGER game_standing_insert AFTER INSERT ON %(game)s WHEN %(new)s BEGIN%(add_new)s
+    END;
+    CREATE TRIGGER game_standing_delete AFTER DELETE ON %(game)s WHEN %(old)s BEGIN%(remove_old)s
+    END;
+    CREATE TRIGGER game_standing_update_old AFTER UPDATE OF %(team_one)s, %(team_two)s, score_one, score_two,
+        season_year, %(league)s ON %(game)s WHEN %(old)s BEGIN%(remove_old)s
+    END;
+    CREATE TRIGGER game_standing_update_new AFTER UPDATE OF %(team_one)s, %(team_two)s, score_one, score_two,
+        season_year, %(league)s ON %(game)s WHEN %(new)s BEGIN%(add_new)s
+    END;
+'''
+
+# Fills the standings from the games already in the database
+STANDINGS_BACKFILL = '''
+    INSERT INTO standing(%(league)s, season_year, %(club)s, played, won, drawn, lost, goals_for, goals_against, points)
+    SELECT %(league)s, season_year, %(club)s, COUNT(*), SUM(goals_for > goals_against),
+        SUM(goals_for = goals_against), SUM(goals_for < goals_against), SUM(goals_for), SUM(goals_against),
+        SUM(CASE WHEN goals_for > goals_against THEN 3 WHEN goals_for = goals_against THEN 1 ELSE 0 END)
+    FROM (SELECT %(league)s, season_year, %(team_one)s AS %(club)s, score_one AS goals_for, score_two AS goals_against
+          FROM %(game)s WHERE %(condition)s
+          UNION ALL
+          SELECT %(league)s, season_year, %(team_two)s, score_two, score_one FROM %(game)s WHERE %(condition)s)
+    GROUP BY %(league)s, season_year, %(club)s;
+'''
+
+
+# The names filled in the statements of the standings of the games described by 'keys'
+def standings_names(keys):
+    return dict(keys, new=STANDING_GAME % dict(keys, row='new'), old=STANDING_GAME % dict(keys, row='old'),
+                condition=STANDING_GAME % dict(keys, row=keys['game']),
+                add_new=standing_statements('new', '+', keys), remove_old=standing_statements('old', '-', keys))
+
+
+# Returns the script that creates the standings of the games described by 'keys', NAME_KEYS or ID_KEYS: the table, its
+# triggers and its first rows
+def standings_script(keys):
+    return (STANDINGS_TABLE + STANDINGS_TRIGGERS + STANDINGS_BACKFILL) % standings_names(keys)
+
+
+# The record of every club in every season, at home and away, kept up to date by triggers on game like the standings.
+# A club has a 'home' row for its games as team_one and an 'away' row for its games as team_two, over every league and
+# cup it played in that season. The index gives the last games of a club as team_one in date order; game_team_two
+# already does for team_two, and game_fixture gives the games between two clubs
+CLUB_SEASON_TABLE = '''
+    CREATE TABLE club_season (
+        %(club)s    %(type)s NOT NULL,
+        season_year INTEGER NOT NULL,
+        venue   TEXT NOT NULL,
+        played  INTEGER NOT NULL DEFAULT 0,
+        won     INTEGER NOT NULL DEFAULT 0,
+        drawn   INTEGER NOT NULL DEFAULT 0,
+        lost    INTEGER NOT NULL DEFAULT 0,
+        goals_for   INTEGER NOT NULL DEFAULT 0,
+        goals_against   INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY(%(club)s, season_year, venue)
+    );
+
+    CREATE INDEX IF NOT EXISTS game_team_one_date ON %(game)s(%(team_one)s, game_date);
+'''
+
+# The condition for the game 'row' to count in the records of its clubs. Unlike the standings it needs no league
+CLUB_SEASON_GAME = '''typeof(%(row)s.score_one) = 'integer' AND typeof(%(row)s.score_two) = 'integer'
+        AND %(row)s.%(team_one)s IS NOT NULL AND %(row)s.%(team_two)s IS NOT NULL AND %(row)s.season_year IS NOT NULL'''
+
+# Adds ('+') or takes away ('-') the result of the game 'row' in the 'venue' record of the club in column 'team'
+CLUB_SEASON_CHANGE = '''
+        UPDATE club_season SET played = played %(sign)s 1,
+            won = won %(sign)s (%(row)s.%(goals)s > %(row)s.%(against)s),
+            drawn = drawn %(sign)s (%(row)s.%(goals)s = %(row)s.%(against)s),
+            lost = lost %(sign)s (%(row)s.%(goals)s < %(row)s.%(against)s),
+            goals_for = goals_for %(sign)s %(row)s.%(goals)s,
+            goals_against = goals_against %(sign)s %(row)s.%(against)s
+        WHERE %(club)s = %(row)s.%(team)s AND season_year = %(row)s.season_year AND venue = '%(venue)s';'''
+
+
+# Returns the statements of a trigger that adds ('+') or takes away ('-') the game 'row' in the records of both clubs,
+# the home record of team_one and the away record of team_two. The rows are added where missing, as in
+# standing_statements
+def club_season_statements(row, sign, keys):
+    names = dict(keys, row=row, sign=sign)
+    statements = []
+    if sign == '+':
+        statements.append('''
+        INSERT INTO club_season(%(club)s, season_year, venue)
+        SELECT team, %(row)s.season_year, venue
+        FROM (SELECT %(row)s.%(team_one)s AS team, 'home' AS venue UNION ALL SELECT %(row)s.%(team_two)s, 'away') sides
+        WHERE NOT EXISTS (SELECT 1 FROM club_season WHERE %(club)s = sides.team AND season_year = %(row)s.season_year
+                          AND venue = sides.venue);''' % names)
+    for team, venue, goals, against in ((keys['team_one'], 'home', 'score_one', 'score_two'),
+                                        (keys['team_two'], 'away', 'score_two', 'score_one')):
+        statements.append(CLUB_SEASON_CHANGE % dict(names, team=team, venue=venue, goals=goals, against=against))
+    if sign == '-':
+        statements.append('''
+        DELETE FROM club_season WHERE %(club)s = %(row)s.%(team_one)s AND season_year = %(row)s.season_year
+            AND venue = 'home' AND played = 0;
+        DELETE FROM club_season WHERE %(club)s = %(row)s.%(team_two)s AND season_year = %(row)s.season_year
+            AND venue = 'away' AND played = 0;''' % names)
+    return ''.join(statements)
+
+
+CLUB_SEASON_TRIGGERS = '''
+    CREATE TRIGGER game_club_season_insert AFTER INSERT ON %(game)s WHEN %(new)s BEGIN%(add_new)s
+    END;
+    CREATE TRIGGER game_club_season_delete AFTER DELETE ON %(game)s WHEN %(old)s BEGIN%(remove_old)s
+    END;
+    CREATE TRIGGER game_club_season_update_old AFTER UPDATE OF %(team_one)s, %(team_two)s, score_one, score_two,
+        season_year ON %(game)s WHEN %(old)s BEGIN%(remove_old)s
+    END;
+    CREATE TRIGGER game_club_season_update_new AFTER UPDATE OF %(team_one)s, %(team_two)s, score_one, score_two,
+        season_year ON %(game)s WHEN %(new)s BEGIN%(add_new)s
+    END;
+'''
+
+# Fills the records from the games already in the database
+CLUB_SEASON_BACKFILL = '''
+    INSERT INTO club_season(%(club)s, season_year, venue, played, won, drawn, lost, goals_for, goals_against)
+    SELECT %(club)s, season_year, venue, COUNT(*), SUM(goals_for > goals_against), SUM(goals_for = goals_against),
+        SUM(goals_for < goals_against), SUM(goals_for), SUM(goals_against)
+    FROM (SELECT %(team_one)s AS %(club)s, season_year, 'home' AS venue, score_one AS goals_for,
+              score_two AS goals_against
+          FROM %(game)s WHERE %(condition)s
+          UNION ALL
+          SELECT %(team_two)s, season_year, 'away', score_two, score_one FROM %(game)s WHERE %(condition)s)
+    GROUP BY %(club)s, season_year, venue;
+'''
+
+
+# The names filled in the statements of the club records of the games described by 'keys'
+def club_season_names(keys):
+    return dict(keys, new=CLUB_SEASON_GAME % dict(keys, row='new'), old=CLUB_SEASON_GAME % dict(keys, row='old'),
+                condition=CLUB_SEASON_GAME % dict(keys, row=keys['game']),
+                add_new=club_season_statements('new', '+', keys),
+                remove_old=club_season_statements('old', '-', keys))
+
+
+# Returns the script that creates the club records of the games described by 'keys', like standings_script
+def club_season_script(keys):
+    return (CLUB_SEASON_TABLE + CLUB_SEASON_TRIGGERS + CLUB_SEASON_BACKFILL) % club_season_names(keys)
+
+
+# The triggers on games that keep the standings and the club records, dropped so they can be created again
+GAME_TRIGGERS = ['game_standing_insert', 'game_standing_delete', 'game_standing_update_old', 'game_standing_update_new',
+                 'game_club_season_insert', 'game_club_season_delete', 'game_club_season_update_old',
+                 'game_club_season_update_new']
+
+
+# Returns the script that creates the triggers of the standings and club records of the games described by 'keys'
+# again, for a database whose triggers were made by an older version
+def game_triggers_script(keys):
+    return (''.join(['DROP TRIGGER IF EXISTS %s;\n' % name for name in GAME_TRIGGERS]) +
+            STANDINGS_TRIGGERS % standings_names(keys) + CLUB_SEASON_TRIGGERS % club_season_names(keys))
+
+
+# The integer keys of migration 7. League, match and club names used to be the primary keys, copied as text into every
+# row referring to them, so renaming one had to rewrite all of those rows. Now every row has an integer key, its name
+# is a unique column, and the rows referring to it hold the key: a rename changes one row, and the joins and indexes
+# compare integers. The keys of the rows copied are their old rowids, and a name a row referred to that was missing
+# from its table is added to it, so no reference is lost
+SURROGATE_KEY_TABLES = '''
+    CREATE TABLE leagues (
+        league_id   INTEGER NOT NULL PRIMARY KEY,
+        league_name TEXT NOT NULL UNIQUE
+    );
+
+    CREATE TABLE matches (
+        match_id    INTEGER NOT NULL PRIMARY KEY,
+        match_name  TEXT NOT NULL UNIQUE
+    );
+
+    CREATE TABLE clubs (
+        club_id INTEGER NOT NULL PRIMARY KEY,
+        id     TEXT NOT NULL UNIQUE,
+        club_name   TEXT,
+        abbr    CHAR(3),
+        league_id   INTEGER,
+        FOREIGN KEY(league_id) REFERENCES leagues(league_id)
+    );
+
+    CREATE TABLE club_years (
+        club_id INTEGER NOT NULL,
+        club_year   INTEGER(4) NOT NULL,
+        PRIMARY KEY(club_id, club_year),
+        FOREIGN KEY(club_id) REFERENCES clubs(club_id)
+    );
+
+    CREATE TABLE games (
+        id  INTEGER NOT NULL PRIMARY KEY,
+        match_id    INTEGER,
+        team_one_id INTEGER,
+        team_two_id INTEGER,
+        score_one INTEGER(3),
+        score_two INTEGER(3),
+        game_date   DATE,
+        season_year INT(4),
+        league_id   INTEGER,
+        FOREIGN KEY(team_one_id) REFERENCES clubs(club_id),
+        FOREIGN KEY(team_two_id) REFERENCES clubs(club_id),
+        FOREIGN KEY(league_id) REFERENCES leagues(league_id),
+        FOREIGN KEY(match_id) REFERENCES matches(match_id)
+    );
+
+    INSERT INTO leagues(league_id, league_name) SELECT rowid, league_name FROM league;
+    INSERT OR IGNORE INTO leagues(league_name)
+        SELECT league_name FROM club WHERE league_name IS NOT NULL
+        UNION SELECT league_name FROM game WHERE league_name IS NOT NULL;
+
+    INSERT INTO matches(match_id, match_name) SELECT rowid, match_name FROM match;
+    INSERT OR IGNORE INTO matches(match_name) SELECT match_name FROM game WHERE match_name IS NOT NULL;
+
+    INSERT INTO clubs(club_id, id, club_name, abbr, league_id)
+        SELECT club.rowid, club.id, club.club_name, club.abbr, leagues.league_id
+        FROM club LEFT JOIN leagues ON leagues.league_name = club.league_name;
+    INSERT OR IGNORE INTO clubs(id)
+        SELECT club_key FROM club_year
+        UNION SELECT team_one FROM game WHERE team_one IS NOT NULL
+        UNION SELECT team_two FROM game WHERE team_two IS NOT NULL;
+
+    INSERT INTO club_years(club_id, club_year)
+        SELECT clubs.club_id, club_year.club_year FROM club_year JOIN clubs ON clubs.id = club_year.club_key;
+
+    INSERT INTO games(id, match_id, team_one_id, team_two_id, score_one, score_two, game_date, season_year, league_id)
+        SELECT game.id, matches.match_id, club_one.club_id, club_two.club_id, game.score_one, game.score_two,
+            game.game_date, game.season_year, leagues.league_id
+        FROM game LEFT JOIN matches ON matches.match_name = game.match_name
+        LEFT JOIN clubs club_one ON club_one.id = game.team_one
+        LEFT JOIN clubs club_two ON club_two.id = game.team_two
+        LEFT JOIN leagues ON leagues.league_name = game.league_name;
+
+    DROP TABLE standing;
+    DROP TABLE club_season;
+    DROP TABLE game;
+    DROP TABLE club_year;
+    DROP TABLE club;
+    DROP TABLE match;
+    DROP TABLE league;
+
+    CREATE UNIQUE INDEX game_fixture ON games(team_one_id, team_two_id, game_date);
+    CREATE INDEX game_team_two ON games(team_two_id, game_date);
+    CREATE INDEX game_season_league ON games(season_year, league_id);
+    CREATE INDEX game_league ON games(league_id);
+    CREATE INDEX game_date ON games(game_date);
+    CREATE INDEX game_match ON games(match_id);
+    CREATE INDEX game_score ON games(score_one, score_two);
+    CREATE INDEX game_score_two ON games(score_two);
+    CREATE INDEX club_league ON clubs(league_id);
+    CREATE INDEX club_name ON clubs(club_name);
+    CREATE INDEX club_abbr ON clubs(abbr);
+'''
+
+# The integer key of the row named by 'value', such as '?' or 'new.team_one', for statements given names
+LEAGUE_ID = '(SELECT league_id FROM leagues WHERE league_name = %s)'
+MATCH_ID = '(SELECT match_id FROM matches WHERE match_name = %s)'
+CLUB_ID = '(SELECT club_id FROM clubs WHERE id = %s)'
+
+
+# A statement of a trigger that fails like a foreign key when 'value' is not NULL and names no row of 'lookup', one of
+# LEAGUE_ID, MATCH_ID and CLUB_ID. The views check the names they are given, as their key is only looked up
+def reference_check(value, lookup, what):
+    return '''
+        SELECT RAISE(ABORT, 'FOREIGN KEY constraint failed: %s is not %s') WHERE %s IS NOT NULL AND %s IS NULL;''' % (
+        value.split('.')[-1], what, value, lookup % value)
+
+
+# The compatibility layer: a view with the name and the columns of every table the surrogate keys replaced, showing
+# names instead of keys, so the statements of the GUI, the searches and the exports run unchanged. Every view ends with
+# the integer key of its rows, which the searches are paged by (see queries.ROW_KEYS). Writing to a view writes the
+# table below it through the INSTEAD OF triggers of VIEW_TRIGGERS
+COMPATIBILITY_VIEWS = '''
+    CREATE VIEW league AS SELECT league_name, league_id FROM leagues;
+
+    CREATE VIEW match AS SELECT match_name, match_id FROM matches;
+
+    CREATE VIEW club AS SELECT clubs.id, clubs.club_name, clubs.abbr, leagues.league_name, clubs.club_id
+        FROM clubs LEFT JOIN leagues ON leagues.league_id = clubs.league_id;
+
+    CREATE VIEW club_year AS SELECT clubs.id AS club_key, club_years.club_year
+        FROM club_years JOIN clubs ON clubs.club_id = club_years.club_id;
+
+    CREATE VIEW game AS SELECT games.id, matches.match_name, club_one.id AS team_one, club_two.id AS team_two,
+        games.score_one, games.score_two, games.game_date, games.season_year, leagues.league_name
+        FROM games LEFT JOIN matches ON matches.match_id = games.match_id
+        LEFT JOIN clubs club_one ON club_one.club_id = games.team_one_id
+        LEFT JOIN clubs club_two ON club_two.club_id = games.team_two_id
+        LEFT JOIN leagues ON leagues.league_id = games.league_id;
+'''
+
+# The SQL the INSTEAD OF triggers of the views below look up keys and check names with
+VIEW_SQL = {'check_league': reference_check('new.league_name', LEAGUE_ID, 'a league'),
+            'league': LEAGUE_ID % 'new.league_name',
+            'check_club': reference_check('new.club_key', CLUB_ID, 'a club'),
+            'club': CLUB_ID % 'new.club_key', 'old_club': CLUB_ID % 'old.club_key',
+            'check_game': ''.join([reference_check('new.match_name', MATCH_ID, 'a match'),
+                                   reference_check('new.team_one', CLUB_ID, 'a club'),
+                                   reference_check('new.team_two', CLUB_ID, 'a club'),
+                                   reference_check('new.league_name', LEAGUE_ID, 'a league')]),
+            'match': MATCH_ID % 'new.match_name', 'team_one': CLUB_ID % 'new.team_one',
+            'team_two': CLUB_ID % 'new.team_two', 'game_league': LEAGUE_ID % 'new.league_name'}
+
+# A game added through the view is inserted with the id it was given, see GAME_ID_SCRIPT for the one migration 11
+# gives it when it has none
+GAME_INSERT = '''
+    CREATE TRIGGER game_insert INSTEAD OF INSERT ON game BEGIN%(check_game)s
+        INSERT INTO games(id, match_id, team_one_id, team_two_id, score_one, score_two, game_date, season_year,
+            league_id)
+        VALUES (%(game_id)s, %(match)s, %(team_one)s, %(team_two)s, new.score_one, new.score_two, new.game_date,
+            new.season_year, %(game_league)s);
+    END;
+'''
+
+# Renaming through a view updates the one row of the name: UPDATE league SET league_name = ... changes leagues only
+VIEW_TRIGGERS = '''
+    CREATE TRIGGER league_insert INSTEAD OF INSERT ON league BEGIN
+        INSERT INTO leagues(league_id, league_name) VALUES (new.league_id, new.league_name);
+    END;
+    CREATE TRIGGER league_update INSTEAD OF UPDATE ON league BEGIN
+        UPDATE leagues SET league_name = new.league_name WHERE league_id = old.league_id;
+    END;
+    CREATE TRIGGER league_delete INSTEAD OF DELETE ON league BEGIN
+        DELETE FROM leagues WHERE league_id = old.league_id;
+    END;
+
+    CREATE TRIGGER match_insert INSTEAD OF INSERT ON match BEGIN
+        INSERT INTO matches(match_id, match_name) VALUES (new.match_id, new.match_name);
+    END;
+    CREATE TRIGGER match_update INSTEAD OF UPDATE ON match BEGIN
+        UPDATE matches SET match_name = new.match_name WHERE match_id = old.match_id;
+    END;
+    CREATE TRIGGER match_delete INSTEAD OF DELETE ON match BEGIN
+        DELETE FROM matches WHERE match_id = old.match_id;
+    END;
+
+    CREATE TRIGGER club_insert INSTEAD OF INSERT ON club BEGIN%(check_league)s
+        INSERT INTO clubs(club_id, id, club_name, abbr, league_id)
+        VALUES (new.club_id, new.id, new.club_name, new.abbr, %(league)s);
+    END;
+    CREATE TRIGGER club_update INSTEAD OF UPDATE ON club BEGIN%(check_league)s
+        UPDATE clubs SET id = new.id, club_name = new.club_name, abbr = new.abbr, league_id = %(league)s
+        WHERE club_id = old.club_id;
+    END;
+    CREATE TRIGGER club_delete INSTEAD OF DELETE ON club BEGIN
+        DELETE FROM clubs WHERE club_id = old.club_id;
+    END;
+
+    CREATE TRIGGER club_year_insert INSTEAD OF INSERT ON club_year BEGIN%(check_club)s
+        INSERT INTO club_years(club_id, club_year) VALUES (%(club)s, new.club_year);
+    END;
+    CREATE TRIGGER club_year_update INSTEAD OF UPDATE ON club_year BEGIN%(check_club)s
+        UPDATE club_years SET club_id = %(club)s, club_year = new.club_year
+        WHERE club_id = %(old_club)s AND club_year = old.club_year;
+    END;
+    CREATE TRIGGER club_year_delete INSTEAD OF DELETE ON club_year BEGIN
+        DELETE FROM club_years WHERE club_id = %(old_club)s AND club_year = old.club_year;
+    END;
+%(game_insert)s
+    CREATE TRIGGER game_update INSTEAD OF UPDATE ON game BEGIN%(check_game)s
+        UPDATE games SET match_id = %(match)s, team_one_id = %(team_one)s, team_two_id = %(team_two)s,
+            score_one = new.score_one, score_two = new.score_two, game_date = new.game_date,
+            season_year = new.season_year, league_id = %(game_league)s
+        WHERE id = old.id;
+    END;
+    CREATE TRIGGER game_delete INSTEAD OF DELETE ON game BEGIN
+        DELETE FROM games WHERE id = old.id;
+    END;
+''' % dict(VIEW_SQL, game_insert=GAME_INSERT % dict(VIEW_SQL, game_id='new.id'))
+
+
+# This migration moves the tables to integer keys, see SURROGATE_KEY_TABLES. The tables are rebuilt, which SQLite only
+# allows with the foreign keys off, as migrate runs every migration
+def use_surrogate_keys(conn):
+    script = (SURROGATE_KEY_TABLES + standings_script(ID_KEYS) + club_season_script(ID_KEYS) + COMPATIBILITY_VIEWS +
+              VIEW_TRIGGERS)
+    if has_full_text(conn):
+        script += FULL_TEXT_TRIGGERS % {'club': 'clubs', 'match': 'matches'}
+    return script
+
+
+# True when the season given is in an archive. The feeds and the imports leave out and report its games, see
+# ingest.write_game_rows and fixtures.RULES
+ARCHIVED = 'EXISTS (SELECT 1 FROM archive WHERE %s BETWEEN first_season AND last_season)'
+
+# The spans of closed seasons moved out to read-only files by archive.py, one row per file. The triggers keep those
+# seasons closed in the database: a game of one is left out when a feed or a file adds it again, a game cannot be moved
+# into one, and a game added is given an id above those of the archived games, which the readers show next to it.
+# The statements of the package that add games choose that id themselves, see NEXT_GAME_ID. game_archived_id is left
+# for the others: it renumbers the game after it was inserted, so cursor.lastrowid is the id the game had before and
+# not the one it keeps
+ARCHIVE_SCRIPT = '''
+    CREATE TABLE archive (
+        archive_name    TEXT NOT NULL PRIMARY KEY,
+        path    TEXT NOT NULL,
+        first_season    INTEGER NOT NULL,
+        last_season INTEGER NOT NULL,
+        games   INTEGER NOT NULL,
+        last_id INTEGER NOT NULL
+    );
+
+    CREATE TRIGGER game_archived_insert BEFORE INSERT ON games WHEN %(archived)s BEGIN
+        SELECT RAISE(IGNORE);
+    END;
+    CREATE TRIGGER game_archived_update BEFORE UPDATE OF season_year ON games WHEN %(archived)s BEGIN
+        SELECT RAISE(ABORT, 'the season of the game is archived');
+    END;
+    CREATE TRIGGER game_archived_id AFTER INSERT ON games WHEN new.id <= (SELECT MAX(last_id) FROM archive) BEGIN
+        UPDATE games SET id = MAX((SELECT MAX(last_id) FROM archive), (SELECT MAX(id) FROM games)) + 1
+        WHERE id = new.id;
+    END;
+''' % {'archived': ARCHIVED % 'new.season_year'}
+
+# The id of a game added: above every game of the database and of its archives. The statements that add games insert
+# it rather than leave the id to SQLite, so no trigger changes it afterwards and cursor.lastrowid is the id of the game
+NEXT_GAME_ID = '''(MAX(IFNULL((SELECT MAX(id) FROM games), 0), IFNULL((SELECT MAX(last_id) FROM archive), 0)) + 1)'''
+
+# A game added through the game view without an id is given NEXT_GAME_ID
+GAME_ID_SCRIPT = '''
+    DROP TRIGGER game_insert;
+''' + GAME_INSERT % dict(VIEW_SQL, game_id='IFNULL(new.id, %s)' % NEXT_GAME_ID)
+
+# The names searched by the TEXT fields of queries.py are compared without case, with an index of their own. The club
+# name and abbreviation indexes only served those searches, so they are made NOCASE in place
+NOCASE_SCRIPT = '''
+    CREATE INDEX league_name_nocase ON leagues(league_name COLLATE NOCASE);
+    CREATE INDEX match_name_nocase ON matches(match_name COLLATE NOCASE);
+    CREATE INDEX club_id_nocase ON clubs(id COLLATE NOCASE);
+    DROP INDEX club_name;
+    CREATE INDEX club_name ON clubs(club_name COLLATE NOCASE);
+    DROP INDEX club_abbr;
+    CREATE INDEX club_abbr ON clubs(abbr COLLATE NOCASE);
+'''
+
+# The clubs, matches and leagues the games of the archives use. The archives only hold the keys of the names, which
+# stay in the database, and SQLite checks no foreign key across files, so these triggers refuse to delete a name an
+# archive uses, or to change its key, as the foreign keys do for the games of the database. archive.py writes the keys
+# of every archive it makes
+ARCHIVE_KEY_SCRIPT = '''
+    CREATE TABLE archive_key (
+        key_table   TEXT NOT NULL,
+        key_id  INTEGER NOT NULL,
+        PRIMARY KEY(key_table, key_id)
+    );
+''' + ''.join(['''
+    CREATE TRIGGER %(table)s_archived_delete BEFORE DELETE ON %(table)s WHEN %(used)s BEGIN
+        SELECT RAISE(ABORT, 'FOREIGN KEY constraint failed: %(what)s is used by an archived season');
+    END;
+    CREATE TRIGGER %(table)s_archived_key BEFORE UPDATE OF %(key)s ON %(table)s
+    WHEN new.%(key)s IS NOT old.%(key)s AND %(used)s BEGIN
+        SELECT RAISE(ABORT, 'FOREIGN KEY constraint failed: %(what)s is used by an archived season');
+    END;
+''' % {'table': table, 'key': key, 'what': what,
+       'used': "EXISTS (SELECT 1 FROM archive_key WHERE key_table = '%s' AND key_id = old.%s)" % (table, key)}
+    for table, key, what in (('clubs', 'club_id', 'the club'), ('matches', 'match_id', 'the match'),
+                             ('leagues', 'league_id', 'the league'))])
+
+
+# This migration creates archive_key with the keys of the archives made before it. They are whole numbers read from
+# the archives, written into the script as they are
+def use_archive_keys(conn):
+    from footballdb import archive  # Only this migration reads the archives
+    return ARCHIVE_KEY_SCRIPT + ''.join(["INSERT OR IGNORE INTO archive_key(key_table, key_id) VALUES ('%s', %d);\n" % (
+        key_table, key_id) for key_table, key_id in archive.used_keys(conn)])
+
+
+# The Elo ratings of the clubs (see ratings.py): the rating of every club after each date it played, with the change
+# of that date and the games it was made of. They are computed in Python, one game after the other, so the triggers
+# only write down the earliest date a game changed at, and ratings.update_ratings computes the ratings again from
+# there. An update that leaves the clubs, scores, date and season of a game as they were, as a feed applied again
+# does, changes nothing. A game deleted because its season was archived keeps its ratings
+RATING_SCRIPT = '''
+    CREATE TABLE rating (
+        club_id INTEGER NOT NULL,
+        game_date   TEXT NOT NULL,
+        season_year INTEGER,
+        rating  REAL NOT NULL,
+        change  REAL NOT NULL,
+        games   INTEGER NOT NULL,
+        PRIMARY KEY(club_id, game_date)
+    );
+
+    CREATE INDEX rating_date ON rating(game_date);
+    CREATE INDEX rating_season ON rating(season_year, club_id, game_date);
+
+    CREATE TABLE rating_stale (
+        from_date   TEXT NOT NULL
+    );
+
+    CREATE TRIGGER game_rating_insert AFTER INSERT ON games WHEN %(new)s BEGIN%(stale_new)s
+    END;
+    CREATE TRIGGER game_rating_delete AFTER DELETE ON games WHEN %(old)s
+        AND NOT EXISTS (SELECT 1 FROM archive WHERE old.season_year BETWEEN first_season AND last_season)
+        BEGIN%(stale_old)s
+    END;
+    CREATE TRIGGER game_rating_update_old AFTER UPDATE OF team_one_id, team_two_id, score_one, score_two, game_date,
+        season_year ON games WHEN %(old)s AND %(changed)s BEGIN%(stale_old)s
+    END;
+    CREATE TRIGGER game_rating_update_new AFTER UPDATE OF team_one_id, team_two_id, score_one, score_two, game_date,
+        season_year ON games WHEN %(new)s AND %(changed)s BEGIN%(stale_new)s
+    END;
+
+    INSERT INTO rating_stale(from_date) VALUES ('');
+'''
+
+# The condition for the game 'row' to be rated: it has a result, both clubs and a date to be put in order by
+RATING_GAME = '''typeof(%(row)s.score_one) = 'integer' AND typeof(%(row)s.score_two) = 'integer'
+        AND %(row)s.team_one_id IS NOT NULL AND %(row)s.team_two_id IS NOT NULL AND %(row)s.game_date IS NOT NULL'''
+
+# Writes down that the ratings from the date of the game 'row' are out of date, unless an earlier date already is
+RATING_STALE = '''
+        INSERT INTO rating_stale(from_date) SELECT %(row)s.game_date
+        WHERE NOT EXISTS (SELECT 1 FROM rating_stale WHERE from_date <= %(row)s.game_date);'''
+
+RATING_CHANGED = '''(old.team_one_id IS NOT new.team_one_id OR old.team_two_id IS NOT new.team_two_id
+        OR old.score_one IS NOT new.score_one OR old.score_two IS NOT new.score_two
+        OR old.game_date IS NOT new.game_date OR old.season_year IS NOT new.season_year)'''
+
+
+# Returns the script that creates the ratings tables and their triggers. The empty date it writes down comes before
+# every other, so the first ratings.update_ratings computes the ratings from every game
+def rating_script():
+    return RATING_SCRIPT % {'new': RATING_GAME % {'row': 'new'}, 'old': RATING_GAME % {'row': 'old'},
+                            'stale_new': RATING_STALE % {'row': 'new'}, 'stale_old': RATING_STALE % {'row': 'old'},
+                            'changed': RATING_CHANGED}
+
+
+MIGRATIONS = [
+    # 1: The original tables, plus the feed metadata used by the incremental sync. A game is identified by its teams
+    # and date, so a feed that is downloaded again updates its games instead of inserting them a second time.
+    '''
+    CREATE TABLE IF NOT EXISTS club (
+        id     TEXT NOT NULL PRIMARY KEY,
+        club_name   TEXT,
+        abbr    CHAR(3),
+        league_name TEXT,
+        FOREIGN KEY(league_name) REFERENCES league(league_name)
+    );
+
+    CREATE TABLE IF NOT EXISTS club_year (
+        club_key     TEXT NOT NULL,
+        club_year   INTEGER(4) NOT NULL,
+        PRIMARY KEY(club_key, club_year),
+        FOREIGN KEY(club_key) REFERENCES club(id)
+    );
+
+    CREATE TABLE IF NOT EXISTS league (
+        league_name TEXT NOT NULL PRIMARY KEY
+    );
+
+    CREATE TABLE IF NOT EXISTS match  (
+        match_name NOT NULL PRIMARY KEY
+    );
+
+    CREATE TABLE IF NOT EXISTS game (
+        id  INTEGER NOT NULL PRIMARY KEY,
+        match_name  TEXT,
+        team_one  TEXT,
+        team_two  TEXT,
+        score_one INTEGER(3),
+        score_two INTEGER(3),
+        game_date   DATE,
+        season_year INT(4),
+        league_name TEXT,
+        FOREIGN KEY(team_one) REFERENCES club(id),
+        FOREIGN KEY(team_two) REFERENCES club(id),
+        FOREIGN KEY(league_name) REFERENCES league(league_name)
+        FOREIGN KEY(match_name) REFERENCES match(match_name)
+    );
+
+    CREATE UNIQUE INDEX IF NOT EXISTS game_fixture ON game(team_one, team_two, game_date);
+
+    CREATE TABLE IF NOT EXISTS feed (
+        url     TEXT NOT NULL PRIMARY KEY,
+        etag    TEXT,
+        last_modified   TEXT,
+        content_hash    TEXT,
+        checked_at  REAL
+    );
+    ''',
+
+    # 2: Indexes for the searches of the GUI. The team_one searches use game_fixture, whose first column is team_one.
+    # The match and league indexes also serve the foreign key checks when a match or a league is deleted or renamed.
+    '''
+    CREATE INDEX IF NOT EXISTS game_team_two ON game(team_two, game_date);
+    CREATE INDEX IF NOT EXISTS game_season_league ON game(season_year, league_name);
+    CREATE INDEX IF NOT EXISTS game_league ON game(league_name);
+    CREATE INDEX IF NOT EXISTS game_date ON game(game_date);
+    CREATE INDEX IF NOT EXISTS game_match ON game(match_name);
+    CREATE INDEX IF NOT EXISTS club_league ON club(league_name);
+    ''',
+
+    # 3: The searches compare every field with = or a range, so the remaining search fields get an index too
+    '''
+    CREATE INDEX IF NOT EXISTS game_score ON game(score_one, score_two);
+    CREATE INDEX IF NOT EXISTS game_score_two ON game(score_two);
+    CREATE INDEX IF NOT EXISTS club_name ON club(club_name);
+    CREATE INDEX IF NOT EXISTS club_abbr ON club(abbr);
+    ''',
+
+    # 4: Full-text search of club and match names
+    create_full_text_index,
+
+    # 5: League standings
+    standings_script(NAME_KEYS),
+
+    # 6: Home and away records of every club and season, for the head-to-head, form and split lookups of records.py
+    club_season_script(NAME_KEYS),
+
+    # 7: Integer keys, with views under the names of the tables they replace
+    use_surrogate_keys,
+
+    # 8: Seasons archived to read-only files
+    ARCHIVE_SCRIPT,
+
+    # 9: The triggers of the standings and club records without INSERT OR IGNORE, see standing_statements
+    game_triggers_script(ID_KEYS),
+
+    # 10: Elo ratings of the clubs after every date they played
+    rating_script(),
+
+    # 11: A game added through the game view is given an id above the archived games when it is inserted
+    GAME_ID_SCRIPT,
+
+    # 12: The names used by the archived games cannot be deleted
+    use_archive_keys,
+
+    # 13: Searches of names without case
+    NOCASE_SCRIPT,
+]
+
+
+# This function applies every migration the database has not seen yet. Each runs in a transaction of its own with its
+# user_version, so one that fails is rolled back whole and runs again from the start the next time. A function of
+# MIGRATIONS returns its script and writes nothing itself. The foreign keys are off while they run, as SQLite only
+# rebuilds a table without them, and 'conn' must not be in a transaction
+def migrate(conn):
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version >= len(MIGRATIONS):
+        return
+    foreign_keys = conn.execute('PRAGMA foreign_keys').fetchone()[0]
+    conn.execute('PRAGMA foreign_keys = OFF')
+    try:
+        for number in range(version, len(MIGRATIONS)):
+            script = MIGRATIONS[number](conn) if callable(MIGRATIONS[number]) else MIGRATIONS[number]
+            try:
+                conn.executescript('BEGIN;' + script + 'PRAGMA user_version = %d;COMMIT;' % (number + 1))
+            except sqlite3.Error:
+                conn.execute('ROLLBACK')
+                raise
+    finally:
+        conn.execute('PRAGMA foreign_keys = %d' % foreign_keys)
+
+
+# The views and tables of every version of the schema, views and rows that refer to others first
+SCHEMA_OBJECTS = ['club_fts', 'match_fts', 'standing', 'club_season', 'rating', 'rating_stale', 'feed', 'archive',
+                  'archive_key', 'club_year', 'game', 'club', 'league', 'match', 'club_years', 'games', 'clubs',
+                  'leagues', 'matches']
+
+
+# This function drops every table so the next migrate() starts from an empty database
+def drop_schema(conn):
+    kinds = dict(conn.execute("SELECT name, type FROM sqlite_master WHERE type IN ('table', 'view')").fetchall())
+    conn.executescript(''.join(['DROP %s %s;\n' % (kinds[name].upper(), name) for name in SCHEMA_OBJECTS
+                                if name in kinds]) + 'PRAGMA user_version = 0;')
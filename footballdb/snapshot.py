@@ -0,0 +1,163 @@
+"""
+This module writes the games to a snapshot file for the analytics of analytics.py, and maps it back into memory. A
+snapshot holds one NumPy array per column, the clubs and leagues encoded as positions in the lists of their keys and
+names, so a game takes 28 bytes. The file is a JSON header followed by the raw arrays, each aligned on 64 bytes: it is
+opened with mmap and every array is a view of its pages, so loading a snapshot copies nothing and reads nothing but
+the header until the arrays are used. It is never written to after, and is made again to take in newer games.
+
+NumPy is only needed to write and load snapshots, install it with: pip install numpy
+"""
+import json
+import mmap
+import os
+import time
+
+try:
+    import numpy
+except ImportError:  # The rest of the package works without it
+    numpy = None
+
+MAGIC = b'FBSNAP1\n'
+VERSION = 1
+ALIGNMENT = 64
+CHUNK_ROWS = 100000  # Rows read from SQLite at a time while writing
+MISSING = -1  # The value of a missing club, league, score or season
+NO_DATE = -2 ** 31  # The value of a missing or unreadable date
+
+# The arrays of a snapshot in the order they are written, with their type. game_date counts days from 1970-01-01,
+# team_one, team_two and league are positions in the clubs and leagues of the header
+COLUMNS = [('id', 'int64'), ('game_date', 'int32'), ('team_one', 'int32'), ('team_two', 'int32'),
+           ('league', 'int16'), ('season_year', 'int16'), ('score_one', 'int16'), ('score_two', 'int16')]
+
+# The games with their clubs and league as integer keys, and only the scores typed as integers, as the standings count
+GAMES = '''SELECT id, IFNULL(CAST(julianday(game_date) - 2440587.5 AS INTEGER), %d), IFNULL(team_one_id, %d),
+    IFNULL(team_two_id, %d), IFNULL(league_id, %d), IFNULL(season_year, %d),
+    CASE WHEN typeof(score_one) = 'integer' THEN score_one ELSE %d END,
+    CASE WHEN typeof(score_two) = 'integer' THEN score_two ELSE %d END
+    FROM games ORDER BY id''' % ((NO_DATE,) + (MISSING,) * 6)
+
+
+# Raises ValueError when NumPy is not installed
+def require_numpy():
+    if numpy is None:
+        raise ValueError('Snapshots need NumPy, install it with: pip install numpy')
+
+
+# Returns (keys, codes): the sorted distinct values of 'values' other than MISSING, and the position of every value in
+# keys, MISSING where it was
+def encode(values):
+    present = values != MISSING
+    keys, codes = numpy.unique(values[present], return_inverse=True)
+    encoded = numpy.full(len(values), MISSING, dtype='int32')
+    encoded[present] = codes
+    return keys, encoded
+
+
+# Writes the games readable through 'conn' to a snapshot file at 'path', replacing it. A connection with the archives
+# attached (see archive.attach) writes every season. Returns the number of games written
+def write_snapshot(conn, path):
+    require_numpy()
+    count = conn.execute('SELECT COUNT(*) FROM games').fetchone()[0]
+    raw = numpy.empty((count, len(COLUMNS)), dtype='int64')
+    filled = 0
+    cursor = conn.execute(GAMES)
+    while True:
+        rows = cursor.fetchmany(CHUNK_ROWS)
+        if not rows:
+            break
+        rows = rows[0:count - filled]  # A game added since the count waits for the next snapshot
+        raw[filled:filled + len(rows)] = rows
+        filled += len(rows)
+    raw = raw[0:filled]
+
+    club_ids, codes = encode(numpy.concatenate([raw[:, 2], raw[:, 3]]))
+    league_ids, leagues = encode(raw[:, 4])
+    club_keys = dict(conn.execute('SELECT club_id, id FROM clubs').fetchall())
+    league_names = dict(conn.execute('SELECT league_id, league_name FROM leagues').fetchall())
+    arrays = {'id': raw[:, 0], 'game_date': raw[:, 1], 'team_one': codes[0:filled], 'team_two': codes[filled:],
+              'league': leagues, 'season_year': raw[:, 5], 'score_one': raw[:, 6], 'score_two': raw[:, 7]}
+
+    header = {'version': VERSION, 'games': filled, 'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+              'clubs': [club_keys.get(int(club_id)) for club_id in club_ids],
+              'leagues': [league_names.get(int(league_id)) for league_id in league_ids], 'columns': []}
+    offset = 0
+    for name, kind in COLUMNS:
+        header['columns'].append({'name': name, 'type': kind, 'offset': offset})
+        offset += aligned(filled * numpy.dtype(kind).itemsize)
+    data = json.dumps(header).encode('utf-8')
+    start = aligned(len(MAGIC) + 8 + len(data))
+
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as snapshot:
+        snapshot.write(MAGIC)
+        snapshot.write(numpy.array([len(data)], dtype='<u8').tobytes())
+        snapshot.write(data)
+        for column in header['columns']:
+            snapshot.seek(start + column['offset'])
+            snapshot.write(numpy.ascontiguousarray(arrays[column['name']], dtype=stored(column['type'])).tobytes())
+        snapshot.truncate(start + offset)
+    replace(temporary, path)
+    return filled
+
+
+# Renames the file at 'source' to 'path', replacing it in one step where the system can. Python 2 cannot on Windows,
+# where os.rename refuses an existing file, so the old snapshot is removed first there
+def replace(source, path):
+    if hasattr(os, 'replace'):  # Python 3.3
+        os.replace(source, path)
+        return
+    if os.name == 'nt' and os.path.exists(path):
+        os.remove(path)
+    os.rename(source, path)
+
+
+# The size rounded up to a multiple of ALIGNMENT
+def aligned(size):
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+# The NumPy type of a column in the file, little-endian whatever the machine
+def stored(kind):
+    return numpy.dtype(kind).newbyteorder('<')
+
+
+# A snapshot mapped in memory. Every column of COLUMNS is an attribute holding a read-only NumPy array of the file,
+# 'clubs' and 'leagues' are the keys and names their codes point to
+class Snapshot(object):
+    def __init__(self, path):
+        require_numpy()
+        self.path = path
+        with open(path, 'rb') as snapshot:
+            if snapshot.read(len(MAGIC)) != MAGIC:
+                raise ValueError('%s is not a snapshot' % path)
+            length = int(numpy.frombuffer(snapshot.read(8), dtype='<u8')[0])
+            header = json.loads(snapshot.read(length).decode('utf-8'))
+            if header['version'] != VERSION:
+                raise ValueError('%s is a snapshot of version %s, make it again' % (path, header['version']))
+            self.map = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+        self.games = header['games']
+        self.created = header['created']
+        self.clubs = header['clubs']
+        self.leagues = header['leagues']
+        start = aligned(len(MAGIC) + 8 + length)
+        for column in header['columns']:
+            setattr(self, column['name'], numpy.frombuffer(self.map, dtype=stored(column['type']), count=self.games,
+                                                           offset=start + column['offset']))
+
+    # The position of a league name in 'leagues'. Raises ValueError if no game is in it
+    def league_code(self, league_name):
+        if league_name not in self.leagues:
+            raise ValueError('No game of the league %s in the snapshot' % league_name)
+        return self.leagues.index(league_name)
+
+    # The dates of the games as numpy datetime64, NaT where it is missing. The array is a copy
+    def dates(self):
+        dates = self.game_date.astype('datetime64[D]')
+        dates[self.game_date == NO_DATE] = numpy.datetime64('NaT')
+        return dates
+
+    # Unmaps the file. The arrays taken from it must have been let go of, mmap refuses to close otherwise
+    def close(self):
+        for name, kind in COLUMNS:
+            setattr(self, name, None)
+        self.map.close()
@@ -0,0 +1,68 @@
+"""
+This module reads league tables from the standing table, which triggers on games keep up to date (see
+schema.standings_script). A table is read from the rows of its clubs only, and the form of a club from its last few
+games, so showing the standings of a season costs the same however many games the database holds.
+"""
+from footballdb import queries, schema
+
+FORM_GAMES = 5  # Games shown in the form of a club
+
+COLUMNS = ['position', 'club', 'played', 'won', 'drawn', 'lost', 'goals_for', 'goals_against', 'goal_difference',
+           'points', 'form']
+
+TABLE = queries.Query('STANDINGS_TABLE', '''SELECT clubs.id, clubs.club_name, played, won, drawn, lost, goals_for,
+    goals_against, goals_for - goals_against, points
+    FROM standing JOIN clubs ON clubs.club_id = standing.club_id
+    WHERE standing.league_id = %s AND standing.season_year = ?
+    ORDER BY points DESC, goals_for - goals_against DESC, goals_for DESC, clubs.id''' % (schema.LEAGUE_ID % '?'))
+
+# The results of the last games of a club, newest first. Each half can use an index starting with the club
+FORM = queries.Query('STANDINGS_FORM', '''SELECT game_date,
+    CASE WHEN goals_for > goals_against THEN 'W' WHEN goals_for = goals_against THEN 'D' ELSE 'L' END
+    FROM (SELECT game_date, score_one AS goals_for, score_two AS goals_against FROM games
+          WHERE team_one_id = %(club)s AND league_id = %(league)s AND season_year = ?
+          AND typeof(score_one) = 'integer' AND typeof(score_two) = 'integer'
+          UNION ALL
+          SELECT game_date, score_two, score_one FROM games
+          WHERE team_two_id = %(club)s AND league_id = %(league)s AND season_year = ?
+          AND typeof(score_one) = 'integer' AND typeof(score_two) = 'integer')
+    ORDER BY game_date DESC LIMIT ?''' % {'club': schema.CLUB_ID % '?', 'league': schema.LEAGUE_ID % '?'})
+
+
+# Returns the form of a club as a string of W, D and L, oldest game first
+def form(conn, club_key, league_name, season_year, games=FORM_GAMES):
+    rows = FORM.execute(conn, (club_key, league_name, season_year, club_key, league_name, season_year, games))
+    return ''.join(reversed([result for game_date, result in rows.fetchall()]))
+
+
+# How a club is shown: by name when it has one, by key otherwise. A name that is empty, or the text 'None' that the
+# first versions wrote for a missing value, as they did for the scores of some games, is no name
+def club_label(club_key, club_name):
+    if club_name is None or not ('%s' % club_name).strip() or club_name == 'None':
+        return club_key
+    return club_name
+
+
+# Returns the table of a league in a season as a list of rows in the order of COLUMNS, the leader first. A club is
+# shown by club_label
+def league_table(conn, league_name, season_year):
+    table = []
+    for row in TABLE.execute(conn, (league_name, season_year)).fetchall():
+        club_key, club_name = row[0:2]
+        table.append((len(table) + 1, club_label(club_key, club_name)) + tuple(row[2:]) +
+                     (form(conn, club_key, league_name, season_year),))
+    return table
+
+
+# A league table that can be shown in the resultgrid.ResultGrid like a paging.Search. The arguments are what the user
+# typed. It is read whole on the first page, and its rows are keyed by position
+class Standings(object):
+    def __init__(self, league_name, season_year):
+        self.league_name = league_name.strip()
+        self.season_year = queries.number(season_year)  # Raises ValueError if it is not a year
+
+    def page(self, conn, after=None, before=None, limit=None):
+        if after is not None or before is not None:
+            return COLUMNS, []
+        rows = league_table(conn, self.league_name, self.season_year)
+        return COLUMNS, [(row[0], row) for row in rows]
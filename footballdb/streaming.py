@@ -0,0 +1,95 @@
+"""
+This module reads an openfootball feed from a file or a response a piece at a time, instead of loading the whole text and
+the whole decoded tree at once. Only the top level object is walked here: its arrays of rounds or clubs are handed out
+one element at a time, each decoded by the json module, so the memory used is that of one round rather than the feed.
+"""
+import codecs
+import json
+
+CHUNK_SIZE = 64 * 1024  # Bytes read from the stream at a time
+
+WHITESPACE = ' \t\n\r'
+
+
+class FeedParser(object):
+    def __init__(self, stream, chunk_size=CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8-sig')()  # Feeds are UTF-8, some start with a BOM
+        self.json = json.JSONDecoder()
+        self.text = u''
+        self.pos = 0
+        self.eof = False
+
+    # Reads the next chunk into the buffer, dropping the text already parsed. Returns False at the end of the stream
+    def fill(self):
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        self.text = self.text[self.pos:] + self.decoder.decode(chunk, final=not chunk)
+        self.pos = 0
+        self.eof = not chunk
+        return True
+
+    # Returns the next character that is not whitespace, without moving past it
+    def peek(self):
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                raise ValueError('Unexpected end of feed')
+
+    def expect(self, character):
+        if self.peek() != character:
+            raise ValueError('Expected %r in the feed, found %r' % (character, self.text[self.pos]))
+        self.pos += 1
+
+    # Decodes the JSON value at the current position, reading more of the stream until it is complete. A value that
+    # ends exactly at the end of the buffer may be a number that goes on in the next chunk, so it is only accepted
+    # once something follows it
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.json.raw_decode(self.text, self.pos)
+                if end < len(self.text) or self.eof:
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            self.fill()
+
+    # Yields (key, value) for every member of the top level object, in the order of the feed. The members named in
+    # 'arrays' must hold an array, which is not decoded whole: (key, element) is yielded for every element of it instead
+    def members(self, arrays=()):
+        self.expect('{')
+        if self.peek() == '}':
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            if key in arrays:
+                self.expect('[')
+                if self.peek() == ']':
+                    self.pos += 1
+                else:
+                    while True:
+                        yield key, self.value()
+                        if self.peek() == ']':
+                            self.pos += 1
+                            break
+                        self.expect(',')
+            else:
+                yield key, self.value()
+
+            if self.peek() == '}':
+                return
+            self.expect(',')
+
+
+# Yields the members of the feed read from 'stream', a file or a response opened in binary mode. See FeedParser.members
+def iter_members(stream, arrays=(), chunk_size=CHUNK_SIZE):
+    return FeedParser(stream, chunk_size).members(arrays)
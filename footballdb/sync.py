@@ -0,0 +1,106 @@
+"""
+This module keeps the database in step with the openfootball feeds without rebuilding it on every launch. For every
+feed url the 'feed' table stores the ETag and Last-Modified headers and a hash of the last body that was applied.
+Feeds that were checked recently are not requested at all, the rest are requested conditionally, and only a feed whose
+content really changed is written to the database.
+"""
+import collections
+import multiprocessing
+import time
+
+from footballdb import feeds, ingest, metrics
+
+MAX_AGE = 6 * 60 * 60  # Seconds before a feed that was already checked is asked for again
+
+
+# This function takes a list of (kind, url, year) entries, such as catalogue.feed_list(), downloads the feeds that may
+# have changed and writes every feed whose content is new, in the order of the list. 'kind' is ingest.CLUBS or
+# ingest.MATCHES. The feeds are spooled to temporary files while they download and read back a batch at a time, so no
+# feed is ever held in memory whole. With 'processes' above 1 the rows of the feeds are built in that many worker
+# processes instead, and written from this connection as they come (see pool_rows).
+# Each feed is written in a single transaction together with its metadata. When 'force' is True every feed is
+# downloaded and applied again. Returns the list of urls that were applied.
+def sync_feeds(conn, feed_list, max_age=MAX_AGE, force=False, fetch_all=feeds.fetch_all, processes=None):
+    cur = conn.cursor()
+    state = {}
+    for url, etag, last_modified, content_hash, checked_at in cur.execute(
+            '''SELECT url, etag, last_modified, content_hash, checked_at FROM feed'''):
+        state[url] = (etag, last_modified, content_hash, checked_at)
+
+    # Work out which feeds need to be asked for. A warm start inside max_age stops here without a request or a write
+    now = time.time()
+    stale = []
+    for kind, url, year in feed_list:
+        if force or url not in state or state[url][3] is None or now - state[url][3] >= max_age:
+            stale.append(url)
+    if len(stale) == 0:
+        return []
+
+    validators = {}
+    if not force:
+        for url in stale:
+            if url in state:
+                validators[url] = state[url][0:2]
+    responses = fetch_all(stale, validators=validators, spool=True)
+
+    # The feeds whose content changed, in the order of the list
+    changed = []
+    for kind, url, year in feed_list:
+        if url in responses and not responses[url].not_modified:
+            if force or url not in state or responses[url].content_hash != state[url][2]:
+                changed.append((kind, responses[url], year))
+    changed_urls = set([response.url for kind, response, year in changed])
+    rows = None
+    if processes is not None and processes > 1 and len(changed) > 1:
+        rows = pool_rows(changed, processes)
+
+    applied = []
+    try:
+        with ingest.bulk_load(conn):
+            for kind, url, year in feed_list:
+                if url not in responses:
+                    continue
+                response = responses[url]
+
+                with conn:  # One transaction per feed, rolled back if the feed cannot be inserted
+                    if response.not_modified:
+                        content_hash = state[url][2] if url in state else None
+                    else:
+                        content_hash = response.content_hash
+                        if url in changed_urls:
+                            if rows is not None:
+                                with metrics.RECORDER.timed(metrics.PARSE, kind + ' (waiting for processes)'):
+                                    feed_rows = next(rows)
+                                with metrics.RECORDER.timed(metrics.INSERT, kind) as measure:
+                                    measure.rows = ingest.write_rows(conn, kind, feed_rows)
+                            else:
+                                ingest.write_stream(conn, kind, response.stream(), year)
+                            applied.append(url)
+                        response.close()
+
+                    conn.execute('''INSERT OR REPLACE INTO feed(url, etag, last_modified, content_hash, checked_at)
+                                 VALUES(?, ?, ?, ?, ?)''', (url, response.etag, response.last_modified, content_hash,
+                                                              now))
+    finally:
+        if rows is not None:
+            rows.close()  # Stops the worker processes if a feed could not be written
+
+    return applied
+
+
+# Builds the rows of the (kind, response, year) feeds with ingest.feed_rows in a pool of worker processes, and yields
+# them in the order of the list. Only two feeds per process are handed out ahead of the one being written, so the
+# feeds waiting in memory stay few however long the list is
+def pool_rows(jobs, processes):
+    pool = multiprocessing.Pool(processes)
+    try:
+        pending = collections.deque()
+        for kind, response, year in jobs:
+            if len(pending) >= 2 * processes:
+                yield pending.popleft().get()
+            pending.append(pool.apply_async(ingest.feed_rows, (kind, response.stream().read(), year)))
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.terminate()
+        pool.join()